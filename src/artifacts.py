@@ -0,0 +1,222 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import numpy as np
+
+# Default artifact rates (events per minute)
+DEFAULT_ARTIFACT_RATES = {
+    'blink': 15.0,
+    'emg': 2.0,
+    'pop': 0.5,
+    'drift': 1.0
+}
+
+
+class ArtifactInjector:
+    """ Sparse artifact layer. Artifact onsets are scheduled independently
+    for each artifact type following a Poisson process, and each event adds
+    a precomputed temporal template, weighted by a channel topography, to
+    the chunks that it overlaps. Only the channels included in the
+    topography are modified, so the cost depends on the number of active
+    events and not on the size of the chunk.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    l_cha : list or None
+        Channel labels, used to build realistic topographies (e.g.,
+        frontal channels for blinks). If the labels are not standard,
+        random topographies are used instead.
+    rates : dict or None
+        Events per minute of each artifact type ('blink', 'emg', 'pop',
+        'drift'). Types not included are disabled. If None, the default
+        rates are used.
+    gain : float
+        Global amplitude multiplier of the artifacts.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    def __init__(self, fs, n_cha, l_cha=None, rates=None, gain=1.0,
+                 seed=None):
+        self.fs = fs
+        self.n_cha = n_cha
+        self.l_cha = [str(l).upper() for l in l_cha] if l_cha is not None \
+            else [str(i) for i in range(n_cha)]
+        self.rates = dict(DEFAULT_ARTIFACT_RATES) if rates is None \
+            else dict(rates)
+        self.gain = gain
+        self.rng = np.random.default_rng(seed)
+        for a_type in self.rates:
+            if a_type not in DEFAULT_ARTIFACT_RATES:
+                raise ValueError('Unknown artifact type: %s' % a_type)
+
+        # Precompute the templates
+        self.templates = {
+            'blink': [self.blink_template(fs)],
+            'emg': [self.emg_template(fs, self.rng) for _ in range(4)],
+            'pop': [self.pop_template(fs)],
+            'drift': [self.drift_template(fs)]
+        }
+
+        # Scheduling of the events
+        self.active_events = list()
+        self.next_onsets = dict()
+        for a_type, rate in self.rates.items():
+            if rate > 0:
+                self.next_onsets[a_type] = self._draw_interval(rate)
+        self.n_events = {a_type: 0 for a_type in self.rates}
+
+    def add(self, chunk, start_sample):
+        """ Adds the artifacts that overlap the chunk in-place.
+
+        Parameters
+        ------------
+        chunk : ndarray [samples x channels]
+            Chunk to modify.
+        start_sample : int
+            Index of the first sample of the chunk.
+        """
+        end_sample = start_sample + chunk.shape[0]
+
+        # Schedule the events whose onset falls inside the chunk
+        for a_type, onset in self.next_onsets.items():
+            while onset < end_sample:
+                self._new_event(a_type, max(onset, start_sample))
+                onset += self._draw_interval(self.rates[a_type])
+            self.next_onsets[a_type] = onset
+
+        # Add the active events
+        finished = False
+        for event in self.active_events:
+            onset, template, gain, chans, weights = event
+            first = max(onset, start_sample)
+            last = min(onset + template.shape[0], end_sample)
+            if last > first:
+                # Added in float and cast on assignment, so that chunks of
+                # integer formats are supported
+                rows = slice(first - start_sample, last - start_sample)
+                chunk[rows, chans] = chunk[rows, chans] + np.outer(
+                    gain * template[first - onset:last - onset], weights)
+            if onset + template.shape[0] <= end_sample:
+                event[0] = None
+                finished = True
+        if finished:
+            self.active_events = [e for e in self.active_events
+                                  if e[0] is not None]
+
+    def get_state(self):
+        """ Returns a snapshot of the state of the injector, which can be
+        restored with set_state (see checkpoint.py). """
+        events = list()
+        for onset, template, gain, chans, weights in self.active_events:
+            for a_type, templates in self.templates.items():
+                idx = [i for i, t in enumerate(templates) if t is template]
+                if idx:
+                    events.append([onset, a_type, idx[0], gain,
+                                   np.asarray(chans), np.asarray(weights)])
+                    break
+        return {'rng': self.rng.bit_generator.state,
+                'next_onsets': dict(self.next_onsets),
+                'n_events': dict(self.n_events),
+                'active_events': events}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['rng']
+        self.next_onsets = dict(state['next_onsets'])
+        self.n_events = dict(state['n_events'])
+        self.active_events = [
+            [onset, self.templates[a_type][idx], gain, np.array(chans),
+             np.array(weights)]
+            for onset, a_type, idx, gain, chans, weights in
+            state['active_events']]
+
+    def advance(self, start_sample):
+        """ Moves the schedule forward to start_sample, discarding the
+        events that would have happened before (e.g., after skipping
+        samples). """
+        self.active_events = [e for e in self.active_events
+                              if e[0] + e[1].shape[0] > start_sample]
+        for a_type, onset in self.next_onsets.items():
+            while onset < start_sample:
+                onset += self._draw_interval(self.rates[a_type])
+            self.next_onsets[a_type] = onset
+
+    def _draw_interval(self, rate):
+        # Inter-onset intervals of a Poisson process, in samples
+        return int(np.ceil(self.rng.exponential(60 / rate) * self.fs))
+
+    def _new_event(self, a_type, onset):
+        templates = self.templates[a_type]
+        template = templates[self.rng.integers(len(templates))]
+        gain = self.gain * self.rng.uniform(0.7, 1.3)
+        chans, weights = self._topography(a_type)
+        self.active_events.append([onset, template, gain, chans, weights])
+        self.n_events[a_type] += 1
+
+    def _topography(self, a_type):
+        """ Returns the channel indexes and weights of a new event. """
+        if a_type == 'blink':
+            # Frontal, decaying towards central channels
+            prefixes = (('FP', 1.0), ('AF', 0.7), ('F', 0.4), ('FC', 0.2))
+            return self._label_topography(prefixes, fallback=0.1)
+        elif a_type == 'emg':
+            # Temporal muscles, lateralized
+            prefixes = (('T', 1.0), ('FT', 0.8), ('TP', 0.8), ('F7', 0.5),
+                        ('F8', 0.5))
+            return self._label_topography(prefixes, fallback=0.2)
+        elif a_type == 'pop':
+            # A single electrode
+            chans = np.array([self.rng.integers(self.n_cha)])
+            return chans, np.array([self.rng.choice((-1.0, 1.0))])
+        else:
+            # A few electrodes drifting with random polarities
+            n = min(self.n_cha, int(self.rng.integers(1, 5)))
+            chans = np.sort(self.rng.choice(self.n_cha, n, replace=False))
+            return chans, self.rng.uniform(-1, 1, n)
+
+    def _label_topography(self, prefixes, fallback):
+        weights = np.zeros(self.n_cha)
+        for i, label in enumerate(self.l_cha):
+            # The longest matching prefix determines the weight
+            match = [(len(p), w) for p, w in prefixes if label.startswith(p)]
+            if match:
+                weights[i] = max(match)[1]
+        if not np.any(weights):
+            # Non-standard labels: random subset of channels
+            n = max(1, int(round(fallback * self.n_cha)))
+            chans = np.sort(self.rng.choice(self.n_cha, n, replace=False))
+            weights[chans] = self.rng.uniform(0.3, 1.0, n)
+        chans = np.flatnonzero(weights)
+        return chans, weights[chans]
+
+    @staticmethod
+    def blink_template(fs, amplitude=150.0, duration=0.4):
+        """ Eye blink: smooth monophasic deflection of ~400 ms. """
+        t = np.arange(int(duration * fs)) / (duration * fs)
+        return amplitude * np.sin(np.pi * t) ** 2 * np.exp(-2 * t)
+
+    @staticmethod
+    def emg_template(fs, rng, amplitude=40.0, duration=1.0):
+        """ Muscle burst: high-frequency noise with a smooth envelope. """
+        n = int(duration * fs)
+        noise = np.diff(rng.standard_normal(n + 1))
+        return amplitude * np.hanning(n) * noise / np.std(noise)
+
+    @staticmethod
+    def pop_template(fs, amplitude=200.0, tau=0.2, duration=1.0):
+        """ Electrode pop: abrupt step followed by an exponential decay. """
+        t = np.arange(int(duration * fs)) / fs
+        return amplitude * np.exp(-t / tau)
+
+    @staticmethod
+    def drift_template(fs, amplitude=60.0, duration=5.0):
+        """ Slow drift: baseline excursion that returns to zero. """
+        t = np.arange(int(duration * fs)) / (duration * fs)
+        return amplitude * 0.5 * (1 - np.cos(2 * np.pi * t))
@@ -0,0 +1,111 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Storage of state snapshots for crash recovery. A checkpoint is a folder with
+a state.json file, which contains the state as nested dicts and lists, and
+one .npy file for each array of the state. The JSON file is replaced
+atomically and references the arrays by name, so that a crash while saving
+leaves the previous checkpoint usable. Arrays are loaded memory-mapped, so
+that large buffers (e.g., the prerendered signal) are available without
+reading them.
+"""
+
+import json
+import os
+import numpy as np
+
+STATE_FILE = 'state.json'
+
+
+def save_checkpoint(state, path, reuse=()):
+    """ Saves a state snapshot.
+
+    Parameters
+    ------------
+    state : dict
+        State. Its values can be JSON serializable objects, numpy arrays or
+        numpy scalars, nested in dicts and lists.
+    path : str
+        Folder of the checkpoint.
+    reuse : tuple
+        Keys of top-level arrays that do not change between checkpoints. If
+        they were already saved, they are not written again.
+    """
+    os.makedirs(path, exist_ok=True)
+    previous = dict()
+    try:
+        with open(os.path.join(path, STATE_FILE)) as f:
+            previous = json.load(f)
+        generation = previous['generation'] + 1
+    except (OSError, ValueError, KeyError):
+        generation = 0
+    files = set()
+
+    def encode(obj, key):
+        if isinstance(obj, dict):
+            return {k: encode(v, '%s.%s' % (key, k)) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [encode(v, '%s.%i' % (key, i)) for i, v in enumerate(obj)]
+        if isinstance(obj, np.ndarray):
+            top_key = key.split('.')[1]
+            old = previous.get('state', dict()).get(top_key, None)
+            if top_key in reuse and isinstance(old, dict) and \
+                    '__npy__' in old and \
+                    os.path.exists(os.path.join(path, old['__npy__'])):
+                files.add(old['__npy__'])
+                return old
+            name = '%s_%i.npy' % (key.strip('.'), generation)
+            np.save(os.path.join(path, name), obj)
+            files.add(name)
+            return {'__npy__': name}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return obj
+
+    encoded = {'generation': generation, 'state': encode(state, '')}
+    tmp_file = os.path.join(path, STATE_FILE + '.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(encoded, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, os.path.join(path, STATE_FILE))
+
+    # Remove the arrays of previous checkpoints
+    for name in os.listdir(path):
+        if name.endswith('.npy') and name not in files:
+            os.remove(os.path.join(path, name))
+
+
+def load_checkpoint(path, mmap_mode='r'):
+    """ Loads a state snapshot saved with save_checkpoint.
+
+    Parameters
+    ------------
+    path : str
+        Folder of the checkpoint.
+    mmap_mode : str or None
+        Memory-map mode of the arrays (see numpy.load). Memory-mapped arrays
+        are read-only by default, so restore functions must copy the arrays
+        they modify.
+
+    Returns
+    ------------
+    dict
+        State.
+    """
+    with open(os.path.join(path, STATE_FILE)) as f:
+        encoded = json.load(f)
+
+    def decode(obj):
+        if isinstance(obj, dict):
+            if '__npy__' in obj:
+                return np.load(os.path.join(path, obj['__npy__']),
+                               mmap_mode=mmap_mode)
+            return {k: decode(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [decode(v) for v in obj]
+        return obj
+
+    return decode(encoded['state'])
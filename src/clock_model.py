@@ -0,0 +1,144 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import numpy as np
+
+
+class ClockModel:
+    """ Simulates the clock of an amplifier, which is not the clock of the
+    host. The device clock runs at 1 + ppm * 1e-6 times the rate of the
+    host clock, where ppm is a constant skew plus a random-walk drift that
+    changes every interval seconds of host time. The device produces sample
+    k when its clock reaches k / fs, and timestamps it with that device
+    time, plus a random jitter per chunk. Thus, both the effective sample
+    rate and the timestamps deviate from the host clock, as with real
+    amplifiers, and consumers must estimate the mapping to synchronize.
+
+    The true mapping is piecewise linear, with a knot every interval. The
+    knots (host time, device time and rate in ppm, as LSL timestamps) can be
+    logged to a CSV file to measure the accuracy of the correction of the
+    consumers. Times are relative to the anchor of the sample clock of the
+    stream.
+
+    Parameters
+    ------------
+    skew_ppm : float
+        Constant rate error (ppm). Positive values make the device faster.
+    drift_ppm : float
+        Standard deviation of the random walk of the rate error (ppm per
+        square root of second).
+    jitter_ms : float
+        Standard deviation of the jitter of the timestamps (ms).
+    interval : float
+        Host time (s) between changes of the drift.
+    seed : int or None
+        Seed of the random number generator.
+    log_path : str or None
+        Path of the CSV file of the true mapping.
+    """
+
+    def __init__(self, skew_ppm=0.0, drift_ppm=0.0, jitter_ms=0.0,
+                 interval=1.0, seed=None, log_path=None):
+        self.skew_ppm = skew_ppm
+        self.drift_ppm = drift_ppm
+        self.jitter_ms = jitter_ms
+        self.interval = interval
+        self.rng = np.random.default_rng(seed)
+        self.log_path = log_path
+        self.log_file = None
+        self.origin = None
+
+        # Current segment of the mapping: from host time host_start, the
+        # device time is device_start + (t - host_start) * rate
+        self.drift = 0.0
+        self.host_start = 0.0
+        self.device_start = 0.0
+        self.n_knots = 0
+
+    @property
+    def ppm(self):
+        return self.skew_ppm + self.drift
+
+    @property
+    def rate(self):
+        return 1 + 1e-6 * self.ppm
+
+    def anchor(self, origin, elapsed):
+        """ Aligns the device clock to the host clock at elapsed seconds
+        from origin (LSL timestamp of the anchor of the sample clock). Called
+        when the stream starts or resumes transmission. """
+        self.origin = origin
+        self.host_start = elapsed
+        self.device_start = elapsed
+        self.log_knot()
+
+    def device_time(self, elapsed):
+        """ Device time at elapsed seconds of host time from the anchor. """
+        while elapsed >= self.host_start + self.interval:
+            self.device_start += self.interval * self.rate
+            self.host_start += self.interval
+            if self.drift_ppm > 0:
+                self.drift += self.rng.normal(
+                    0, self.drift_ppm * np.sqrt(self.interval))
+            self.log_knot()
+        return self.device_start + (elapsed - self.host_start) * self.rate
+
+    def host_time(self, device_elapsed):
+        """ Host time (s from the anchor) at which the device clock reaches
+        device_elapsed, by the current segment of the mapping, so it is
+        meant for recent device times (e.g., the samples being pushed). """
+        return self.host_start + (device_elapsed - self.device_start) / \
+            self.rate
+
+    def get_jitter(self):
+        """ Jitter (s) of the timestamp of a chunk. """
+        if self.jitter_ms <= 0:
+            return 0.0
+        return self.rng.normal(0, self.jitter_ms / 1000)
+
+    def log_knot(self):
+        self.n_knots += 1
+        if self.log_path is None or self.origin is None:
+            return
+        if self.log_file is None:
+            self.log_file = open(self.log_path, 'a')
+            if self.log_file.tell() == 0:
+                self.log_file.write('host_time,device_time,ppm\n')
+        self.log_file.write('%.9f,%.9f,%.6f\n' % (
+            self.origin + self.host_start, self.origin + self.device_start,
+            self.ppm))
+        self.log_file.flush()
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def get_state(self):
+        """ Returns a snapshot of the state of the model, which can be
+        restored with set_state (see checkpoint.py). """
+        return {'rng': self.rng.bit_generator.state,
+                'drift': self.drift,
+                'host_start': self.host_start,
+                'device_start': self.device_start,
+                'origin': self.origin}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['rng']
+        self.drift = state['drift']
+        self.host_start = state['host_start']
+        self.device_start = state['device_start']
+        self.origin = state['origin']
+
+    def get_report(self, elapsed=None):
+        """ Current rate error and, if elapsed is given, the offset (ms) of
+        the device clock from the host clock at that time. """
+        report = {'ppm': self.ppm, 'skew_ppm': self.skew_ppm,
+                  'drift_ppm': self.drift, 'knots': self.n_knots}
+        if elapsed is not None:
+            report['offset_ms'] = 1000 * (self.device_start + (
+                elapsed - self.host_start) * self.rate - elapsed)
+        return report
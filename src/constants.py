@@ -9,6 +9,27 @@ VERSION = "2.3"
 IMG_FOLDER = 'gui/images'
 STYLE_FILE = 'gui/style.css'
 
+# Default stream configuration for headless use (see
+# SignalGenerator.from_config)
+DEFAULT_STREAM_CONFIG = {
+    'stream_name': 'Signal_generator',
+    'stream_type': 'EEG',
+    'chunk_size': 16,
+    'format': 'float32',
+    'n_cha': 16,
+    'l_cha': 'auto',
+    'units': 'uV',
+    'sample_rate': 256.0,
+    'gen_settings': {
+        'gen_type': 'EEG (closed eyes)',
+        'eeg_ac': True,
+        'eeg_pink': 'real-time',
+        'uniform_mean': 0.0,
+        'uniform_std': 1.0
+    },
+    'hostname': None
+}
+
 # Channels
 EEG_10_20 = \
     ['C3', 'C4', 'CZ', 'F3', 'F4', 'F7', 'F8', 'FP1', 'FP2', 'FPZ', 'FZ',
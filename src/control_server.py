@@ -0,0 +1,328 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Remote control of SignalGenerator streams for automated test rigs. The
+server listens on a localhost TCP port or a Unix socket and speaks JSON
+lines: each request is a JSON object in a single line, and each response is
+a JSON object in a single line with "ok" and either "result" or "error". The
+"id" of the request, if any, is returned in the response. Usage:
+
+    python control_server.py --port 9200 [--metrics-port 9100]
+    python control_server.py --unix /tmp/lslgen.sock
+
+Commands:
+
+    {"cmd": "create", "name": "s1", "config": {...}, "start": true}
+    {"cmd": "start", "name": "s1"}
+    {"cmd": "pause", "name": "s1"}
+    {"cmd": "reconfigure", "name": "s1", "config": {...}}
+    {"cmd": "destroy", "name": "s1"}
+    {"cmd": "stats", "name": "s1"}      (all the streams if no name)
+    {"cmd": "list"}
+
+The config of "create" follows SignalGenerator.from_config, and the one of
+"reconfigure" updates the current configuration of the stream, which is
+recreated with it and keeps its running state.
+"""
+
+from socketserver import ThreadingTCPServer, StreamRequestHandler
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import stat
+import threading
+from signal_generator import SignalGenerator, merge_config, \
+    update_config
+from metrics_server import MetricsServer
+
+
+class ReusableTCPServer(ThreadingTCPServer):
+    # The port can be bound again right after a restart
+    allow_reuse_address = True
+
+
+class ControlServer:
+    """ JSON-lines control server (see the module docstring). Each
+    connection is served by its own thread, and commands on different
+    streams run concurrently. Commands only call the public methods of the
+    streams from the connection threads, so they never block their IO
+    threads.
+
+    Parameters
+    ------------
+    host : str
+        Interface to listen on. Defaults to localhost.
+    port : int
+        TCP port. Use 0 to pick a free port.
+    unix_socket : str or None
+        Path of a Unix socket to listen on instead of TCP.
+    metrics_server : MetricsServer or None
+        If given, the streams are registered in it.
+    """
+
+    COMMANDS = ('create', 'start', 'pause', 'reconfigure', 'destroy',
+                'stats', 'list')
+
+    def __init__(self, host='127.0.0.1', port=9200, unix_socket=None,
+                 metrics_server=None):
+        self.streams = dict()   # name -> [SignalGenerator, lock]
+        self.lock = threading.Lock()
+        self.metrics_server = metrics_server
+        self.unix_socket = unix_socket
+        handler = self._make_handler()
+        if unix_socket is not None:
+            # Remove the socket left by a previous server that crashed
+            if os.path.exists(unix_socket) and \
+                    stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+                os.remove(unix_socket)
+            self.server = socketserver.ThreadingUnixStreamServer(
+                unix_socket, handler)
+            self.address = unix_socket
+        else:
+            self.server = ReusableTCPServer((host, port), handler)
+            self.address = '%s:%i' % self.server.server_address[:2]
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(name='SignalGenerator_Control_Thread',
+                                       target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        print('[ControlServer] > Listening at %s' % self.address)
+
+    def close(self):
+        """ Stops the server and destroys every stream. """
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+        if self.unix_socket is not None:
+            os.remove(self.unix_socket)
+        for name in list(self.streams):
+            self.destroy(name)
+        print('[ControlServer] > Control server closed.')
+
+    def execute(self, request):
+        """ Executes a command.
+
+        Parameters
+        ------------
+        request : dict
+            Command (see the module docstring).
+
+        Returns
+        ------------
+        dict
+            Response with "ok" and "result" or "error".
+        """
+        response = dict()
+        if 'id' in request:
+            response['id'] = request['id']
+        try:
+            cmd = request.get('cmd', None)
+            if cmd not in self.COMMANDS:
+                raise ValueError('Unknown command: %s' % cmd)
+            name = request.get('name', None)
+            if cmd == 'list':
+                result = sorted(self.streams)
+            elif cmd == 'stats' and name is None:
+                streams = sorted(self.streams.items())
+                result = {n: stream[0].get_stats() for n, stream in streams
+                          if stream[0] is not None}
+            elif cmd == 'create':
+                result = self.create(name, request.get('config', dict()),
+                                     request.get('start', False))
+            elif cmd == 'destroy':
+                result = self.destroy(name)
+            else:
+                lock = self.acquire(name)
+                try:
+                    if cmd == 'start':
+                        result = self.start_stream(name)
+                    elif cmd == 'pause':
+                        result = self.pause_stream(name)
+                    elif cmd == 'reconfigure':
+                        result = self.reconfigure(name, request['config'])
+                    else:
+                        result = self.get_stream(name).get_stats()
+                finally:
+                    lock.release()
+            response['ok'] = True
+            response['result'] = result
+        except Exception as e:
+            response['ok'] = False
+            response['error'] = '%s: %s' % (type(e).__name__, e)
+        return response
+
+    def get_stream(self, name):
+        try:
+            return self.streams[name][0]
+        except KeyError:
+            raise KeyError('Unknown stream %s' % name)
+
+    def get_lock(self, name):
+        try:
+            return self.streams[name][1]
+        except KeyError:
+            raise KeyError('Unknown stream %s' % name)
+
+    def acquire(self, name):
+        """ Acquires the lock of a stream, waiting for the commands in
+        progress (e.g., its creation). Raises KeyError if the stream was
+        destroyed, or could not be created, while waiting.
+
+        Returns
+        ------------
+        threading.Lock
+            Lock of the stream, which must be released by the caller.
+        """
+        lock = self.get_lock(name)
+        lock.acquire()
+        with self.lock:
+            stream = self.streams.get(name, None)
+        if stream is None or stream[1] is not lock:
+            lock.release()
+            raise KeyError('Unknown stream %s' % name)
+        return lock
+
+    def create(self, name, config, start=False):
+        if name is None:
+            raise ValueError('The stream needs a name')
+        lock = threading.Lock()
+        with self.lock:
+            if name in self.streams:
+                raise ValueError('Stream %s already exists' % name)
+            # Reserve the name while the stream is created. The lock of the
+            # stream is held before the reservation is published, so the
+            # commands on the stream wait until it has been created
+            lock.acquire()
+            self.streams[name] = [None, lock]
+        try:
+            self._create(name, config, start)
+        except Exception:
+            with self.lock:
+                self.streams.pop(name)
+            raise
+        finally:
+            lock.release()
+        return name
+
+    def _create(self, name, config, start):
+        config = merge_config(config, {'stream_name': config.get(
+            'stream_name', name)})
+        signal_generator = SignalGenerator.from_config(config)
+        if start:
+            signal_generator.init_send_lsl()
+        with self.lock:
+            self.streams[name][0] = signal_generator
+        if self.metrics_server is not None:
+            self.metrics_server.register(name, signal_generator)
+
+    def destroy(self, name):
+        lock = self.acquire(name)
+        try:
+            signal_generator = self.get_stream(name)
+            if self.metrics_server is not None:
+                self.metrics_server.unregister(name)
+            signal_generator.close()
+            with self.lock:
+                self.streams.pop(name)
+        finally:
+            lock.release()
+        return name
+
+    def start_stream(self, name):
+        signal_generator = self.get_stream(name)
+        if not signal_generator.transmitting:
+            signal_generator.init_send_lsl()
+        return True
+
+    def pause_stream(self, name):
+        signal_generator = self.get_stream(name)
+        if signal_generator.transmitting:
+            signal_generator.close_lsl()
+        return False
+
+    def reconfigure(self, name, config):
+        # The stream is recreated with the new configuration, since the
+        # sample rate and buffers cannot change on the fly. The new stream
+        # is created first, so the old one is kept if the config is invalid
+        old_generator = self.get_stream(name)
+        running = old_generator.transmitting
+        config = update_config(old_generator.get_config(), config)
+        signal_generator = SignalGenerator.from_config(config)
+        if self.metrics_server is not None:
+            self.metrics_server.unregister(name)
+        old_generator.close()
+        with self.lock:
+            self.streams[name][0] = signal_generator
+        if self.metrics_server is not None:
+            self.metrics_server.register(name, signal_generator)
+        if running:
+            signal_generator.init_send_lsl()
+        return config
+
+    def _make_handler(self):
+        server = self
+
+        class ControlHandler(StreamRequestHandler):
+
+            def setup(self):
+                super().setup()
+                if self.connection.family != getattr(socket, 'AF_UNIX', None):
+                    # Responses are small, do not wait to coalesce them
+                    self.connection.setsockopt(socket.IPPROTO_TCP,
+                                               socket.TCP_NODELAY, 1)
+
+            def handle(self):
+                for line in self.rfile:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        request = json.loads(line.decode('utf-8'))
+                        if not isinstance(request, dict):
+                            raise ValueError('The request must be an object')
+                        response = server.execute(request)
+                    except ValueError as e:
+                        response = {'ok': False,
+                                    'error': 'Invalid request: %s' % e}
+                    self.wfile.write(json.dumps(
+                        response, default=str).encode('utf-8') + b'\n')
+                    self.wfile.flush()
+
+        return ControlHandler
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(
+        description='Remote control of signal generator streams.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--unix', default=None,
+                        help='Path of a Unix socket to listen on.')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Also serve the metrics of the streams.')
+    args = parser.parse_args()
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(args.host, args.metrics_port)
+        metrics_server.start()
+    control_server = ControlServer(args.host, args.port, args.unix,
+                                   metrics_server)
+    control_server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        control_server.close()
+        if metrics_server is not None:
+            metrics_server.close()
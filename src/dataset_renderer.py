@@ -0,0 +1,314 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Offline rendering of synthetic datasets. The signal of a stream
+configuration (see SignalGenerator.from_config) is rendered as fast as the
+CPUs allow, without real-time streaming, straight into a memory-mapped .npy
+file or an EDF file. Usage:
+
+    python dataset_renderer.py stream.json dataset.npy --hours 10
+
+The signal is split into segments rendered in parallel by a pool of
+processes. Each segment has its own generator, seeded with an independent
+stream spawned from the seed of the dataset (numpy.random.SeedSequence),
+so the dataset is reproducible regardless of the number of processes. The
+periodic components are computed from the absolute sample index, so they
+are continuous across segments; the noise of each segment is independent.
+The segments are written in place by the processes, so the output can be
+larger than the memory. A description of the dataset is saved to
+<path>.json.
+
+The throughput is bound by the generator: for the EEG generators, the
+"spectral" noise method ("eeg_pink") is several times faster than the
+default "real-time" one, which is designed for small chunks.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+from constants import DEFAULT_STREAM_CONFIG
+from generators import create_generator
+from signal_generator import merge_config, get_default_channel_labels
+
+# Values (samples x channels) generated per call to the generator. Larger
+# blocks do not render faster, and the temporaries of some generators (e.g.,
+# the "real-time" pink noise) grow with the block
+BLOCK_VALUES = 65536
+
+
+def write_edf_header(path, n_records, record_secs, spr, labels, units,
+                     physical_range, start=None):
+    """ Writes the header of an EDF file with n_records data records of
+    record_secs seconds, each one with spr samples of every signal. The
+    data records must be written after the header (see get_edf_records).
+
+    Returns
+    ------------
+    int
+        Size of the header in bytes.
+    """
+    start = datetime.datetime.now() if start is None else start
+    n_cha = len(labels)
+    header_bytes = 256 * (n_cha + 1)
+
+    def field(value, length):
+        return str(value)[:length].ljust(length)
+
+    header = [
+        field('0', 8), field('X X X X', 80),
+        field('Startdate %s X X lsl-signal-generator' %
+              start.strftime('%d-%b-%Y').upper(), 80),
+        field(start.strftime('%d.%m.%y'), 8),
+        field(start.strftime('%H.%M.%S'), 8), field(header_bytes, 8),
+        field('', 44), field(n_records, 8), field('%g' % record_secs, 8),
+        field(n_cha, 4)
+    ]
+    header += [field(l, 16) for l in labels]
+    header += [field('', 80)] * n_cha
+    header += [field(units, 8)] * n_cha
+    header += [field('%g' % -physical_range, 8)] * n_cha
+    header += [field('%g' % physical_range, 8)] * n_cha
+    header += [field(-32768, 8)] * n_cha
+    header += [field(32767, 8)] * n_cha
+    header += [field('', 80)] * n_cha
+    header += [field(spr, 8)] * n_cha
+    header += [field('', 32)] * n_cha
+    header = ''.join(header).encode('ascii')
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(header_bytes + 2 * n_records * n_cha * spr)
+    return header_bytes
+
+
+def get_edf_records(path, header_bytes, n_records, n_cha, spr):
+    """ Memory-mapped data records [records x signals x samples] of an EDF
+    file. """
+    return np.memmap(path, dtype='<i2', mode='r+', offset=header_bytes,
+                     shape=(n_records, n_cha, spr))
+
+
+def render_segment(task):
+    """ Renders a segment of the dataset into the output file. Runs in the
+    processes of the pool.
+
+    Parameters
+    ------------
+    task : dict
+        Segment ("start" and "n_samples"), seed ("seed", a SeedSequence)
+        and output ("path", "format" and its parameters).
+
+    Returns
+    ------------
+    int
+        Number of samples rendered.
+    """
+    config = task['config']
+    gen_settings = dict(config['gen_settings'])
+    gen_settings['seed'] = task['seed']
+    generator = create_generator(gen_settings, config['sample_rate'],
+                                 config['n_cha'], config['l_cha'])
+    start, n_samples = task['start'], task['n_samples']
+    block_size = max(BLOCK_VALUES // config['n_cha'], 1)
+    if getattr(generator, 'pink_noise', None) is not None:
+        # The offline pink noise cannot be read in longer chunks
+        block_size = min(block_size, generator.pink_noise.shape[0])
+    if task['format'] == 'edf':
+        # Blocks of whole records, mapped linearly from the physical range
+        # to the 16-bit digital range
+        spr = task['spr']
+        records = get_edf_records(task['path'], task['header_bytes'],
+                                  task['n_records'], config['n_cha'], spr)
+        scale = 65535 / (2 * task['physical_range'])
+        block_size = max(block_size // spr, 1) * spr
+        block = np.empty((block_size, config['n_cha']))
+    else:
+        data = np.load(task['path'], mmap_mode='r+')
+    for first in range(start, start + n_samples, block_size):
+        n = min(block_size, start + n_samples - first)
+        if task['format'] == 'edf':
+            # Samples are stored per record and signal
+            out = block[:n]
+            generator.fill(out, first)
+            out *= scale
+            out -= 0.5
+            np.clip(out, -32768, 32767, out=out)
+            np.rint(out, out=out)
+            records[first // spr:(first + n) // spr] = \
+                out.reshape(n // spr, spr, -1).transpose(0, 2, 1)
+        else:
+            generator.fill(data[first:first + n], first)
+    if task['format'] == 'edf':
+        records.flush()
+    else:
+        data.flush()
+    return n_samples
+
+
+class DatasetRenderer:
+    """ Renders the signal of a stream configuration into a file.
+
+    Parameters
+    ------------
+    config : dict
+        Stream configuration (see SignalGenerator.from_config). Only the
+        channels, sample rate, units and generator settings are used.
+    path : str
+        Output file, .npy or .edf.
+    duration : float
+        Duration (s) of the dataset.
+    seed : int or None
+        Seed of the dataset. If None, it is drawn from the OS.
+    n_workers : int or None
+        Number of processes. If None, one per CPU.
+    segment_secs : float
+        Duration of the segments.
+    dtype : str
+        Data type of the .npy file.
+    record_secs : float
+        Duration of the EDF data records. The sample rate times record_secs
+        must be an integer.
+    physical_range : float
+        The EDF signals are stored in 16 bits in [-physical_range,
+        physical_range]; larger values are clipped.
+    """
+
+    def __init__(self, config, path, duration, seed=None, n_workers=None,
+                 segment_secs=60.0, dtype='float32', record_secs=1.0,
+                 physical_range=500.0):
+        self.config = merge_config(DEFAULT_STREAM_CONFIG, config)
+        if self.config['l_cha'] == 'auto':
+            self.config['l_cha'] = get_default_channel_labels(
+                self.config['n_cha'])
+        self.path = path
+        self.format = 'edf' if path.lower().endswith('.edf') else 'npy'
+        self.fs = self.config['sample_rate']
+        self.n_cha = self.config['n_cha']
+        self.seed = np.random.SeedSequence(seed)
+        self.n_workers = n_workers or os.cpu_count()
+        self.dtype = dtype
+        self.record_secs = record_secs
+        self.physical_range = physical_range
+
+        # Segments are whole EDF records
+        self.spr = 1
+        if self.format == 'edf':
+            self.spr = int(round(self.fs * record_secs))
+            if abs(self.spr - self.fs * record_secs) > 1e-9:
+                raise ValueError('The EDF records must have a whole number '
+                                 'of samples')
+        self.n_samples = int(duration * self.fs) // self.spr * self.spr
+        self.segment_samples = max(
+            int(segment_secs * self.fs) // self.spr, 1) * self.spr
+
+    def get_tasks(self):
+        starts = range(0, self.n_samples, self.segment_samples)
+        seeds = self.seed.spawn(len(starts))
+        task = {'config': self.config, 'path': self.path,
+                'format': self.format}
+        if self.format == 'edf':
+            n_records = self.n_samples // self.spr
+            task.update({
+                'spr': self.spr, 'n_records': n_records,
+                'physical_range': self.physical_range,
+                'header_bytes': write_edf_header(
+                    self.path, n_records, self.record_secs, self.spr,
+                    self.config['l_cha'], self.config['units'],
+                    self.physical_range)
+            })
+        else:
+            np.lib.format.open_memmap(
+                self.path, mode='w+', dtype=self.dtype,
+                shape=(self.n_samples, self.n_cha)).flush()
+        return [dict(task, start=start, seed=seed,
+                     n_samples=min(self.segment_samples,
+                                   self.n_samples - start))
+                for start, seed in zip(starts, seeds)]
+
+    def render(self, progress_interval=1.0):
+        """ Renders the dataset, printing the progress every
+        progress_interval seconds.
+
+        Returns
+        ------------
+        dict
+            Description of the dataset and throughput.
+        """
+        tasks = self.get_tasks()
+        print('[DatasetRenderer] > Rendering %i samples x %i channels '
+              '(%.2f h) into %s with %i processes.' %
+              (self.n_samples, self.n_cha, self.n_samples / self.fs / 3600,
+               self.path, self.n_workers))
+        t0 = time.perf_counter()
+        done = 0
+        last_report = t0
+        with multiprocessing.Pool(self.n_workers) as pool:
+            for n in pool.imap_unordered(render_segment, tasks):
+                done += n
+                now = time.perf_counter()
+                if now - last_report >= progress_interval or \
+                        done == self.n_samples:
+                    last_report = now
+                    rate = done * self.n_cha / (now - t0)
+                    eta = (self.n_samples - done) * self.n_cha / rate
+                    print('[DatasetRenderer] > %5.1f%% %.1f Msamples/s '
+                          'ETA %.0f s' % (100 * done / self.n_samples,
+                                          rate / 1e6, eta))
+        elapsed = time.perf_counter() - t0
+        info = {
+            'path': self.path,
+            'format': self.format,
+            'n_samples': self.n_samples,
+            'n_cha': self.n_cha,
+            'l_cha': list(self.config['l_cha']),
+            'units': self.config['units'],
+            'sample_rate': self.fs,
+            'gen_settings': self.config['gen_settings'],
+            'seed': self.seed.entropy,
+            'segment_samples': self.segment_samples,
+            'elapsed': elapsed,
+            'samples_per_sec': self.n_samples * self.n_cha / elapsed
+        }
+        if self.format == 'edf':
+            info['physical_range'] = self.physical_range
+        else:
+            info['dtype'] = self.dtype
+        with open(os.path.splitext(self.path)[0] + '.json', 'w') as f:
+            json.dump(info, f, indent=2)
+        print('[DatasetRenderer] > Done in %.1f s (%.1f Msamples/s).' %
+              (elapsed, info['samples_per_sec'] / 1e6))
+        return info
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(
+        description='Renders a synthetic dataset into a .npy or .edf file.')
+    parser.add_argument('config', help='JSON file with the stream '
+                                       'configuration.')
+    parser.add_argument('path', help='Output file (.npy or .edf).')
+    parser.add_argument('--hours', type=float, default=1.0,
+                        help='Duration of the dataset.')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed of the dataset.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes (default: one per CPU).')
+    parser.add_argument('--segment-secs', type=float, default=60.0,
+                        help='Duration of the segments rendered by each '
+                             'task.')
+    parser.add_argument('--dtype', default='float32',
+                        help='Data type of the .npy file.')
+    parser.add_argument('--edf-range', type=float, default=500.0,
+                        help='Physical range of the EDF signals.')
+    args = parser.parse_args()
+    with open(args.config) as f:
+        config = json.load(f)
+    DatasetRenderer(config, args.path, args.hours * 3600, seed=args.seed,
+                    n_workers=args.workers, segment_secs=args.segment_secs,
+                    dtype=args.dtype,
+                    physical_range=args.edf_range).render()
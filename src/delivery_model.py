@@ -0,0 +1,188 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import collections
+import numpy as np
+
+
+def draw(rng, spec):
+    """ Draws a value from a distribution specification: a number (constant)
+    or a dict with key "dist" and its parameters:
+        - {"dist": "constant", "value": v}
+        - {"dist": "uniform", "low": a, "high": b}
+        - {"dist": "normal", "mean": m, "std": s}
+        - {"dist": "exponential", "mean": m}
+        - {"dist": "poisson", "mean": m}
+        - {"dist": "choice", "values": [...], "p": [...]}
+
+    Parameters
+    ------------
+    rng : numpy.random.Generator
+        Random number generator.
+    spec : float or dict
+        Distribution.
+
+    Returns
+    ------------
+    float
+        Drawn value.
+    """
+    if not isinstance(spec, dict):
+        return spec
+    dist = spec.get('dist', 'constant')
+    if dist == 'constant':
+        return spec['value']
+    elif dist == 'uniform':
+        return rng.uniform(spec['low'], spec['high'])
+    elif dist == 'normal':
+        return rng.normal(spec['mean'], spec['std'])
+    elif dist == 'exponential':
+        return rng.exponential(spec['mean'])
+    elif dist == 'poisson':
+        return rng.poisson(spec['mean'])
+    elif dist == 'choice':
+        return rng.choice(spec['values'], p=spec.get('p', None))
+    raise ValueError('Unknown distribution: %s' % dist)
+
+
+class DeliveryModel:
+    """ Simulates the irregular delivery of wireless amplifiers. Samples are
+    acquired at the nominal rate and grouped into packets of random size;
+    each packet is released when its last sample has been acquired plus a
+    random delay. With probability burst_prob per packet, the radio stalls:
+    the next burst_length packets are held and released together once the
+    last one is complete. Each packet is lost with probability loss_prob.
+
+    The packets are planned in order with the model's own random number
+    generator, so the sequence of sizes, delays, bursts and losses only
+    depends on the seed, not on the timing of the host. Release times are
+    relative to the anchor of the sample clock, so that the timestamps of
+    the samples do not depend on the impairments.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    chunk_size : float or dict
+        Distribution of the packet size in samples (see draw).
+    max_chunk : int
+        Maximum packet size; drawn sizes are clipped to [1, max_chunk].
+    delay_ms : float or dict
+        Distribution of the delay of each packet after its last sample has
+        been acquired. Packets are never released out of order.
+    burst_prob : float
+        Probability that a packet starts a burst.
+    burst_length : float or dict
+        Distribution of the number of packets of each burst.
+    loss_prob : float
+        Probability that a packet is lost.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    def __init__(self, fs, chunk_size=16, max_chunk=64, delay_ms=0.0,
+                 burst_prob=0.0, burst_length=4, loss_prob=0.0, seed=None):
+        self.fs = fs
+        self.chunk_size = chunk_size
+        self.max_chunk = int(max_chunk)
+        self.delay_ms = delay_ms
+        self.burst_prob = burst_prob
+        self.burst_length = burst_length
+        self.loss_prob = loss_prob
+        self.rng = np.random.default_rng(seed)
+
+        # Planned packets: (first sample, size, release time, lost, burst)
+        self.packets = collections.deque()
+        self.last_release = -np.inf
+
+        # Impairment counters
+        self.counters = {
+            'packets_sent': 0,
+            'packets_lost': 0,
+            'samples_lost': 0,
+            'bursts': 0,
+            'burst_packets': 0,
+            'delayed_packets': 0,
+            'max_delay_ms': 0.0
+        }
+
+    def get_size(self):
+        return int(min(max(round(draw(self.rng, self.chunk_size)), 1),
+                       self.max_chunk))
+
+    def get_delay(self):
+        return max(draw(self.rng, self.delay_ms), 0) / 1000
+
+    def plan(self, first_sample):
+        """ Plans the next packet, or the packets of the next burst. """
+        if self.rng.random() < self.burst_prob:
+            n_packets = max(int(round(draw(self.rng, self.burst_length))), 1)
+            self.counters['bursts'] += 1
+        else:
+            n_packets = 1
+        sizes = [self.get_size() for _ in range(n_packets)]
+        # The packets of a burst are released when the last one is ready
+        ready = (first_sample + sum(sizes) - 1) / self.fs
+        release = max(ready + self.get_delay(), self.last_release)
+        self.last_release = release
+        for size in sizes:
+            lost = self.rng.random() < self.loss_prob
+            self.packets.append((first_sample, size, release, lost,
+                                 n_packets > 1))
+            first_sample += size
+
+    def get_next(self, first_sample):
+        """ Returns the next packet, which starts at first_sample.
+
+        Returns
+        ------------
+        tuple
+            (size, release time in seconds relative to the anchor of the
+            sample clock, lost)
+        """
+        if self.packets and self.packets[0][0] != first_sample:
+            # The stream was restarted from another sample
+            self.packets.clear()
+            self.last_release = -np.inf
+        if not self.packets:
+            self.plan(first_sample)
+        _, size, release, lost, _ = self.packets[0]
+        return size, release, lost
+
+    def pop(self, now):
+        """ Removes the next packet once it has been delivered at time now
+        (relative to the anchor of the sample clock) and updates the
+        counters. """
+        first_sample, size, release, lost, burst = self.packets.popleft()
+        if lost:
+            self.counters['packets_lost'] += 1
+            self.counters['samples_lost'] += size
+        else:
+            self.counters['packets_sent'] += 1
+        if burst:
+            self.counters['burst_packets'] += 1
+        delay = 1000 * (now - (first_sample + size - 1) / self.fs)
+        if release > (first_sample + size - 1) / self.fs:
+            self.counters['delayed_packets'] += 1
+        self.counters['max_delay_ms'] = max(self.counters['max_delay_ms'],
+                                            delay)
+
+    def get_state(self):
+        """ Returns a snapshot of the state of the model, which can be
+        restored with set_state (see checkpoint.py). """
+        return {'rng': self.rng.bit_generator.state,
+                'packets': [list(p) for p in self.packets],
+                'last_release': self.last_release,
+                'counters': dict(self.counters)}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['rng']
+        self.packets = collections.deque(tuple(p) for p in state['packets'])
+        self.last_release = state['last_release']
+        self.counters = dict(state['counters'])
+
+    def get_counters(self):
+        return dict(self.counters)
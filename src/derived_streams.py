@@ -0,0 +1,341 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Companion streams computed from the chunks pushed by SignalGenerator, each
+published through its own LSL outlet:
+    - "decimated": the signal lowpass filtered and downsampled with a CIC
+      filter (cascaded boxcars).
+    - "bandpower": power of each channel in frequency bands, by complex
+      demodulation and boxcar smoothing.
+    - "mean": mean of the channels.
+They are selected with the derived_settings of SignalGenerator, a list of
+dicts with key "type" and the parameters of the stream, e.g.:
+
+    [{"type": "decimated", "factor": 4},
+     {"type": "bandpower", "bands": {"alpha": [8, 13]}, "rate": 10}]
+
+The filters are stateful, so each chunk is processed once, with a cost
+proportional to its length, and the output does not depend on the chunk
+size. The timestamps are corrected for the delay of the filters.
+"""
+
+from pylsl import StreamInfo
+import numpy as np
+from sinks import LSLSink
+
+# Registry of derived streams: type -> factory(stream, settings)
+DERIVED_STREAMS = dict()
+
+DEFAULT_BANDS = {'theta': (4, 8), 'alpha': (8, 13), 'beta': (13, 30)}
+
+
+def register_derived(name):
+    """ Decorator that registers a derived stream class under name. The
+    class must implement from_settings(stream, settings). """
+    def decorator(cls):
+        DERIVED_STREAMS[name] = cls.from_settings
+        return cls
+    return decorator
+
+
+def create_derived_stream(settings, stream):
+    """ Creates a derived stream.
+
+    Parameters
+    ------------
+    settings : dict
+        Key "type" selects the derived stream, key "name" sets its suffix
+        (by default, the type), and the rest are its parameters.
+    stream : SignalGenerator
+        Stream it is derived from.
+
+    Returns
+    ------------
+    DerivedStream
+        New derived stream, whose outlet is not open yet.
+    """
+    settings = dict(settings)
+    derived_type = settings.pop('type')
+    if derived_type not in DERIVED_STREAMS:
+        raise ValueError('Unknown derived stream: %s' % derived_type)
+    return DERIVED_STREAMS[derived_type](stream, settings)
+
+
+class DelayLine:
+    """ Integer delay of delay samples, applied incrementally. The last
+    delay inputs are kept in a preallocated ring, so the cost of each chunk
+    is proportional to its length. """
+
+    def __init__(self, delay, n_cols, dtype=float):
+        self.history = np.zeros((delay, n_cols), dtype=dtype)
+        self.pos = 0    # Slot of the oldest input
+
+    def process(self, x):
+        delay = self.history.shape[0]
+        if delay == 0:
+            return x
+        n = x.shape[0]
+        m = min(n, delay)
+        out = np.empty_like(x)
+        out[:m] = self.history[(self.pos + np.arange(m)) % delay]
+        out[m:] = x[:n - m]
+        self.history[(self.pos + np.arange(n - m, n)) % delay] = x[n - m:]
+        self.pos = (self.pos + n) % delay
+        return out
+
+
+class BoxcarCascade:
+    """ Cascade of order moving averages of length samples, applied
+    incrementally as integrator/comb pairs: each stage keeps the running
+    sum of its last length inputs, which is updated with the difference
+    between each input and the one length samples before (see DelayLine),
+    so the cost of each chunk is proportional to its length. The sums are
+    recomputed from the inputs every resync_samples, so they do not
+    accumulate rounding errors over time. The transfer function is that of
+    a CIC filter normalized to unit gain, with a delay of order * (length -
+    1) / 2 samples. """
+
+    def __init__(self, length, order, n_cols, dtype=float,
+                 resync_samples=65536):
+        self.length = length
+        self.combs = [DelayLine(length, n_cols, dtype) for _ in range(order)]
+        self.sums = np.zeros((order, n_cols), dtype=dtype)
+        # The resync costs length samples, so it is amortized over as many
+        self.resync_samples = max(resync_samples, length)
+        self.n_since_resync = 0
+
+    @property
+    def delay(self):
+        return len(self.combs) * (self.length - 1) / 2
+
+    def process(self, x):
+        self.n_since_resync += x.shape[0]
+        resync = self.n_since_resync >= self.resync_samples
+        if resync:
+            self.n_since_resync = 0
+        for i, comb in enumerate(self.combs):
+            sums = np.cumsum(x - comb.process(x), axis=0)
+            sums += self.sums[i]
+            if sums.shape[0] > 0:
+                self.sums[i] = comb.history.sum(axis=0) if resync \
+                    else sums[-1]
+            x = sums / self.length
+        return x
+
+
+class DerivedStream:
+    """ Base class of the derived streams. Subclasses implement compute,
+    which returns the output samples of a chunk and the index of the input
+    sample that the last one corresponds to.
+
+    Parameters
+    ------------
+    stream : SignalGenerator
+        Stream it is derived from.
+    suffix : str
+        Suffix of the name and source id of the outlet.
+    rate : float
+        Nominal rate of the output.
+    labels : list
+        Labels of the output channels.
+    units : str
+        Units of the output channels.
+    delay : float
+        Delay (input samples) of the output with respect to the input,
+        subtracted from the timestamps.
+    """
+
+    def __init__(self, stream, suffix, rate, labels, units, delay=0.0):
+        self.name = '%s_%s' % (stream.stream_name, suffix)
+        self.source_id = '%s_%s' % (stream.source_id, suffix)
+        self.stream_type = stream.stream_type
+        self.fs = stream.sample_rate
+        self.rate = rate
+        self.labels = list(labels)
+        self.units = units
+        self.delay = delay
+        self.chunk_size = max(int(round(stream.chunk_size * rate / self.fs)),
+                              1)
+        self.sink = None
+        self.n_samples = 0
+
+    def get_lsl_info(self):
+        lsl_info = StreamInfo(name=self.name, type=self.stream_type,
+                              channel_count=len(self.labels),
+                              nominal_srate=self.rate,
+                              channel_format='float32',
+                              source_id=self.source_id)
+        channels = lsl_info.desc().append_child("channels")
+        for l in self.labels:
+            channels.append_child("channel") \
+                .append_child_value("label", l) \
+                .append_child_value("units", self.units) \
+                .append_child_value("type", self.stream_type)
+        return lsl_info
+
+    def open(self):
+        self.sink = LSLSink(self.get_lsl_info(), self.chunk_size)
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    # Running in SignalGenerator_IO_Thread
+    def process(self, chunk, first_sample, first_timestamp):
+        """ Computes the output of a chunk of the stream and pushes it.
+
+        Parameters
+        ------------
+        chunk : ndarray [samples x channels]
+            Data channels of the chunk.
+        first_sample : int
+            Index of the first sample of the chunk.
+        first_timestamp : float
+            LSL timestamp of the first sample of the chunk.
+        """
+        data, last = self.compute(np.asarray(chunk, dtype=float),
+                                  first_sample)
+        if data.shape[0] == 0 or self.sink is None:
+            return
+        timestamp = first_timestamp + \
+            (last - first_sample - self.delay) / self.fs
+        self.sink.push(np.ascontiguousarray(data, dtype=np.float32),
+                       self.n_samples, timestamp)
+        self.n_samples += data.shape[0]
+
+    def compute(self, chunk, first_sample):
+        """ Returns the output samples [samples x channels] of the chunk
+        and the index of the input sample of the last one. """
+        raise NotImplementedError
+
+    def get_status(self):
+        return {'name': self.name, 'rate': self.rate,
+                'samples': self.n_samples}
+
+
+class DecimationPhase:
+    """ Selects every factor-th sample of a stream processed in chunks. """
+
+    def __init__(self, factor):
+        self.factor = factor
+
+    def select(self, n, first_sample):
+        """ Positions in a chunk of n samples of the selected samples, which
+        are the last one of each block of factor samples. """
+        offset = (-first_sample - 1) % self.factor
+        return np.arange(offset, n, self.factor)
+
+
+@register_derived('decimated')
+class DecimatedStream(DerivedStream):
+    """ Signal downsampled by factor, after a CIC lowpass of order stages
+    (see BoxcarCascade) that attenuates the aliases. As in hardware CIC
+    decimators, the passband is not flat: e.g., with factor 4 and order 3,
+    a tone at 4% of the input rate is attenuated by 1 dB. """
+
+    def __init__(self, stream, factor=4, order=3, suffix='decimated'):
+        self.filter = BoxcarCascade(factor, order, stream.n_cha)
+        self.phase = DecimationPhase(factor)
+        super().__init__(stream, suffix, stream.sample_rate / factor,
+                         stream.l_cha, stream.units, self.filter.delay)
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        settings.setdefault('suffix', settings.pop('name', 'decimated'))
+        return cls(stream, **settings)
+
+    def compute(self, chunk, first_sample):
+        filtered = self.filter.process(chunk)
+        idx = self.phase.select(chunk.shape[0], first_sample)
+        last = first_sample + idx[-1] if idx.size else first_sample
+        return filtered[idx], last
+
+
+@register_derived('bandpower')
+class BandPowerStream(DerivedStream):
+    """ Power of each channel in frequency bands. Each band is shifted to
+    0 Hz by multiplying the signal by a complex carrier at its center, and
+    lowpass filtered with a cascade of boxcars of length fs / bandwidth, so
+    the power of the band is 2 * |z| ** 2 (the power of a sinusoid of
+    amplitude A in the band is A ** 2 / 2). The bands are aligned to the
+    one with the longest delay and downsampled to about rate Hz. The output
+    channels are "<channel>_<band>", grouped by channel.
+
+    Parameters
+    ------------
+    bands : dict or None
+        Bands {name: (low, high)} in Hz. If None, DEFAULT_BANDS.
+    rate : float
+        Approximate output rate (Hz).
+    order : int
+        Number of boxcars of each band.
+    """
+
+    def __init__(self, stream, bands=None, rate=10.0, order=2,
+                 suffix='bandpower'):
+        bands = DEFAULT_BANDS if bands is None else bands
+        fs = stream.sample_rate
+        self.band_names = list(bands)
+        self.centers = np.array([0.5 * (bands[b][0] + bands[b][1])
+                                 for b in self.band_names])
+        self.filters = [
+            BoxcarCascade(max(int(round(fs / (bands[b][1] - bands[b][0]))),
+                              1), order, stream.n_cha, dtype=complex)
+            for b in self.band_names]
+        max_delay = max(f.delay for f in self.filters)
+        self.delay_lines = [DelayLine(int(round(max_delay - f.delay)),
+                                      stream.n_cha) for f in self.filters]
+        factor = max(int(round(fs / rate)), 1)
+        self.phase = DecimationPhase(factor)
+        labels = ['%s_%s' % (l, b) for l in stream.l_cha
+                  for b in self.band_names]
+        super().__init__(stream, suffix, fs / factor, labels,
+                         '%s^2' % stream.units, max_delay)
+        self.n_cha = stream.n_cha
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        settings.setdefault('suffix', settings.pop('name', 'bandpower'))
+        return cls(stream, **settings)
+
+    def compute(self, chunk, first_sample):
+        n = chunk.shape[0]
+        idx = self.phase.select(n, first_sample)
+        out = np.empty((idx.size, self.n_cha, len(self.band_names)))
+        # Carrier phases derived from the absolute sample index
+        samples = first_sample + np.arange(n)
+        for i, center in enumerate(self.centers):
+            carrier = np.exp(-2j * np.pi * ((center * samples / self.fs) % 1))
+            z = self.filters[i].process(chunk * carrier[:, None])
+            power = self.delay_lines[i].process(2 * (z.real ** 2 +
+                                                     z.imag ** 2))
+            out[:, :, i] = power[idx]
+        last = first_sample + idx[-1] if idx.size else first_sample
+        return out.reshape(idx.size, len(self.labels)), last
+
+
+@register_derived('mean')
+class ChannelMeanStream(DerivedStream):
+    """ Mean of the channels (or of the given channel labels), at the rate
+    of the stream. """
+
+    def __init__(self, stream, channels=None, suffix='mean'):
+        if channels is None:
+            self.idx = np.arange(stream.n_cha)
+        else:
+            self.idx = np.array([list(stream.l_cha).index(c)
+                                 for c in channels])
+        super().__init__(stream, suffix, stream.sample_rate, ['MEAN'],
+                         stream.units)
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        settings.setdefault('suffix', settings.pop('name', 'mean'))
+        return cls(stream, **settings)
+
+    def compute(self, chunk, first_sample):
+        return chunk[:, self.idx].mean(axis=1, keepdims=True), \
+            first_sample + chunk.shape[0] - 1
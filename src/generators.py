@@ -0,0 +1,1279 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Signal generators. Every generator derives from BaseGenerator and implements
+the same batch contract, fill(out, start_sample), which writes the samples
+starting at start_sample into a caller-owned array. Generators are registered
+by name (the name shown in the GUI) with the register_generator decorator, and
+created from the generator settings with create_generator.
+"""
+
+import numpy as np
+from spectral_synthesis import SpectralSynthesizer
+
+# Registry of generators: name -> factory(fs, n_cha, l_cha, settings)
+GENERATORS = dict()
+
+
+def register_generator(name):
+    """ Decorator that registers a generator under the given name. It can
+    decorate a factory function with signature (fs, n_cha, l_cha, settings),
+    or a generator class, in which case its from_settings classmethod is
+    used as factory.
+    """
+    def decorator(obj):
+        if name in GENERATORS:
+            raise ValueError('Generator %s already registered' % name)
+        GENERATORS[name] = getattr(obj, 'from_settings', obj)
+        return obj
+    return decorator
+
+
+def get_generator_names():
+    """ Returns the names of the registered generators. """
+    return list(GENERATORS.keys())
+
+
+def create_generator(gen_settings, fs, n_cha, l_cha=None):
+    """ Creates the generator selected in the settings.
+
+    Parameters
+    ------------
+    gen_settings : dict
+        Generator settings. Key "gen_type" selects the generator, and the
+        rest of the keys are passed to its factory. Key "seed" sets the seed
+        of its random number generator.
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    l_cha : list or None
+        Channel labels.
+
+    Returns
+    ------------
+    BaseGenerator
+        New generator.
+    """
+    gen_type = gen_settings["gen_type"]
+    if gen_type not in GENERATORS:
+        raise ValueError("Unknown generator value: %s!" % gen_type)
+    return GENERATORS[gen_type](fs, n_cha, l_cha, gen_settings)
+
+
+def read_circular(buffer, start, out):
+    """ Copies len(out) samples of a circular buffer into out, starting at
+    sample start. The buffer must be at least as long as out.
+
+    Returns
+    ------------
+    int
+        Position of the next sample to read.
+    """
+    n_samples = out.shape[0]
+    n_first = min(n_samples, buffer.shape[0] - start)
+    out[:n_first] = buffer[start:start + n_first]
+    if n_first < n_samples:
+        out[n_first:] = buffer[:n_samples - n_first]
+    return (start + n_samples) % buffer.shape[0]
+
+
+def crossfade_loop(noise, n_samples):
+    """ Turns a noise segment into a seamless loop of n_samples. The extra
+    samples after n_samples are crossfaded, with equal-power weights, into
+    the beginning of the loop, so that the last sample of the loop is
+    followed by a natural continuation.
+
+    Parameters
+    ------------
+    noise : ndarray [samples x channels]
+        Noise segment. Its length minus n_samples determines the length of
+        the crossfade.
+    n_samples : int
+        Length of the loop.
+
+    Returns
+    ------------
+    ndarray: [samples x channels]
+        Loop.
+    """
+    n_fade = min(noise.shape[0] - n_samples, n_samples)
+    loop = np.array(noise[:n_samples])
+    if n_fade > 0:
+        phase = 0.5 * np.pi * (np.arange(n_fade) + 0.5) / n_fade
+        loop[:n_fade] = noise[:n_fade] * np.sin(phase)[:, None] + \
+            noise[n_samples:n_samples + n_fade] * np.cos(phase)[:, None]
+    return loop
+
+
+class BaseGenerator:
+    """ Base class of the signal generators. Subclasses implement _fill,
+    which receives a float64 C-contiguous array; fill takes care of arrays
+    of other types or layouts through a reusable work buffer, so that
+    generating a chunk does not require new allocations. Stateful
+    generators (e.g., noise with memory) expect consecutive calls to cover
+    consecutive samples.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    # If True, the signal cannot be prerendered (e.g., it changes in
+    # response to closed-loop commands) and is always generated on the fly
+    streaming_only = False
+
+    def __init__(self, fs, n_cha, seed=None):
+        self.fs = fs
+        self.n_cha = n_cha
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.current_sample = 0
+        self._work = np.empty((0, n_cha))
+        self._ramp = np.arange(0, dtype=float)
+        self._scratch = np.empty(0)
+        self._sine = np.empty(0)
+
+    @property
+    def current_time(self):
+        return self.current_sample / self.fs
+
+    def fill(self, out, start_sample):
+        """ Writes the samples [start_sample, start_sample + len(out)) into
+        out.
+
+        Parameters
+        ------------
+        out : ndarray [samples x channels]
+            Caller-owned array.
+        start_sample : int
+            Index of the first sample.
+        """
+        if out.dtype == np.float64 and out.flags.c_contiguous:
+            self._fill(out, start_sample)
+        else:
+            work = self.get_work_buffer(out.shape[0])
+            self._fill(work, start_sample)
+            out[...] = work
+        self.current_sample = start_sample + out.shape[0]
+
+    def _fill(self, out, start_sample):
+        raise NotImplementedError
+
+    def get_work_buffer(self, n_samples):
+        """ Returns a reusable float64 buffer [samples x channels]. """
+        if self._work.shape[0] < n_samples:
+            self._work = np.empty((n_samples, self.n_cha))
+        return self._work[:n_samples]
+
+    def get_scratch_buffer(self, n_samples, n_cols=None):
+        """ Returns a reusable float64 buffer [samples x n_cols] (by default,
+        the number of channels) for the temporaries of _fill. Unlike the
+        buffer of get_work_buffer, it may be used while filling it. """
+        n_cols = self.n_cha if n_cols is None else n_cols
+        if self._scratch.shape[0] < n_samples * n_cols:
+            self._scratch = np.empty(n_samples * n_cols)
+        return self._scratch[:n_samples * n_cols].reshape(n_samples, n_cols)
+
+    def get_ramp(self, n_samples):
+        """ Returns a reusable ramp 0, 1, ..., n_samples - 1. """
+        if self._ramp.shape[0] < n_samples:
+            self._ramp = np.arange(n_samples, dtype=float)
+        return self._ramp[:n_samples]
+
+    def get_periodic_freqs(self):
+        """ Frequencies (Hz) of the periodic components of the signal, used
+        to compute phase-coherent loop lengths. """
+        return list()
+
+    def get_state(self):
+        """ Returns a snapshot of the state of the generator, which can be
+        restored with set_state (see checkpoint.py). The phases of the
+        periodic components are derived from the sample index, so they are
+        not part of the state. """
+        return {'rng': self.rng.bit_generator.state,
+                'current_sample': self.current_sample}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['rng']
+        self.current_sample = state['current_sample']
+
+    def switch_state(self, state, start_sample):
+        """ Switches the signal to another state (e.g., a brain state) from
+        start_sample on, in response to a closed-loop command (see
+        TriggerListener). Only the streaming render mode reflects the
+        change, since the other modes read prerendered buffers.
+
+        Parameters
+        ------------
+        state : str
+            Name of the state.
+        start_sample : int
+            Index of the first sample in the new state.
+
+        Returns
+        ------------
+        bool
+            False if the generator does not have the state.
+        """
+        return False
+
+    def get_chunk(self, chunk_size):
+        """ Function to get a new chunk.
+
+        Parameters
+        ------------
+        chunk_size : int
+            Chunk size in samples.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Generated chunk.
+        """
+        chunk = np.empty((chunk_size, self.n_cha))
+        self.fill(chunk, self.current_sample)
+        return chunk
+
+    def get_chunks(self, n_chunks, chunk_size):
+        """ Function to generate several chunks at once.
+
+        Parameters
+        ------------
+        n_chunks : int
+            Number of chunks to generate
+        chunk_size : int
+            Chunk size in samples.
+
+        Returns
+        ------------
+        ndarray: [n_chunks x samples x channels]
+            Generated chunks.
+        """
+        data = np.empty((n_chunks, chunk_size, self.n_cha))
+        for i in range(n_chunks):
+            self.fill(data[i], self.current_sample)
+        return data
+
+    def get_loop(self, n_samples, crossfade_samples):
+        """ Function to generate a buffer that can be looped seamlessly.
+        By default, the first n_samples are rendered, which is seamless for
+        memoryless and periodic signals if n_samples is a whole number of
+        periods (see get_periodic_freqs).
+
+        Parameters
+        ------------
+        n_samples : int
+            Length of the loop in samples.
+        crossfade_samples : int
+            Length of the crossfade in samples.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Generated loop.
+        """
+        loop = np.empty((n_samples, self.n_cha))
+        self.fill(loop, 0)
+        return loop
+
+    def add_sine(self, out, start_sample, freq, amplitude, weights=None):
+        """ Adds a sinusoid to out in-place, computing its phase from the
+        absolute sample index so that it does not lose precision over time.
+        """
+        n = out.shape[0]
+        phase = 2 * np.pi * ((freq * start_sample / self.fs) % 1)
+        if self._sine.shape[0] < n:
+            self._sine = np.empty(n)
+        sine = np.multiply(self.get_ramp(n), 2 * np.pi * freq / self.fs,
+                           out=self._sine[:n])
+        sine += phase
+        np.sin(sine, out=sine)
+        sine *= amplitude
+        if weights is None:
+            out += sine[:, None]
+        else:
+            out += np.multiply(sine[:, None], weights,
+                               out=self.get_scratch_buffer(n))
+
+
+@register_generator("Uniform")
+class UniformGenerator(BaseGenerator):
+    """ Uniform signal generator.
+
+    Parameters
+    ------------
+    n_cha:  int
+        Number of channels.
+    mean: float
+        Mean of the output signal.
+    std: float
+        Standard deviation of the output signal.
+    fs : float
+        Sampling rate.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    def __init__(self, n_cha, mean=0.0, std=1.0, fs=1.0, seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.mean = mean
+        self.std = std
+
+    @classmethod
+    def from_settings(cls, fs, n_cha, l_cha, settings):
+        return cls(n_cha=n_cha, mean=settings.get("uniform_mean", 0.0),
+                   std=settings.get("uniform_std", 1.0), fs=fs,
+                   seed=settings.get("seed", None))
+
+    def _fill(self, out, start_sample):
+        self.rng.standard_normal(out=out)
+        out *= self.std
+        out += self.mean
+
+
+class OnlinePinkNoise:
+    """ Pink noise generated in the time domain with the Voss-McCartney
+    algorithm (see EEGGenerator.generate_online_pink), suitable for the
+    real-time generation of a small number of samples. The arrays of the
+    algorithm are kept between calls, so that filling a chunk does not
+    allocate new ones once they have grown to its size.
+
+    Parameters
+    ------------
+    ncols : int
+        Number of random sources to add.
+    amp : float
+        Amplitude to normalize the pink noise.
+    rng : numpy.random.Generator or None
+        Random number generator.
+    """
+
+    def __init__(self, ncols=16, amp=18, rng=None):
+        self.ncols = ncols
+        self.amp = amp
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self._allocate(0)
+
+    def _allocate(self, nrows):
+        self.values = np.empty((nrows, self.ncols))
+        # Flags as integers, so they are multiplied without casting
+        self.changed = np.empty((nrows, self.ncols), dtype=np.int64)
+        self.last = np.empty((nrows, self.ncols), dtype=np.int64)
+        # Index of each value in the flattened array, as a full array since
+        # broadcasting would allocate
+        self.flat_index = np.arange(nrows * self.ncols,
+                                    dtype=np.int64).reshape(nrows, self.ncols)
+        self.uniform = np.empty(nrows)
+        self.rows = np.empty(nrows, dtype=np.int64)
+        self.cols = np.empty(nrows, dtype=np.int64)
+        self.gathered = np.empty((nrows, self.ncols))
+
+    def fill(self, out):
+        """ Writes pink noise into the 1D float64 array out. """
+        nrows = out.shape[0]
+        if self.values.shape[0] < nrows:
+            self._allocate(nrows)
+        values = self.values[:nrows]
+        changed = self.changed[:nrows]
+        last = self.last[:nrows]
+        uniform = self.uniform[:nrows]
+        rows, cols = self.rows[:nrows], self.cols[:nrows]
+
+        # Every source takes a new value at the first row, and the first
+        # source at every row. The values of the rows where a source does
+        # not change are never read
+        self.rng.random(out=values)
+        changed.fill(0)
+        changed[0] = 1
+        changed[:, 0] = 1
+
+        # nrows changes of the other sources, the source of each change
+        # drawn from a geometric distribution of parameter 0.5
+        self.rng.random(out=uniform)
+        np.subtract(1, uniform, out=uniform)
+        np.log2(uniform, out=uniform)
+        np.negative(uniform, out=uniform)
+        np.ceil(uniform, out=uniform)
+        np.minimum(uniform, self.ncols, out=uniform)
+        np.copyto(cols, uniform, casting='unsafe')
+        cols[cols >= self.ncols] = 0
+        self.rng.random(out=uniform)
+        uniform *= nrows
+        np.copyto(rows, uniform, casting='unsafe')
+        changed[rows, cols] = 1
+
+        # Forward fill of each source: index (in the flattened values) of
+        # its last change up to each row, which is the largest one
+        np.multiply(changed, self.flat_index[:nrows], out=last)
+        np.maximum.accumulate(last, axis=0, out=last)
+        gathered = self.gathered[:nrows]
+        np.take(values.reshape(-1), last, out=gathered, mode='clip')
+        np.sum(gathered, axis=1, out=out)
+        out *= self.amp
+
+
+class EEGGenerator(BaseGenerator):
+    """ Synthetic EEG generator.
+
+    Parameters
+    --------------
+    fs : float
+        Sampling rate.
+    n_cha: float
+        Number of channels.
+    tones : list()
+        List of the tones to include in the signal, each one represented by a
+        tuple containing (target frequency in Hz, amplitude).
+    pink_method: basestring
+        If "real-time", the pink noise is online generated using the
+        Voss-McCartney algorithm. If "offline", the pink noise is generated
+        using the inverse FFT, stored offline and then played each time a
+        chunk is requested. If "spectral", the background noise is
+        synthesized in streaming with overlap-added inverse FFT blocks (see
+        SpectralSynthesizer), following the target PSD.
+    psd : callable, tuple or None
+        Target PSD of the "spectral" method (e.g., fitted from a real
+        recording using spectral_synthesis.estimate_psd). If None, 1/f noise
+        is generated.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    def __init__(self, fs, n_cha, tones=None, pink_method="real-time",
+                 psd=None, seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.tones = tones
+        self.pink_method = pink_method
+        if tones is None:
+            self.tones = list()
+            self.tones.append((10, 11))
+            self.tones.append((20, 7))
+            self.tones.append((50, 12))
+            self.tones.append((100, 7))
+        if self.pink_method not in ("offline", "spectral"):
+            self.pink_method = "real-time"
+
+        # If method is offline, then generate a big stream of pink noise
+        self.pink_noise = None
+        self.pink_noise_sample = 0
+        if self.pink_method == "offline":
+            NO_SECS = 20
+            CROSSFADE_SECS = 0.5
+            n_samples = int(NO_SECS * self.fs)
+            n_total = n_samples + int(CROSSFADE_SECS * self.fs)
+            noise_ = self.generate_offline_pink(n_total * self.n_cha,
+                                                rng=self.rng)
+            self.pink_noise = crossfade_loop(
+                noise_.reshape(n_total, int(self.n_cha)), n_samples)
+
+        # If method is real-time, the buffers of the algorithm are reused
+        self.online_pink = None
+        if self.pink_method == "real-time":
+            self.online_pink = OnlinePinkNoise(rng=self.rng)
+
+        # If method is spectral, noise is synthesized block by block
+        self.synthesizer = None
+        if self.pink_method == "spectral":
+            self.synthesizer = SpectralSynthesizer(
+                fs=self.fs, n_cha=self.n_cha, psd=psd, rng=self.rng)
+
+    def get_periodic_freqs(self):
+        return [tone[0] for tone in self.tones]
+
+    def get_state(self):
+        state = super().get_state()
+        state['pink_noise_sample'] = self.pink_noise_sample
+        if self.pink_noise is not None:
+            state['pink_noise'] = self.pink_noise
+        if self.synthesizer is not None:
+            state['synthesizer'] = self.synthesizer.get_state()
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.pink_noise_sample = state['pink_noise_sample']
+        if self.pink_noise is not None:
+            self.pink_noise = state['pink_noise']
+        if self.synthesizer is not None:
+            self.synthesizer.set_state(state['synthesizer'])
+
+    def _fill(self, out, start_sample):
+        # Get the pink noise (1/f) and add each tone
+        self.fill_noise(out)
+        self.add_tones(out, start_sample)
+
+    def fill_noise(self, out):
+        """ Writes the next chunk of background (pink) noise into out.
+
+        Parameters
+        ------------
+        out : ndarray [samples x channels]
+            Array to write the noise into.
+        """
+        chunk_size = out.shape[0]
+        if self.pink_method == "offline":
+            if chunk_size > self.pink_noise.shape[0]:
+                raise ValueError("The chunk size (%i) is greater than the "
+                                 "offline generated pink noise length (%i)! "
+                                 "Increment manually the NO_SECS variable" %
+                                 (chunk_size, self.pink_noise.shape[0]))
+            # The offline noise is crossfaded at its seam, so it is read
+            # circularly
+            self.pink_noise_sample = read_circular(
+                self.pink_noise, self.pink_noise_sample, out)
+        elif self.pink_method == "spectral":
+            self.synthesizer.get(chunk_size, out=out)
+        else:
+            # Real-time generation using Voss-McCartney algorithm, straight
+            # into out if it is C-contiguous
+            if out.flags.c_contiguous:
+                self.online_pink.fill(out.reshape(-1))
+            else:
+                noise = np.empty(chunk_size * self.n_cha)
+                self.online_pink.fill(noise)
+                out[:] = noise.reshape(chunk_size, self.n_cha)
+
+    def get_noise(self, chunk_size):
+        """ Function to get the next chunk of background (pink) noise.
+
+        Parameters
+        ------------
+        chunk_size : int
+            Chunk size in samples.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Generated noise.
+        """
+        chunk = np.empty((chunk_size, self.n_cha))
+        self.fill_noise(chunk)
+        return chunk
+
+    def add_tones(self, out, start_sample):
+        """ Adds the tones to a chunk in-place.
+
+        Parameters
+        ------------
+        out : ndarray [samples x channels]
+            Chunk to modify.
+        start_sample : int
+            Index of the first sample of the chunk.
+        """
+        for tone in self.tones:
+            self.add_sine(out, start_sample, tone[0], tone[1])
+
+    def get_loop(self, n_samples, crossfade_samples):
+        """ Function to generate a buffer that can be looped seamlessly:
+        n_samples must be a whole number of periods of every tone (see
+        get_loop_length), and the noise is crossfaded at the seam.
+
+        Parameters
+        ------------
+        n_samples : int
+            Length of the loop in samples.
+        crossfade_samples : int
+            Length of the crossfade of the noise in samples.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Generated loop.
+        """
+        noise = self.get_noise(n_samples + crossfade_samples)
+        chunk = crossfade_loop(noise, n_samples)
+        self.add_tones(chunk, 0)
+        return chunk
+
+    @staticmethod
+    def generate_offline_pink(no_samples, exponent=0.51, amplitude=30,
+                              rng=None):
+        """ Function to generate an offline stream of pink noise. Based on
+        the EEG simulator of https://github.com/pennmem/eegsim. It generates
+        a desired shape in the frequency domain and performs a IFFT to get
+        the temporal counterpart. Not suitable for a small number of samples.
+
+        Parameters
+        -------------
+        no_samples : int
+            Number of samples to generate
+        exponent : float
+            Exponent to normalize the scales.
+        amplitude : int
+            Amplitude to normalize the pink noise.
+        rng : numpy.random.Generator or None
+            Random number generator.
+
+        Returns
+        ----------
+        ndarray: (samples, )
+            Generated pink noise signal.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        out_n = int(no_samples)
+        n = int(no_samples) + 1 if int(no_samples) & 1 == 1 else int(no_samples)
+        scales = np.linspace(0, 0.5, n // 2 + 1)[1:]
+        scales = scales ** (-exponent / 2)
+        pink_freq = rng.normal(scale=scales) * \
+                    np.exp(2j * np.pi * rng.random(n // 2))
+        fdata = np.concatenate([[0], pink_freq])
+        sigma = np.sqrt(2 * np.sum(scales ** 2)) / n
+        data = amplitude * np.real(np.fft.irfft(fdata)) / sigma
+        return data[:out_n]
+
+    @staticmethod
+    def generate_online_pink(nrows, ncols=16, amp=18, rng=None):
+        """ Generates pink noise using the Voss-McCartney algorithm.
+        Extracted from https://www.dsprelated.com/showarticle/908.php. This
+        method computes the pink noise directly on the temporal domain,
+        so it is suitable for a real-time generation of a small number of
+        samples.
+
+        Parameters
+        -----------
+        nrows: int
+            Number of samples
+        ncols: int
+            Number of random sources to add
+        amp: int
+            Amplitude to normalize the pink noise.
+        rng : numpy.random.Generator or None
+            Random number generator.
+
+        Returns
+        -------------
+        ndarray: (samples, )
+            Generated pink noise signal.
+        """
+        out = np.empty(int(nrows))
+        OnlinePinkNoise(ncols, amp, rng).fill(out)
+        return out
+
+
+@register_generator("EEG (closed eyes)")
+def eeg_closed_eyes(fs, n_cha, l_cha, settings):
+    tones = list()
+    tones.append((10, 11))
+    tones.append((20, 7))
+    if settings.get("eeg_ac", True):
+        tones.append((50, 12))
+        tones.append((100, 7))
+    return EEGGenerator(fs=fs, n_cha=n_cha, tones=tones,
+                        pink_method=settings.get("eeg_pink", "real-time"),
+                        psd=settings.get("eeg_psd", None),
+                        seed=settings.get("seed", None))
+
+
+@register_generator("EEG (open eyes)")
+def eeg_open_eyes(fs, n_cha, l_cha, settings):
+    tones = list()
+    if settings.get("eeg_ac", True):
+        tones.append((50, 12))
+        tones.append((100, 7))
+    return EEGGenerator(fs=fs, n_cha=n_cha, tones=tones,
+                        pink_method=settings.get("eeg_pink", "real-time"),
+                        psd=settings.get("eeg_psd", None),
+                        seed=settings.get("seed", None))
+
+
+# Default brain states: amplitude of the tones (Hz: amplitude), exponent and
+# standard deviation of the background 1/f noise, and mean dwell time (s)
+BRAIN_STATES = {
+    'eyes_open': {'tones': {10: 3, 20: 2}, 'exponent': 0.51,
+                  'amplitude': 30, 'dwell': 30},
+    'eyes_closed': {'tones': {10: 11, 20: 7}, 'exponent': 0.51,
+                    'amplitude': 30, 'dwell': 30},
+    'drowsy': {'tones': {6: 8, 10: 4}, 'exponent': 0.8, 'amplitude': 35,
+               'dwell': 20},
+    'motor_imagery': {'tones': {10: 4, 20: 2}, 'exponent': 0.51,
+                      'amplitude': 30, 'dwell': 4}
+}
+
+
+@register_generator("EEG (brain states)")
+class BrainStateGenerator(BaseGenerator):
+    """ Non-stationary EEG generator. The signal alternates between brain
+    states (e.g., eyes open, eyes closed, drowsy and motor imagery) following
+    a semi-Markov chain: the dwell time in each state is drawn from a gamma
+    distribution with the mean of the state, and the next state from the
+    transition probabilities. Each state sets the amplitude of the tones and
+    the slope and amplitude of the background noise, which approach the new
+    values exponentially after each transition, so the changes are smooth.
+
+    The envelopes are a closed-form function of the sample index since the
+    last transition, so they are computed incrementally per chunk and do
+    not depend on the chunk size. The noise is synthesized in streaming
+    (see SpectralSynthesizer), with its PSD updated at each chunk. States
+    can also be switched by closed-loop commands (see switch_state), so
+    this generator only supports the streaming render mode.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    states : dict or None
+        Definition of the states (see BRAIN_STATES). If None, the default
+        states are used.
+    transitions : dict or None
+        Transition probabilities {state: {next state: probability}}. By
+        default, every other state is equally likely.
+    initial_state : str or None
+        First state. If None, it is drawn randomly.
+    transition_secs : float
+        Time constant (s) of the transitions.
+    mains_tones : list
+        Additional constant tones (freq, amplitude), e.g. the mains noise.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    streaming_only = True
+
+    def __init__(self, fs, n_cha, states=None, transitions=None,
+                 initial_state=None, transition_secs=2.0, mains_tones=(),
+                 seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.states = dict(BRAIN_STATES) if states is None else dict(states)
+        self.state_names = sorted(self.states)
+        self.mains_tones = list(mains_tones)
+        self.tau = transition_secs * fs
+
+        # Transition probabilities
+        self.transitions = dict()
+        for name in self.state_names:
+            probs = dict((transitions or dict()).get(name, dict()))
+            if not probs:
+                probs = {s: 1.0 for s in self.state_names if s != name} or \
+                    {name: 1.0}
+            total = float(sum(probs.values()))
+            self.transitions[name] = (list(probs),
+                                      [p / total for p in probs.values()])
+
+        # Parameters of each state: exponent and amplitude of the noise and
+        # amplitude of each tone of any state
+        self.freqs = sorted({float(f) for state in self.states.values()
+                             for f in state['tones']})
+        self.params = dict()
+        for name, state in self.states.items():
+            tones = {float(f): a for f, a in state['tones'].items()}
+            self.params[name] = np.array(
+                [state.get('exponent', 0.51), state.get('amplitude', 30)] +
+                [tones.get(f, 0.0) for f in self.freqs])
+
+        # Envelopes: they go from params_from to params_to with time
+        # constant tau since the sample of the last transition
+        if initial_state is None:
+            initial_state = self.state_names[
+                self.rng.integers(len(self.state_names))]
+        if initial_state not in self.states:
+            raise ValueError('Unknown brain state: %s' % initial_state)
+        self.state = initial_state
+        self.params_from = self.params[initial_state].copy()
+        self.params_to = self.params[initial_state].copy()
+        self.transition_sample = 0
+        self.next_transition = self._draw_dwell(initial_state)
+        self.forced_state = None
+        self.n_transitions = 0
+
+        self.psd_params = self.params_to[:2].copy()
+        self.synthesizer = SpectralSynthesizer(
+            fs=fs, n_cha=n_cha, exponent=self.psd_params[0],
+            amplitude=self.psd_params[1], rng=self.rng)
+
+    @classmethod
+    def from_settings(cls, fs, n_cha, l_cha, settings):
+        mains_tones = [(50, 12), (100, 7)] if settings.get("eeg_ac", True) \
+            else []
+        return cls(fs=fs, n_cha=n_cha,
+                   states=settings.get("brain_states", None),
+                   transitions=settings.get("brain_transitions", None),
+                   initial_state=settings.get("brain_initial_state", None),
+                   transition_secs=settings.get("brain_transition_secs", 2.0),
+                   mains_tones=mains_tones, seed=settings.get("seed", None))
+
+    def get_params(self, samples):
+        """ Parameters of the envelopes at the given samples, which must be
+        after the last transition.
+
+        Returns
+        ------------
+        ndarray: [samples x parameters]
+            Exponent and amplitude of the noise and amplitude of each tone.
+        """
+        decay = np.exp(-(np.asarray(samples, dtype=float) -
+                         self.transition_sample) / self.tau)
+        return self.params_to + \
+            np.multiply.outer(decay, self.params_from - self.params_to)
+
+    def switch_state(self, state, start_sample):
+        if state not in self.states:
+            return False
+        self.forced_state = state
+        self.next_transition = start_sample
+        return True
+
+    def get_state(self):
+        state = super().get_state()
+        state.update({
+            'state': self.state,
+            'params_from': self.params_from.copy(),
+            'params_to': self.params_to.copy(),
+            'transition_sample': self.transition_sample,
+            'next_transition': self.next_transition,
+            'forced_state': self.forced_state,
+            'n_transitions': self.n_transitions,
+            'psd_params': self.psd_params.copy(),
+            'synthesizer': self.synthesizer.get_state()
+        })
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.state = state['state']
+        self.params_from = np.array(state['params_from'])
+        self.params_to = np.array(state['params_to'])
+        self.transition_sample = state['transition_sample']
+        self.next_transition = state['next_transition']
+        self.forced_state = state['forced_state']
+        self.n_transitions = state['n_transitions']
+        self.psd_params = np.array(state['psd_params'])
+        self.synthesizer.set_psd(None, *self.psd_params)
+        self.synthesizer.set_state(state['synthesizer'])
+
+    def _draw_dwell(self, state):
+        dwell = self.states[state].get('dwell', 30) * self.fs
+        return self.transition_sample + max(
+            int(round(self.rng.gamma(4.0, dwell / 4.0))), 1)
+
+    def _transition(self, sample):
+        if self.forced_state is not None:
+            new_state = self.forced_state
+            self.forced_state = None
+        else:
+            names, probs = self.transitions[self.state]
+            new_state = names[self.rng.choice(len(names), p=probs)]
+        self.params_from = self.get_params(sample)
+        self.params_to = self.params[new_state].copy()
+        self.transition_sample = sample
+        self.state = new_state
+        self.next_transition = self._draw_dwell(new_state)
+        self.n_transitions += 1
+
+    def _fill(self, out, start_sample):
+        n = out.shape[0]
+        end_sample = start_sample + n
+
+        # Background noise with the slope and amplitude at the start of the
+        # chunk; the PSD is only updated when they have changed noticeably
+        if self.next_transition <= start_sample:
+            self._transition(start_sample)
+        psd_params = self.get_params(start_sample)[:2]
+        if np.any(np.abs(psd_params - self.psd_params) >
+                  1e-3 * np.abs(self.psd_params)):
+            self.psd_params = psd_params
+            self.synthesizer.set_psd(None, *psd_params)
+        self.synthesizer.get(n, out=out)
+
+        # Tones with their envelopes, split at the transitions
+        first = start_sample
+        while first < end_sample:
+            if self.next_transition <= first:
+                self._transition(first)
+            last = min(end_sample, self.next_transition)
+            envelopes = self.get_params(np.arange(first, last))[:, 2:]
+            seg = out[first - start_sample:last - start_sample]
+            ramp = self.get_ramp(last - first)
+            for i, freq in enumerate(self.freqs):
+                phase = 2 * np.pi * ((freq * first / self.fs) % 1)
+                seg += (envelopes[:, i] * np.sin(
+                    ramp * (2 * np.pi * freq / self.fs) + phase))[:, None]
+            first = last
+        for freq, amplitude in self.mains_tones:
+            self.add_sine(out, start_sample, freq, amplitude)
+
+
+@register_generator("ECG")
+class ECGGenerator(BaseGenerator):
+    """ Synthetic ECG generator. Each beat is a PQRST complex modelled as a
+    sum of Gaussian waves, and the RR intervals follow the heart rate with a
+    random variability. Each channel (lead) has a different gain.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    heart_rate : float
+        Mean heart rate in beats per minute.
+    hrv : float
+        Standard deviation of the RR intervals relative to their mean.
+    amplitude : float
+        Amplitude of the R wave.
+    noise : float
+        Standard deviation of the additive noise.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    # (time relative to the R peak in s, amplitude relative to R, width in s)
+    WAVES = ((-0.2, 0.12, 0.025), (-0.03, -0.14, 0.01), (0.0, 1.0, 0.012),
+             (0.03, -0.22, 0.01), (0.28, 0.3, 0.045))
+
+    def __init__(self, fs, n_cha, heart_rate=60.0, hrv=0.05,
+                 amplitude=1000.0, noise=10.0, seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.heart_rate = heart_rate
+        self.hrv = hrv
+        self.noise = noise
+        t = np.arange(-int(0.35 * fs), int(0.5 * fs)) / fs
+        self.template = amplitude * sum(
+            a * np.exp(-0.5 * ((t - mu) / w) ** 2) for mu, a, w in self.WAVES)
+        self.r_offset = int(0.35 * fs)
+        self.gains = np.linspace(1.0, 0.4, n_cha) if n_cha > 1 \
+            else np.ones(1)
+        self.beats = list()
+        self.next_beat = self.r_offset
+        self.last_sample = None
+
+    @classmethod
+    def from_settings(cls, fs, n_cha, l_cha, settings):
+        return cls(fs=fs, n_cha=n_cha,
+                   heart_rate=settings.get("ecg_heart_rate", 60.0),
+                   hrv=settings.get("ecg_hrv", 0.05),
+                   amplitude=settings.get("ecg_amplitude", 1000.0),
+                   noise=settings.get("ecg_noise", 10.0),
+                   seed=settings.get("seed", None))
+
+    def get_state(self):
+        state = super().get_state()
+        state['beats'] = list(self.beats)
+        state['next_beat'] = self.next_beat
+        state['last_sample'] = self.last_sample
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.beats = list(state['beats'])
+        self.next_beat = state['next_beat']
+        self.last_sample = state['last_sample']
+
+    def _fill(self, out, start_sample):
+        if self.last_sample != start_sample:
+            # Non-consecutive call: restart the beat schedule
+            self.beats = list()
+            self.next_beat = start_sample + self.r_offset
+        end_sample = start_sample + out.shape[0]
+        self.last_sample = end_sample
+        self.rng.standard_normal(out=out)
+        out *= self.noise
+
+        # Schedule the beats that start in this chunk. The template extends
+        # after the R peak, so beats of previous chunks can still be active
+        rr = 60 * self.fs / self.heart_rate
+        while self.next_beat - self.r_offset < end_sample:
+            self.beats.append(self.next_beat)
+            self.next_beat += max(int(rr * (1 + self.hrv *
+                                            self.rng.standard_normal())), 1)
+        for r_peak in self.beats:
+            onset = r_peak - self.r_offset
+            first = max(onset, start_sample)
+            last = min(onset + self.template.shape[0], end_sample)
+            if last > first:
+                out[first - start_sample:last - start_sample] += np.outer(
+                    self.template[first - onset:last - onset], self.gains)
+        self.beats = [b for b in self.beats if b - self.r_offset +
+                      self.template.shape[0] > end_sample]
+
+    def get_loop(self, n_samples, crossfade_samples):
+        """ Loop with the beats placed circularly: the RR intervals are drawn
+        as in streaming and scaled to add up to n_samples, so the rhythm
+        continues across the seam, and the complexes that cross it wrap to
+        the beginning. The noise is white, so it does not need the
+        crossfade.
+
+        Parameters
+        ------------
+        n_samples : int
+            Length of the loop in samples.
+        crossfade_samples : int
+            Not used.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Generated loop.
+        """
+        loop = self.rng.standard_normal((n_samples, self.n_cha))
+        loop *= self.noise
+        rr = 60 * self.fs / self.heart_rate
+        intervals = np.maximum(rr * (1 + self.hrv * self.rng.standard_normal(
+            max(int(round(n_samples / rr)), 1))), 1)
+        peaks = np.cumsum(intervals) - intervals[0]
+        peaks = np.round(peaks * n_samples / intervals.sum()).astype(int)
+        offsets = np.arange(self.template.shape[0]) - self.r_offset
+        beat = np.outer(self.template, self.gains)
+        for r_peak in peaks:
+            np.add.at(loop, (r_peak + offsets) % n_samples, beat)
+        return loop
+
+
+@register_generator("EMG")
+class EMGGenerator(BaseGenerator):
+    """ Synthetic surface EMG generator: Gaussian noise whose amplitude is
+    modulated by muscle contractions. Contractions start following a Poisson
+    process and have a raised-cosine envelope.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    burst_rate : float
+        Contractions per minute.
+    burst_duration : float
+        Duration of each contraction in seconds.
+    amplitude : float
+        Standard deviation during a contraction.
+    baseline : float
+        Standard deviation at rest.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    def __init__(self, fs, n_cha, burst_rate=20.0, burst_duration=1.0,
+                 amplitude=200.0, baseline=5.0, seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.burst_rate = burst_rate
+        self.baseline = baseline
+        n = max(int(burst_duration * fs), 1)
+        self.envelope = (amplitude - baseline) * np.hanning(n)
+        self.bursts = list()
+        self.next_burst = self._draw_interval()
+
+    @classmethod
+    def from_settings(cls, fs, n_cha, l_cha, settings):
+        return cls(fs=fs, n_cha=n_cha,
+                   burst_rate=settings.get("emg_burst_rate", 20.0),
+                   burst_duration=settings.get("emg_burst_duration", 1.0),
+                   amplitude=settings.get("emg_amplitude", 200.0),
+                   baseline=settings.get("emg_baseline", 5.0),
+                   seed=settings.get("seed", None))
+
+    def get_state(self):
+        state = super().get_state()
+        state['bursts'] = list(self.bursts)
+        state['next_burst'] = self.next_burst
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.bursts = list(state['bursts'])
+        self.next_burst = state['next_burst']
+
+    def _draw_interval(self):
+        if self.burst_rate <= 0:
+            return np.inf
+        return int(np.ceil(self.rng.exponential(60 / self.burst_rate) *
+                           self.fs))
+
+    def _fill(self, out, start_sample):
+        n = out.shape[0]
+        end_sample = start_sample + n
+        self.next_burst = max(self.next_burst, start_sample)
+        while self.next_burst < end_sample:
+            self.bursts.append(self.next_burst)
+            self.next_burst += self._draw_interval()
+
+        # Amplitude envelope of the chunk
+        std = self.get_scratch_buffer(n, 1)
+        std.fill(self.baseline)
+        for onset in self.bursts:
+            first = max(onset, start_sample)
+            last = min(onset + self.envelope.shape[0], end_sample)
+            if last > first:
+                std[first - start_sample:last - start_sample, 0] += \
+                    self.envelope[first - onset:last - onset]
+        self.bursts = [b for b in self.bursts
+                       if b + self.envelope.shape[0] > end_sample]
+        self.rng.standard_normal(out=out)
+        out *= std
+
+    def get_loop(self, n_samples, crossfade_samples):
+        """ Loop with the contractions placed circularly: their onsets are
+        drawn as in streaming, and the envelopes that cross the seam wrap to
+        the beginning. The noise is white, so it does not need the
+        crossfade.
+
+        Parameters
+        ------------
+        n_samples : int
+            Length of the loop in samples.
+        crossfade_samples : int
+            Not used.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Generated loop.
+        """
+        std = np.full(n_samples, float(self.baseline))
+        offsets = np.arange(self.envelope.shape[0])
+        onset = self._draw_interval()
+        while onset < n_samples:
+            np.add.at(std, (onset + offsets) % n_samples, self.envelope)
+            onset += self._draw_interval()
+        loop = self.rng.standard_normal((n_samples, self.n_cha))
+        loop *= std[:, None]
+        return loop
+
+
+@register_generator("Accelerometer")
+class AccelerometerGenerator(BaseGenerator):
+    """ Synthetic accelerometer generator. Channels are assigned to the x,
+    y and z axes cyclically. The signal is the gravity vector, slowly
+    changing its orientation, plus a periodic movement (e.g., gait) and
+    sensor noise. Units are g.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    movement_freq : float
+        Frequency of the periodic movement in Hz.
+    movement_amplitude : float
+        Amplitude of the periodic movement in g.
+    orientation_freq : float
+        Frequency of the changes in orientation in Hz.
+    noise : float
+        Standard deviation of the sensor noise in g.
+    seed : int or None
+        Seed of the random number generator.
+    """
+
+    def __init__(self, fs, n_cha, movement_freq=1.8, movement_amplitude=0.3,
+                 orientation_freq=0.05, noise=0.01, seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.movement_freq = movement_freq
+        self.movement_amplitude = movement_amplitude
+        self.orientation_freq = orientation_freq
+        self.noise = noise
+        self.axes = np.arange(n_cha) % 3
+
+    @classmethod
+    def from_settings(cls, fs, n_cha, l_cha, settings):
+        return cls(fs=fs, n_cha=n_cha,
+                   movement_freq=settings.get("acc_movement_freq", 1.8),
+                   movement_amplitude=settings.get(
+                       "acc_movement_amplitude", 0.3),
+                   orientation_freq=settings.get("acc_orientation_freq", 0.05),
+                   noise=settings.get("acc_noise", 0.01),
+                   seed=settings.get("seed", None))
+
+    def get_periodic_freqs(self):
+        return [self.movement_freq, self.orientation_freq]
+
+    def _fill(self, out, start_sample):
+        self.rng.standard_normal(out=out)
+        out *= self.noise
+        # Gravity: tilt in the x-z plane
+        tilt = 0.3 * np.pi
+        self.add_sine(out, start_sample, self.orientation_freq,
+                      np.sin(tilt), weights=(self.axes == 0).astype(float))
+        out[:, self.axes == 2] += np.cos(tilt)
+        # Periodic movement, mainly vertical
+        self.add_sine(out, start_sample, self.movement_freq,
+                      self.movement_amplitude,
+                      weights=np.array([0.3, 0.2, 1.0])[self.axes])
+
+
+@register_generator("Square")
+class SquareGenerator(BaseGenerator):
+    """ Square wave / trigger generator. With a small duty cycle, it
+    produces a periodic train of trigger pulses.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    freq : float
+        Frequency in Hz.
+    duty : float
+        Fraction of each period at the high level.
+    amplitude : float
+        High level (the low level is 0).
+    """
+
+    def __init__(self, fs, n_cha, freq=1.0, duty=0.5, amplitude=1.0,
+                 seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.freq = freq
+        self.duty = duty
+        self.amplitude = amplitude
+
+    @classmethod
+    def from_settings(cls, fs, n_cha, l_cha, settings):
+        return cls(fs=fs, n_cha=n_cha, freq=settings.get("square_freq", 1.0),
+                   duty=settings.get("square_duty", 0.5),
+                   amplitude=settings.get("square_amplitude", 1.0),
+                   seed=settings.get("seed", None))
+
+    def get_periodic_freqs(self):
+        return [self.freq]
+
+    def _fill(self, out, start_sample):
+        n = out.shape[0]
+        phase = self.get_ramp(n) * (self.freq / self.fs)
+        phase += (self.freq * start_sample / self.fs) % 1
+        np.mod(phase, 1, out=phase)
+        out[:] = ((phase < self.duty) * self.amplitude)[:, None]
+
+
+@register_generator("Sine")
+class SineGenerator(BaseGenerator):
+    """ Pure sinusoid generator.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    freq : float
+        Frequency in Hz.
+    amplitude : float
+        Amplitude.
+    """
+
+    def __init__(self, fs, n_cha, freq=10.0, amplitude=1.0, seed=None):
+        super().__init__(fs, n_cha, seed)
+        self.freq = freq
+        self.amplitude = amplitude
+
+    @classmethod
+    def from_settings(cls, fs, n_cha, l_cha, settings):
+        return cls(fs=fs, n_cha=n_cha, freq=settings.get("sine_freq", 10.0),
+                   amplitude=settings.get("sine_amplitude", 1.0),
+                   seed=settings.get("seed", None))
+
+    def get_periodic_freqs(self):
+        return [self.freq]
+
+    def _fill(self, out, start_sample):
+        out[:] = 0
+        self.add_sine(out, start_sample, self.freq, self.amplitude)
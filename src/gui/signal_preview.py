@@ -0,0 +1,136 @@
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+import numpy as np
+
+
+class SignalPreviewWidget(QWidget):
+    """ Live preview of the streamed signal. The widget periodically reads a
+    snapshot of the PreviewBuffer of the stream and plots, for each pixel
+    column, the min/max envelope of the samples that fall into it. The
+    number of samples read per column and the number of plotted rows are
+    bounded, so the cost of each refresh does not depend on the sample rate
+    or the number of channels: if there are more channels than rows, an
+    evenly spaced subset of them is shown.
+
+    Parameters
+    ------------
+    theme_colors : dict
+        Theme colors (see gui_utils.get_theme_colors).
+    window_secs : float
+        Seconds displayed.
+    refresh_hz : float
+        Refresh rate of the plot.
+    max_rows : int
+        Maximum number of channels plotted.
+    samples_per_px : int
+        Maximum number of samples read per pixel column.
+    """
+
+    def __init__(self, theme_colors, window_secs=5.0, refresh_hz=15,
+                 max_rows=16, samples_per_px=8, parent=None):
+        super().__init__(parent)
+        self.theme_colors = theme_colors
+        self.window_secs = window_secs
+        self.max_rows = max_rows
+        self.samples_per_px = samples_per_px
+        self.setMinimumHeight(150)
+        self.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+
+        self.preview_buffer = None
+        self.fs = None
+        self.l_cha = None
+        self.channels = None
+        self.scales = None
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(int(1000 / refresh_hz))
+        self.refresh_timer.timeout.connect(self.update)
+
+    def set_source(self, preview_buffer, fs, l_cha):
+        """ Starts plotting the given PreviewBuffer. """
+        self.preview_buffer = preview_buffer
+        self.fs = fs
+        self.l_cha = l_cha
+        n_cha = preview_buffer.n_cha
+        if n_cha <= self.max_rows:
+            self.channels = np.arange(n_cha)
+        else:
+            self.channels = np.unique(
+                np.linspace(0, n_cha - 1, self.max_rows).astype(int))
+        self.scales = np.zeros(self.channels.shape[0])
+        self.refresh_timer.start()
+
+    def clear_source(self):
+        self.refresh_timer.stop()
+        self.preview_buffer = None
+        self.update()
+
+    def get_envelope(self, n_px):
+        """ Computes the min/max envelope of the displayed window.
+
+        Parameters
+        ------------
+        n_px : int
+            Number of pixel columns.
+
+        Returns
+        ------------
+        tuple
+            (min, max) arrays of shape [n_px x rows].
+        """
+        n_samples = min(int(self.window_secs * self.fs),
+                        self.preview_buffer.length)
+        step = max(n_samples // (n_px * self.samples_per_px), 1)
+        data = self.preview_buffer.read(n_samples, self.channels, step)
+        per_px = max(data.shape[0] // n_px, 1)
+        n_px = data.shape[0] // per_px
+        data = data[data.shape[0] - n_px * per_px:].reshape(
+            n_px, per_px, data.shape[1])
+        # fmin/fmax ignore the NaNs of samples not written yet
+        return np.fmin.reduce(data, axis=1), np.fmax.reduce(data, axis=1)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(),
+                         QColor(self.theme_colors['THEME_BG_DARK']))
+        if self.preview_buffer is None or \
+                self.preview_buffer.n_written == 0:
+            painter.end()
+            return
+
+        label_w = 40
+        width = self.width() - label_w
+        height = self.height()
+        if width < 2:
+            painter.end()
+            return
+        env_min, env_max = self.get_envelope(width)
+        # Smoothed autoscale of each row around its mean
+        offsets = np.nan_to_num(np.nanmean(env_min + env_max, axis=0) / 2)
+        env_min, env_max = env_min - offsets, env_max - offsets
+        amp = np.nan_to_num(np.fmax.reduce(
+            np.abs(np.concatenate((env_min, env_max))), axis=0))
+        self.scales = np.where(self.scales == 0, amp,
+                               0.8 * self.scales + 0.2 * amp)
+
+        n_rows = self.channels.shape[0]
+        row_h = height / n_rows
+        x0 = label_w + width - env_min.shape[0]
+        painter.setPen(QColor(self.theme_colors['THEME_TEXT_LIGHT']))
+        for r, c in enumerate(self.channels):
+            painter.drawText(QRectF(0, r * row_h, label_w - 4, row_h),
+                             Qt.AlignRight | Qt.AlignVCenter,
+                             str(self.l_cha[c]))
+        painter.setPen(QColor(self.theme_colors['THEME_SIGNAL_CURVE']))
+        for r in range(n_rows):
+            center = (r + 0.5) * row_h
+            scale = 0.45 * row_h / self.scales[r] if self.scales[r] > 0 \
+                else 0
+            y_min = (center - scale * env_min[:, r]).tolist()
+            y_max = (center - scale * env_max[:, r]).tolist()
+            valid = np.flatnonzero(~np.isnan(env_min[:, r])).tolist()
+            lines = [QLineF(x0 + i, y_min[i], x0 + i, y_max[i])
+                     for i in valid]
+            painter.drawLines(lines)
+        painter.end()
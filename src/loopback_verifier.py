@@ -0,0 +1,252 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+from pylsl import StreamInlet, resolve_byprop, local_clock
+import multiprocessing
+import queue
+import numpy as np
+
+# Modulus of the sequence counter for each LSL format, so that the counter
+# is always exactly representable
+SEQ_MODULUS = {
+    'float32': 2 ** 24,
+    'double64': 2 ** 53,
+    'int64': 2 ** 62,
+    'int32': 2 ** 31,
+    'int16': 2 ** 15,
+    'int8': 2 ** 7
+}
+
+# Moduli up to which a gap is told apart from a replay by the timestamps,
+# since a burst of losses can wrap the counter more than half the modulus
+SMALL_MODULUS = 2 ** 16
+
+# Formats that support the checksum channel
+CHECKSUM_FORMATS = ('float32', 'double64')
+
+
+def get_checksum(data, dtype):
+    """ Checksum of each sample: sum of its values computed in double
+    precision and cast to the format of the stream. The sender and the
+    verifier use this same function, so the values must match exactly.
+
+    Parameters
+    ------------
+    data : ndarray [samples x channels]
+        Samples.
+    dtype : numpy.dtype
+        Type of the stream.
+
+    Returns
+    ------------
+    ndarray: (samples, )
+        Checksums.
+    """
+    return np.sum(np.asarray(data, dtype=dtype).astype(np.float64),
+                  axis=1).astype(dtype)
+
+
+class SequenceTracker:
+    """ Counts the lost and duplicated samples of a stream from its sequence
+    counter, which wraps around modulus. Each received sample is mapped to
+    the absolute index congruent with its counter that is closest to the
+    expected one: the index of the previous sample plus one or, for small
+    moduli and a known rate, the index of the most advanced sample received
+    so far plus the time elapsed since its timestamp times the rate.
+    Samples beyond the most advanced
+    one are new, and the indexes they skip are lost; the rest are
+    duplicates, counted one by one.
+
+    Parameters
+    ------------
+    modulus : int
+        Modulus of the counter.
+    fs : float
+        Nominal rate of the stream, 0 if irregular.
+    """
+
+    def __init__(self, modulus, fs=0.0):
+        self.modulus = modulus
+        self.fs = fs
+        self.use_time = fs > 0 and modulus <= SMALL_MODULUS
+        self.last_index = None   # Most advanced sample
+        self.last_time = None
+        self.prev_index = None   # Previous sample
+        self.n_lost = 0
+        self.n_duplicated = 0
+
+    def update(self, seq, timestamps):
+        """ Counts a chunk of counters and their timestamps. """
+        seq = np.asarray(seq, dtype=np.int64)
+        if seq.shape[0] == 0:
+            return
+        timestamps = np.asarray(timestamps, dtype=float)
+        if self.last_index is None:
+            self.last_index = self.prev_index = int(seq[0]) - 1
+            self.last_time = timestamps[0] - (1 / self.fs if self.fs > 0
+                                              else 0)
+        half = self.modulus // 2
+        if self.use_time:
+            expected = self.last_index + np.rint(
+                (timestamps - self.last_time) * self.fs).astype(np.int64)
+            index = expected + (seq - expected + half) % self.modulus - half
+        else:
+            steps = np.diff(np.concatenate(
+                ([self.prev_index % self.modulus], seq)))
+            index = self.prev_index + np.cumsum(
+                (steps + half) % self.modulus - half)
+        self.prev_index = int(index[-1])
+        prev = np.maximum.accumulate(
+            np.concatenate(([self.last_index], index)))[:-1]
+        new = index > prev
+        self.n_lost += int(np.sum(index[new] - prev[new] - 1))
+        self.n_duplicated += int(np.sum(~new))
+        i = int(np.argmax(index))
+        if index[i] > self.last_index:
+            self.last_index = int(index[i])
+            self.last_time = timestamps[i]
+
+
+class LoopbackVerifier:
+    """ End-to-end verification of a stream. A local inlet is run in another
+    process, which compares the received samples with the output of the
+    generator using the sequence-counter channel (lost and duplicated
+    samples) and the checksum channel (value mismatches), and measures the
+    latency between the timestamp of the last sample of each chunk and its
+    reception. Reports are sent periodically through a queue.
+
+    Parameters
+    ------------
+    source_id : str
+        Source id of the stream to verify.
+    n_cha : int
+        Number of data channels (without the verification channels).
+    format : str
+        LSL channel format.
+    checksum : bool
+        If True, the stream contains a checksum channel after the sequence
+        counter.
+    report_interval : float
+        Seconds between reports.
+    """
+
+    def __init__(self, source_id, n_cha, format, checksum=True,
+                 report_interval=1.0):
+        if format not in SEQ_MODULUS:
+            raise ValueError('The loopback verifier does not support the %s '
+                             'format' % format)
+        if checksum and format not in CHECKSUM_FORMATS:
+            raise ValueError('The checksum channel requires a float format')
+        self.source_id = source_id
+        self.n_cha = n_cha
+        self.format = format
+        self.checksum = checksum
+        self.report_interval = report_interval
+        self.last_report = None
+        self.stop_process = multiprocessing.Value('i', 0)
+        self.report_queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            name='SignalGenerator_Loopback_Process',
+            target=self.verify,
+            args=(self.stop_process, self.report_queue, self.source_id,
+                  self.n_cha, self.format, self.checksum,
+                  self.report_interval)
+        )
+
+    def start(self):
+        self.process.start()
+
+    def close(self):
+        self.stop_process.value = 1
+        # Keep draining the reports so that the process can flush its queue
+        while self.process.is_alive():
+            self.get_report()
+            self.process.join(timeout=0.1)
+
+    def get_report(self):
+        """ Returns the most recent report of the verifier.
+
+        Returns
+        ------------
+        dict or None
+            Counters of received, lost and duplicated samples, checksum
+            mismatches and latency percentiles (ms). None if no report has
+            been received yet.
+        """
+        try:
+            while True:
+                self.last_report = self.report_queue.get_nowait()
+        except queue.Empty:
+            pass
+        return self.last_report
+
+    # Running in SignalGenerator_Loopback_Process
+    @staticmethod
+    def verify(stop_event, report_queue, source_id, n_cha, format, checksum,
+               report_interval):
+        dtype = np.dtype(format.replace('double64', 'float64'))
+        modulus = SEQ_MODULUS[format]
+        seq_col = n_cha
+        report = {
+            'received': 0, 'lost': 0, 'duplicated': 0, 'mismatches': 0,
+            'latency_ms': {0.5: 0.0, 0.95: 0.0, 0.99: 0.0}
+        }
+        latencies = np.zeros(4096)
+        n_latencies = 0
+
+        # Connect to the stream
+        streams = list()
+        while not streams and not stop_event.value:
+            streams = resolve_byprop('source_id', source_id, timeout=1)
+        if stop_event.value:
+            return
+        inlet = StreamInlet(streams[0], max_buflen=60, recover=True)
+        n_total = n_cha + (2 if checksum else 1)
+        buffer = np.empty((4096, n_total), dtype=dtype)
+        time_correction = inlet.time_correction()
+        tracker = SequenceTracker(modulus, streams[0].nominal_srate())
+        next_report = local_clock() + report_interval
+        print('[LoopbackVerifier] > Connected to %s.' % source_id)
+
+        while not stop_event.value:
+            _, timestamps = inlet.pull_chunk(timeout=0.05, dest_obj=buffer,
+                                             max_samples=buffer.shape[0])
+            now = local_clock()
+            n = len(timestamps)
+            if n > 0:
+                chunk = buffer[:n]
+
+                # Sequence counter: gaps are lost samples, and samples that
+                # do not advance the counter are duplicated
+                tracker.update(chunk[:, seq_col], timestamps)
+                report['lost'] = tracker.n_lost
+                report['duplicated'] = tracker.n_duplicated
+                report['received'] += n
+
+                # Integrity of the values
+                if checksum:
+                    expected = get_checksum(chunk[:, :n_cha], dtype)
+                    report['mismatches'] += int(
+                        np.sum(expected != chunk[:, seq_col + 1]))
+
+                # Latency of the last sample of the chunk
+                latencies[n_latencies % latencies.shape[0]] = \
+                    now - (timestamps[-1] + time_correction)
+                n_latencies += 1
+
+            if now >= next_report:
+                time_correction = inlet.time_correction()
+                if n_latencies > 0:
+                    values = 1000 * latencies[:min(n_latencies,
+                                                   latencies.shape[0])]
+                    report['latency_ms'] = dict(zip(
+                        report['latency_ms'].keys(),
+                        np.quantile(values, list(report['latency_ms'].keys())
+                                    ).tolist()))
+                report_queue.put(dict(report))
+                next_report = now + report_interval
+        inlet.close_stream()
+        print('[LoopbackVerifier] > Loopback process done.')
@@ -7,10 +7,13 @@ Version:  2.2
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import QTimer
+from pylsl import local_clock
 from PyQt5 import uic
 import constants
-from signal_generator import SignalGenerator
+from signal_generator import SignalGenerator, get_default_channel_labels
+from generators import get_generator_names
 from gui.gui_notifications import NotificationStack
+from gui.signal_preview import SignalPreviewWidget
 from gui import gui_utils
 import sys, os, ctypes, threading
 from constants import *
@@ -28,6 +31,9 @@ PD_RECORDING = 'Recording... '
 LSL_NOT_SENDING = 'Not sending '
 LSL_SENDING = 'Transmitting... '
 
+# Seconds displayed in the signal preview
+PREVIEW_SECS = 5
+
 
 class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
 
@@ -37,7 +43,7 @@ class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
 
             # Setup UI
             self.setupUi(self)
-            self.resize(400, 450)
+            self.resize(400, 650)
 
             # Tell windows that this application is not pythonw.exe so it can
             # have its own icon
@@ -56,6 +62,13 @@ class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
             self.setWindowIcon(QIcon('gui/images/icons/icon.png'))
             self.setWindowTitle('Signal generator v%s' % constants.VERSION)
 
+            # Live preview of the streamed signal
+            self.signal_preview = SignalPreviewWidget(
+                theme_colors=self.theme_colors, window_secs=PREVIEW_SECS)
+            self.verticalLayout_2.insertWidget(
+                self.verticalLayout_2.indexOf(self.label_status),
+                self.signal_preview)
+
             # Current application status
             self.current_status = None
             self.set_status(PD_READY)
@@ -78,15 +91,22 @@ class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
                                    custom_color=self.theme_colors['THEME_RED']))
             self.button_stop.clicked.connect(self.on_stop)
 
+            # Generators
+            self.comboBox_generator.addItems(get_generator_names())
+
             # Listeners
             self.spinBox_n_cha.valueChanged.connect(self.on_change_n_cha)
+            self.checkBox_adaptive_chunk.stateChanged.connect(
+                self.on_change_adaptive_chunk)
             self.comboBox_generator.currentTextChanged.connect(
                 self.on_change_generator)
             self.on_change_n_cha()
             self.on_change_generator()
+            self.on_change_adaptive_chunk()
 
             # Init signal generator
             self.signal_generator = None
+            self.last_update_samples = None
 
             # Thread to update the sent samples
             self.update_samples_timer = QTimer()
@@ -129,12 +149,25 @@ class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
                 gen_settings["uniform_std"] = \
                     self.doubleSpinBox_signal_std.value()
 
+                adaptive_settings = None
+                if self.checkBox_adaptive_chunk.isChecked():
+                    adaptive_settings = dict()
+                    adaptive_settings["target_latency_ms"] = \
+                        self.doubleSpinBox_target_latency.value()
+                    adaptive_settings["cpu_budget"] = \
+                        self.doubleSpinBox_cpu_budget.value() / 100
+
                 # Signal generator
                 self.signal_generator = SignalGenerator(
                     stream_name=stream_name, stream_type=stream_type,
                     chunk_size=chunk_size, format=format, n_cha=n_cha,
                     l_cha=l_cha, units=units, sample_rate=sample_rate,
-                    gen_settings=gen_settings, hostname=hostname)
+                    gen_settings=gen_settings, hostname=hostname,
+                    adaptive_settings=adaptive_settings,
+                    preview_secs=PREVIEW_SECS)
+                self.last_update_samples = None
+                self.signal_preview.set_source(
+                    self.signal_generator.preview_buffer, sample_rate, l_cha)
 
                 # Thread to update number of EEG samples sent
                 self.update_samples_timer.start(1000)
@@ -150,8 +183,9 @@ class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
     def on_stop(self):
         try:
             if self.current_status == PD_RECORDING:
-                # Stop the update samples thread
+                # Stop the update samples thread and the preview
                 self.update_samples_timer.stop()
+                self.signal_preview.clear_source()
                 # Close the LSL stream
                 self.signal_generator.close_lsl()
                 # Modify the status
@@ -180,13 +214,14 @@ class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
 
     def on_update_samples(self):
         if self.current_status == PD_RECORDING:
-            n_samples = self.signal_generator.n_chunks_sent * \
-                        self.signal_generator.chunk_size
+            n_samples = self.signal_generator.n_samples_sent
             n_channels = self.signal_generator.n_cha
             approx_fs = 0
-            if len(self.signal_generator.buffer_sent_times) >= 2:
-                approx_fs = self.signal_generator.chunk_size / np.mean(np.diff(
-                    np.array(self.signal_generator.buffer_sent_times)))
+            now = local_clock()
+            if self.last_update_samples is not None:
+                approx_fs = (n_samples - self.last_update_samples[0]) / \
+                            (now - self.last_update_samples[1])
+            self.last_update_samples = (n_samples, now)
             self.label_status.setText(
                 "Sent: [%i samples x %i channels] - Approx. fs of %.2f Hz" %
                 (n_samples, n_channels, approx_fs)
@@ -196,27 +231,23 @@ class SignalGeneratorGUI(QMainWindow, gui_main_user_interface):
         n_cha = self.spinBox_n_cha.value()
 
         # Get a default list of channels
-        if n_cha <= len(EEG_10_20):
-            l_cha = EEG_10_20[:n_cha]
-        elif n_cha <= len(EEG_10_10):
-            l_cha = EEG_10_10[:n_cha]
-        elif n_cha <= len(EEG_10_05):
-            l_cha = EEG_10_05[:n_cha]
-        else:
-            l_cha = [str(i) for i in range(n_cha)]
+        l_cha = get_default_channel_labels(n_cha)
         self.lineEdit_l_cha.setText(';'.join(l_cha))
 
+    def on_change_adaptive_chunk(self):
+        adaptive = self.checkBox_adaptive_chunk.isChecked()
+        self.spinBox_lsl_chunk_size.setEnabled(not adaptive)
+        self.doubleSpinBox_target_latency.setEnabled(adaptive)
+        self.doubleSpinBox_cpu_budget.setEnabled(adaptive)
+
     def on_change_generator(self):
-        if self.comboBox_generator.currentText() == "Uniform":
-            self.doubleSpinBox_signal_mean.setEnabled(True)
-            self.doubleSpinBox_signal_std.setEnabled(True)
-            self.checkBox_ac_power.setEnabled(False)
-            self.checkBox_pink_online.setEnabled(False)
-        else:
-            self.doubleSpinBox_signal_mean.setEnabled(False)
-            self.doubleSpinBox_signal_std.setEnabled(False)
-            self.checkBox_ac_power.setEnabled(True)
-            self.checkBox_pink_online.setEnabled(True)
+        gen_type = self.comboBox_generator.currentText()
+        uniform = gen_type == "Uniform"
+        eeg = gen_type.startswith("EEG")
+        self.doubleSpinBox_signal_mean.setEnabled(uniform)
+        self.doubleSpinBox_signal_std.setEnabled(uniform)
+        self.checkBox_ac_power.setEnabled(eeg)
+        self.checkBox_pink_online.setEnabled(eeg)
 
     def closeEvent(self, event):
         try:
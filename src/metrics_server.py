@@ -0,0 +1,162 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import threading
+
+
+class MetricsServer:
+    """ HTTP endpoint that exposes the statistics of the registered streams,
+    either in Prometheus text format (/metrics) or as JSON (/metrics.json).
+    Requests are served in their own threads and only read the statistics
+    of the streams (see SignalGenerator.get_stats), so scraping does not
+    interfere with the IO threads.
+
+    Parameters
+    ------------
+    host : str
+        Interface to listen on. Defaults to localhost.
+    port : int
+        TCP port. Use 0 to pick a free port.
+    """
+
+    def __init__(self, host='127.0.0.1', port=9100):
+        self.streams = dict()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self.thread = None
+
+    def register(self, name, signal_generator):
+        """ Registers a stream under a unique name. """
+        with self.lock:
+            self.streams[name] = signal_generator
+
+    def unregister(self, name):
+        with self.lock:
+            self.streams.pop(name, None)
+
+    def start(self):
+        self.thread = threading.Thread(name='SignalGenerator_Metrics_Thread',
+                                       target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        print('[MetricsServer] > Serving metrics at http://%s:%i/metrics' %
+              (self.host, self.port))
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+        print('[MetricsServer] > Metrics server closed.')
+
+    def collect(self):
+        """ Returns the statistics of every registered stream.
+
+        Returns
+        ------------
+        dict
+            Statistics of each stream indexed by its name.
+        """
+        with self.lock:
+            streams = list(self.streams.items())
+        return {name: gen.get_stats() for name, gen in streams}
+
+    def to_prometheus(self, metrics):
+        """ Formats the metrics in the Prometheus text exposition format. """
+        lines = list()
+
+        def add(name, m_type, help_text, values):
+            lines.append('# HELP lslgen_%s %s' % (name, help_text))
+            lines.append('# TYPE lslgen_%s %s' % (name, m_type))
+            for labels, value in values:
+                labels = ','.join('%s="%s"' % (k, str(v).replace('"', '\\"'))
+                                  for k, v in labels)
+                lines.append('lslgen_%s{%s} %s' % (name, labels, value))
+
+        def per_stream(key):
+            return [((('stream', name),), stats[key])
+                    for name, stats in metrics.items()]
+
+        def per_quantile(key):
+            return [((('stream', name), ('quantile', q)), v)
+                    for name, stats in metrics.items()
+                    for q, v in stats[key].items()]
+
+        add('samples_sent_total', 'counter', 'Samples pushed.',
+            per_stream('samples_sent'))
+        add('chunks_sent_total', 'counter', 'Chunks pushed.',
+            per_stream('chunks_sent'))
+        add('effective_rate_hz', 'gauge', 'Effective sample rate.',
+            per_stream('effective_rate'))
+        add('nominal_rate_hz', 'gauge', 'Nominal sample rate.',
+            per_stream('nominal_rate'))
+        add('samples_per_push', 'gauge', 'Current samples per push.',
+            per_stream('samples_per_push'))
+        add('queue_depth', 'gauge', 'Pending ticks in the update queue.',
+            per_stream('queue_depth'))
+        add('jitter_ms', 'summary', 'Jitter of the intervals between pushes.',
+            per_quantile('jitter_ms'))
+        add('generation_ms', 'summary', 'Generation time per chunk.',
+            per_quantile('generation_ms'))
+        add('push_ms', 'summary', 'Push time per chunk.',
+            per_quantile('push_ms'))
+        add('io_cpu_seconds_total', 'counter', 'CPU time of the IO thread.',
+            per_stream('io_cpu_time'))
+        add('timer_cpu_seconds_total', 'counter',
+            'CPU time of the timer process.', per_stream('timer_cpu_time'))
+        add('realtime_info', 'gauge',
+            'Scheduling mode of the IO thread and timer process.',
+            [((('stream', name), ('worker', worker), ('mode', mode)), 1)
+             for name, stats in metrics.items()
+             for worker, mode in stats['realtime_mode'].items()])
+        recording = {name: stats['recording'] for name, stats in
+                     metrics.items() if 'recording' in stats}
+        if recording:
+            add('recording_backlog', 'gauge',
+                'Chunks waiting to be written to the recording.',
+                [((('stream', name),), r['backlog'])
+                 for name, r in recording.items()])
+            add('recording_dropped_chunks_total', 'counter',
+                'Chunks missing from the recording.',
+                [((('stream', name),), r['dropped_chunks'])
+                 for name, r in recording.items()])
+        return '\n'.join(lines) + '\n'
+
+    def _make_handler(self):
+        server = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                try:
+                    path = self.path.split('?')[0]
+                    if path == '/metrics':
+                        body = server.to_prometheus(server.collect())
+                        content_type = 'text/plain; version=0.0.4'
+                    elif path == '/metrics.json':
+                        body = json.dumps(server.collect(), default=str)
+                        content_type = 'application/json'
+                    else:
+                        self.send_error(404)
+                        return
+                    body = body.encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except Exception as e:
+                    self.send_error(500, str(e))
+
+            def log_message(self, format, *args):
+                # Scrapes are too frequent to be logged
+                pass
+
+        return MetricsHandler
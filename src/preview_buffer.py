@@ -0,0 +1,81 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import numpy as np
+
+
+class PreviewBuffer:
+    """ Ring buffer with the most recent samples of a stream, written by the
+    IO thread and read by the GUI. There is a single writer, which never
+    waits: it announces the number of samples there will be once the chunk
+    is written, copies the chunk into the ring and then publishes the new
+    number of written samples. Readers take a snapshot up to the published
+    counter and then check the announced one, discarding the samples whose
+    slots could have been overwritten while copying. No locks are used, so
+    reading can never block sending.
+
+    Parameters
+    ------------
+    n_cha : int
+        Number of channels.
+    length : int
+        Number of samples kept in the ring.
+    """
+
+    def __init__(self, n_cha, length):
+        self.n_cha = n_cha
+        self.length = int(length)
+        self.data = np.zeros((self.length, n_cha), dtype=np.float32)
+        self.n_written = 0
+        self.n_writing = 0
+
+    def write(self, chunk):
+        """ Appends a chunk [samples x channels] to the ring. """
+        n = chunk.shape[0]
+        # Announced before the slots of the chunk are overwritten. The ring
+        # advances the whole chunk even if only its last samples fit, so
+        # that the announced and published counts match and the samples
+        # keep their positions
+        self.n_writing = self.n_written + n
+        if n > self.length:
+            chunk = chunk[-self.length:]
+        n_copy = chunk.shape[0]
+        start = (self.n_written + n - n_copy) % self.length
+        n_first = min(n_copy, self.length - start)
+        self.data[start:start + n_first] = chunk[:n_first]
+        if n_first < n_copy:
+            self.data[:n_copy - n_first] = chunk[n_first:]
+        # Publish the samples once they have been copied
+        self.n_written += n
+
+    def read(self, n_samples, channels=None, step=1):
+        """ Returns a snapshot of the last samples.
+
+        Parameters
+        ------------
+        n_samples : int
+            Number of samples to read (at most the length of the ring).
+        channels : ndarray or None
+            Indexes of the channels to read. If None, all channels are read.
+        step : int
+            Decimation step. Only one out of step samples is read.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Most recent samples. Samples that have not been written yet, or
+            that were overwritten while reading, are set to NaN.
+        """
+        n_samples = min(int(n_samples), self.length)
+        end = self.n_written
+        idx = np.arange(end - n_samples, end, step)
+        snapshot = self.data[idx % self.length] if channels is None else \
+            self.data[np.ix_(idx % self.length, channels)]
+        # Samples overwritten during the copy, or whose slots were being
+        # written, or never written
+        valid_from = max(self.n_writing - self.length, 0)
+        snapshot[idx < valid_from] = np.nan
+        return snapshot
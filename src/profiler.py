@@ -0,0 +1,185 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import gc
+import json
+import os
+import time
+import numpy as np
+
+# Stages of the hot path of SignalGenerator, in order
+PROFILE_STAGES = ('queue', 'generate', 'artifacts', 'convert', 'push',
+                  'record', 'gc')
+STAGE_QUEUE, STAGE_GENERATE, STAGE_ARTIFACTS, STAGE_CONVERT, STAGE_PUSH, \
+    STAGE_RECORD, STAGE_GC = range(len(PROFILE_STAGES))
+
+
+class EventRing:
+    """ Preallocated ring buffer of timed events. Recording an event only
+    writes into numpy arrays, so it does not allocate memory. """
+
+    def __init__(self, size):
+        self.size = size
+        self.stages = np.zeros(size, dtype=np.int8)
+        self.starts = np.zeros(size)
+        self.ends = np.zeros(size)
+        self.chunks = np.zeros(size, dtype=np.int64)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.n_records = 0
+
+    def record(self, stage, start, end, chunk, n_samples):
+        i = self.n_records % self.size
+        self.stages[i] = stage
+        self.starts[i] = start
+        self.ends[i] = end
+        self.chunks[i] = chunk
+        self.samples[i] = n_samples
+        self.n_records += 1
+
+    def get_window(self):
+        """ Returns a chronological copy of the events in the ring.
+
+        Returns
+        ------------
+        tuple
+            (stages, starts, ends, chunks, samples)
+        """
+        n_records = self.n_records
+        n = min(n_records, self.size)
+        order = np.arange(n_records - n, n_records) % self.size
+        return (self.stages[order], self.starts[order], self.ends[order],
+                self.chunks[order], self.samples[order])
+
+
+class StageProfiler:
+    """ Records the duration of each stage of the hot path of a stream
+    (see PROFILE_STAGES) for every chunk:
+        - queue: from the tick of the timer process to its reception by the
+          IO thread.
+        - generate: reading the chunk from the buffer or generating it.
+        - artifacts: adding the artifacts.
+        - convert: verification channels.
+        - push: push to every sink (see sinks.py).
+        - record: statistics, recording, preview and derived streams.
+        - gc: pauses of the garbage collector, in any thread.
+    The events of the IO thread and of the garbage collector are kept in
+    separate preallocated rings, so recording does not allocate memory nor
+    take locks. Times are time.perf_counter() values. The events can be
+    exported as a Chrome trace (chrome://tracing or https://ui.perfetto.dev)
+    to see the stalls on a timeline.
+
+    Parameters
+    ------------
+    size : int
+        Number of events kept in the ring of the IO thread.
+    gc_events : bool
+        If True, the pauses of the garbage collector are recorded.
+    """
+
+    def __init__(self, size=65536, gc_events=True):
+        self.size = size
+        self.ring = EventRing(size)
+        self.gc_ring = EventRing(max(size // 16, 64))
+        self.gc_start = None
+        self.gc_events = gc_events
+        if gc_events:
+            gc.callbacks.append(self.on_gc)
+
+    def record(self, stage, start, end, chunk, n_samples=0):
+        """ Records a stage of the IO thread.
+
+        Parameters
+        ------------
+        stage : int
+            Index of the stage in PROFILE_STAGES.
+        start : float
+            Start time (time.perf_counter()).
+        end : float
+            End time (time.perf_counter()).
+        chunk : int
+            Index of the chunk.
+        n_samples : int
+            Samples of the chunk.
+        """
+        self.ring.record(stage, start, end, chunk, n_samples)
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            self.gc_ring.record(STAGE_GC, self.gc_start, time.perf_counter(),
+                                info['generation'], info['collected'])
+            self.gc_start = None
+
+    def close(self):
+        if self.gc_events and self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+
+    def get_summary(self, quantiles=(0.5, 0.99)):
+        """ Duration statistics of each stage over the events in the rings.
+
+        Returns
+        ------------
+        dict
+            For each stage with events, "count", the quantiles and "max" of
+            its duration in ms.
+        """
+        summary = dict()
+        for ring in (self.ring, self.gc_ring):
+            stages, starts, ends, _, _ = ring.get_window()
+            durations = 1000 * (ends - starts)
+            for stage in np.unique(stages):
+                d = durations[stages == stage]
+                stage_summary = {'count': int(d.size), 'max': float(d.max())}
+                for q, v in zip(quantiles, np.quantile(d, quantiles)):
+                    stage_summary[q] = float(v)
+                summary[PROFILE_STAGES[stage]] = stage_summary
+        return summary
+
+    def to_chrome_trace(self, name='SignalGenerator'):
+        """ Converts the events in the rings to the Chrome trace event
+        format (complete events, with times in microseconds).
+
+        Parameters
+        ------------
+        name : str
+            Name of the process in the trace.
+
+        Returns
+        ------------
+        dict
+            Trace, which can be saved as JSON.
+        """
+        pid = os.getpid()
+        events = [
+            {'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': 0,
+             'args': {'name': name}},
+            {'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': 1,
+             'args': {'name': 'IO thread'}},
+            {'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': 2,
+             'args': {'name': 'Garbage collector'}}
+        ]
+        for tid, ring, arg_names in ((1, self.ring, ('chunk', 'samples')),
+                                     (2, self.gc_ring,
+                                      ('generation', 'collected'))):
+            stages, starts, ends, chunks, samples = ring.get_window()
+            for stage, start, end, chunk, n in zip(
+                    stages.tolist(), starts.tolist(), ends.tolist(),
+                    chunks.tolist(), samples.tolist()):
+                events.append({
+                    'ph': 'X', 'name': PROFILE_STAGES[stage], 'cat': 'stage',
+                    'pid': pid, 'tid': tid, 'ts': 1e6 * start,
+                    'dur': 1e6 * (end - start),
+                    'args': {arg_names[0]: chunk, arg_names[1]: n}
+                })
+        events.sort(key=lambda e: e.get('ts', 0))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_trace(self, path, name='SignalGenerator'):
+        """ Saves the events as a Chrome trace JSON file. """
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(name), f)
+        print('[StageProfiler] > Trace saved to %s' % path)
@@ -0,0 +1,109 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import ctypes
+import ctypes.util
+import os
+
+# Real-time scheduling policies
+REALTIME_POLICIES = {
+    'fifo': 'SCHED_FIFO',
+    'rr': 'SCHED_RR'
+}
+
+# Flags of mlockall (see sys/mman.h)
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+def apply_realtime(name, cpus=None, policy=None, priority=10,
+                   lock_memory=False):
+    """ Configures the calling thread (and, for the memory lock, its
+    process) for low-latency operation. Each option is applied
+    independently: if it is not supported by the platform or the process
+    lacks the privileges (e.g., CAP_SYS_NICE for the real-time policies or
+    CAP_IPC_LOCK/RLIMIT_MEMLOCK for the memory lock), the default behaviour
+    is kept and the error is reported. Only Linux is fully supported.
+
+    Parameters
+    ------------
+    name : str
+        Name of the worker, for the log.
+    cpus : list or None
+        CPUs the thread is pinned to. If None, the affinity is not changed.
+        Pinning is recommended with the real-time policies, since the timer
+        busy-waits until each deadline.
+    policy : str or None
+        Scheduling policy: "fifo" (SCHED_FIFO), "rr" (SCHED_RR) or None to
+        keep the default policy.
+    priority : int
+        Static priority of the real-time policies (1-99).
+    lock_memory : bool
+        If True, the current and future pages of the process are locked in
+        RAM, so that the worker does not wait for page faults.
+
+    Returns
+    ------------
+    dict
+        Applied mode: "cpus" (affinity of the thread, None if not pinned),
+        "policy", "priority",
+        "memory_locked" and the "errors" of the options that could not be
+        applied.
+    """
+    report = {'cpus': None, 'policy': 'SCHED_OTHER', 'priority': 0,
+              'memory_locked': False, 'errors': list()}
+
+    # CPU affinity. On Linux, pid 0 refers to the calling thread
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(0, [int(c) for c in cpus])
+            report['cpus'] = sorted(os.sched_getaffinity(0))
+        except (AttributeError, OSError, ValueError) as e:
+            report['errors'].append('affinity: %s' % e)
+
+    # Scheduling policy
+    if policy is not None:
+        try:
+            if policy not in REALTIME_POLICIES:
+                raise ValueError('unknown policy %s' % policy)
+            sched_policy = getattr(os, REALTIME_POLICIES[policy])
+            os.sched_setscheduler(0, sched_policy, os.sched_param(priority))
+            report['policy'] = REALTIME_POLICIES[policy]
+            report['priority'] = priority
+        except (AttributeError, OSError, ValueError) as e:
+            report['errors'].append('scheduler: %s' % e)
+
+    # Memory lock
+    if lock_memory:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+                raise OSError(ctypes.get_errno(),
+                              os.strerror(ctypes.get_errno()))
+            report['memory_locked'] = True
+        except (AttributeError, OSError, TypeError) as e:
+            report['errors'].append('mlockall: %s' % e)
+
+    print('[SignalGenerator] > %s mode: %s%s' %
+          (name, get_realtime_mode(report),
+           ' (fallback: %s)' % '; '.join(report['errors'])
+           if report['errors'] else ''))
+    return report
+
+
+def get_realtime_mode(report):
+    """ Short description of a mode returned by apply_realtime, e.g.,
+    "SCHED_FIFO:50 cpus=2,3 mlock", or "default" if report is None. """
+    if report is None:
+        return 'default'
+    mode = report['policy']
+    if report['priority'] > 0:
+        mode += ':%i' % report['priority']
+    if report['cpus'] is not None:
+        mode += ' cpus=%s' % ','.join(str(c) for c in report['cpus'])
+    if report['memory_locked']:
+        mode += ' mlock'
+    return mode
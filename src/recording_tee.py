@@ -0,0 +1,277 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import numpy as np
+
+# Fixed length of the .npy headers, so that they can be rewritten in place
+# with the final shape when the recording is closed
+NPY_HEADER_BYTES = 128
+
+
+def get_free_path(path):
+    """ Returns path (without extension) if there is no recording there, or
+    the first of path_1, path_2, ... that is free, so that existing
+    recordings are never overwritten. """
+    if path.endswith('.npy'):
+        path = path[:-4]
+    candidate, i = path, 0
+    while os.path.exists(candidate + '.npy') or \
+            os.path.exists(candidate + '_index.npy'):
+        i += 1
+        candidate = '%s_%i' % (path, i)
+    return candidate
+
+
+class NpyAppender:
+    """ Writes a 2D .npy file row by row. The header is written with the
+    final number of rows when the file is closed; until then, the file
+    declares 0 rows.
+
+    Parameters
+    ------------
+    path : str
+        Path of the file.
+    n_cols : int
+        Number of columns.
+    dtype : numpy.dtype
+        Type of the data.
+    append : bool
+        If True and the file exists, the rows are appended to it. The rows
+        are counted from the size of the file, so that the files of a
+        process that was killed before closing them can be continued.
+    """
+
+    def __init__(self, path, n_cols, dtype, append=False):
+        self.path = path
+        self.n_cols = n_cols
+        self.dtype = np.dtype(dtype)
+        self.n_rows = 0
+        if append and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            np.lib.format.read_magic(self.file)
+            shape, _, file_dtype = np.lib.format.read_array_header_1_0(
+                self.file)
+            if self.file.tell() != NPY_HEADER_BYTES or \
+                    file_dtype != self.dtype or shape[1:] != (n_cols, ):
+                self.file.close()
+                raise ValueError('Cannot append to %s: it is not a '
+                                 'recording of the same type' % path)
+            self.truncate((os.path.getsize(path) - NPY_HEADER_BYTES) //
+                          (n_cols * self.dtype.itemsize))
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(self.get_header())
+
+    def get_header(self):
+        header = repr({
+            'descr': np.lib.format.dtype_to_descr(self.dtype),
+            'fortran_order': False,
+            'shape': (self.n_rows, self.n_cols)
+        }).encode('latin1')
+        n_pad = NPY_HEADER_BYTES - 10 - len(header) - 1
+        return b'\x93NUMPY\x01\x00' + \
+            struct.pack('<H', NPY_HEADER_BYTES - 10) + \
+            header + b' ' * n_pad + b'\n'
+
+    def truncate(self, n_rows):
+        """ Keeps the first n_rows rows and appends after them. """
+        self.n_rows = n_rows
+        self.file.seek(NPY_HEADER_BYTES + n_rows * self.n_cols *
+                       self.dtype.itemsize)
+        self.file.truncate()
+
+    def write(self, rows):
+        """ Appends the rows [rows x n_cols], which must have the type of
+        the file. """
+        self.file.write(memoryview(np.ascontiguousarray(rows)).cast('B'))
+        self.n_rows += rows.shape[0]
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(self.get_header())
+        self.file.close()
+
+
+class RecordingTee:
+    """ Records a copy of every chunk pushed by a SignalGenerator, including
+    the verification channels, together with its timestamp. The push path
+    only copies the chunk into a preallocated slot and enqueues it; a writer
+    thread collects the chunks into large batches and appends them to disk.
+    If the writer falls behind and no slots are free, the chunk is dropped
+    from the recording (never delayed) and counted.
+
+    The recording consists of three files:
+        - <path>.npy: samples [samples x channels].
+        - <path>_index.npy: one row per chunk with the index of its first
+          sample, its number of samples and its LSL timestamp (time of its
+          last sample).
+        - <path>.json: description of the stream.
+    Both .npy files can be opened with numpy.load(..., mmap_mode='r').
+
+    Parameters
+    ------------
+    path : str
+        Path of the recording without extension.
+    n_cha : int
+        Number of channels of each chunk.
+    dtype : numpy.dtype
+        Type of the chunks.
+    max_chunk : int
+        Maximum number of samples per chunk.
+    info : dict or None
+        Description of the stream, saved in the JSON file.
+    queue_size : int
+        Number of chunks that can be waiting to be written.
+    batch_samples : int
+        Samples per write.
+    flush_interval : float
+        Maximum time (s) that a chunk waits in the batch before being
+        written.
+    append : bool
+        If True, an existing recording is continued (e.g., when the stream
+        is resumed from a checkpoint) instead of overwritten. Only its
+        complete chunks are kept.
+    """
+
+    def __init__(self, path, n_cha, dtype, max_chunk, info=None,
+                 queue_size=256, batch_samples=65536, flush_interval=1.0,
+                 append=False):
+        if path.endswith('.npy'):
+            path = path[:-4]
+        self.path = path
+        self.n_cha = n_cha
+        self.dtype = np.dtype(dtype)
+        self.max_chunk = max_chunk
+        self.batch_samples = max(batch_samples, max_chunk)
+        self.flush_interval = flush_interval
+        self.n_dropped = 0
+        self.n_written_chunks = 0
+        self.n_written_samples = 0
+
+        # Preallocated slots for the chunks in transit
+        self.slots = np.empty((queue_size, max_chunk, n_cha), dtype=self.dtype)
+        self.free_slots = queue.Queue()
+        for i in range(queue_size):
+            self.free_slots.put_nowait(i)
+        self.pending = queue.Queue()
+
+        # Files
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        with open(path + '.json', 'w') as f:
+            json.dump(info if info is not None else dict(), f, indent=2,
+                      default=str)
+        self.data_file = NpyAppender(path + '.npy', n_cha, self.dtype,
+                                     append)
+        self.index_file = NpyAppender(path + '_index.npy', 3, np.float64,
+                                      append)
+        if self.index_file.n_rows > 0 or self.data_file.n_rows > 0:
+            # Drop the chunks that were not completely written, e.g., if the
+            # process was killed between the writes of both files
+            index = np.fromfile(path + '_index.npy', dtype=np.float64,
+                                count=3 * self.index_file.n_rows,
+                                offset=NPY_HEADER_BYTES).reshape(-1, 3)
+            ends = np.cumsum(index[:, 1])
+            n_chunks = int(np.searchsorted(ends, self.data_file.n_rows,
+                                           side='right'))
+            self.index_file.truncate(n_chunks)
+            self.data_file.truncate(int(ends[n_chunks - 1])
+                                    if n_chunks > 0 else 0)
+            print('[RecordingTee] > Appending to %s.npy after %i samples' %
+                  (path, self.data_file.n_rows))
+
+        self.run = threading.Event()
+        self.run.set()
+        self.writer_thread = threading.Thread(
+            name='SignalGenerator_Recording_Thread', target=self.write_data)
+        self.writer_thread.start()
+        print('[RecordingTee] > Recording to %s.npy' % path)
+
+    def put(self, chunk, first_sample, timestamp):
+        """ Enqueues a copy of a pushed chunk. Called from the push path, so
+        it never blocks.
+
+        Parameters
+        ------------
+        chunk : ndarray [samples x channels]
+            Pushed chunk.
+        first_sample : int
+            Index of its first sample.
+        timestamp : float
+            LSL timestamp of the chunk.
+        """
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            self.n_dropped += 1
+            return
+        n = chunk.shape[0]
+        self.slots[slot, :n] = chunk
+        self.pending.put_nowait((slot, n, first_sample, timestamp))
+
+    def get_status(self):
+        """ Returns the path, backlog (chunks waiting to be written) and
+        counters of the recording. """
+        return {
+            'path': self.path,
+            'backlog': self.pending.qsize(),
+            'dropped_chunks': self.n_dropped,
+            'written_chunks': self.n_written_chunks,
+            'written_samples': self.n_written_samples
+        }
+
+    def close(self):
+        """ Writes the pending chunks and closes the files. """
+        self.run.clear()
+        self.writer_thread.join()
+        self.data_file.close()
+        self.index_file.close()
+        print('[RecordingTee] > Recording closed: %i samples, %i chunks '
+              'dropped.' % (self.n_written_samples, self.n_dropped))
+
+    # Running in SignalGenerator_Recording_Thread
+    def write_data(self):
+        batch = np.empty((self.batch_samples, self.n_cha), dtype=self.dtype)
+        index = np.empty((self.batch_samples, 3))
+        n_samples = 0
+        n_chunks = 0
+        flush_deadline = None
+        while True:
+            try:
+                slot, n, first_sample, timestamp = self.pending.get(
+                    timeout=self.flush_interval)
+                if n_samples + n > self.batch_samples:
+                    self._flush(batch[:n_samples], index[:n_chunks])
+                    n_samples, n_chunks = 0, 0
+                if n_samples == 0:
+                    flush_deadline = time.monotonic() + self.flush_interval
+                batch[n_samples:n_samples + n] = self.slots[slot, :n]
+                index[n_chunks] = (first_sample, n, timestamp)
+                n_samples += n
+                n_chunks += 1
+                self.free_slots.put_nowait(slot)
+            except queue.Empty:
+                pass
+            if n_samples > 0 and time.monotonic() >= flush_deadline:
+                self._flush(batch[:n_samples], index[:n_chunks])
+                n_samples, n_chunks = 0, 0
+            if not self.run.is_set() and self.pending.empty():
+                break
+        self._flush(batch[:n_samples], index[:n_chunks])
+
+    def _flush(self, data, index):
+        if data.shape[0] == 0:
+            return
+        self.data_file.write(data)
+        self.index_file.write(index)
+        self.n_written_samples += data.shape[0]
+        self.n_written_chunks += index.shape[0]
@@ -0,0 +1,245 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import fractions
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from generators import BaseGenerator
+
+
+def get_rate_ratio(source_rate, target_rate, max_phases=1024):
+    """ Rational approximation up / down of target_rate / source_rate, with
+    at most max_phases phases (up).
+
+    Returns
+    ------------
+    tuple
+        (up, down)
+    """
+    ratio = fractions.Fraction(float(source_rate)) / \
+        fractions.Fraction(float(target_rate))
+    ratio = ratio.limit_denominator(max_phases)
+    return ratio.denominator, ratio.numerator
+
+
+class PolyphaseResampler:
+    """ Streaming rational resampler. The signal is conceptually upsampled
+    by up, filtered by a Kaiser-windowed sinc lowpass and downsampled by
+    down. Only the filter taps that multiply non-zero samples of the
+    upsampled signal are evaluated: the prototype filter is split into up
+    phases of taps_per_phase taps, and each output sample is the dot product
+    of one phase with the last taps_per_phase input samples, so the cost is
+    O(samples x taps / phases).
+
+    Output sample n corresponds to the position n * down / up of the input:
+    the group delay of the filter is compensated by reading taps_per_phase
+    / 2 input samples ahead, so resampling does not shift the signal. Each
+    output sample only depends on its index and on the input, so a stream
+    resampled in chunks of any size is identical to the stream resampled at
+    once, without boundary artifacts.
+
+    Parameters
+    ------------
+    source_rate : float
+        Sampling rate of the input.
+    target_rate : float
+        Sampling rate of the output.
+    taps_per_phase : int
+        Taps of each phase of the filter, multiplied by down / up when
+        downsampling. More taps give a sharper transition band at a higher
+        cost.
+    beta : float
+        Shape parameter of the Kaiser window. The stopband attenuation is
+        about 9 * beta + 9 dB (e.g., 80 dB for 8).
+    cutoff : float
+        Cutoff of the lowpass as a fraction of the Nyquist frequency of the
+        slowest of both rates.
+    max_phases : int
+        Maximum number of phases. Ratios that need more are approximated.
+    """
+
+    def __init__(self, source_rate, target_rate, taps_per_phase=16, beta=8.0,
+                 cutoff=0.9, max_phases=1024):
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.up, self.down = get_rate_ratio(source_rate, target_rate,
+                                            max_phases)
+        # When downsampling, the filter is stretched with the ratio so that
+        # it spans the same time at the output rate
+        self.taps_per_phase = int(math.ceil(
+            taps_per_phase * max(self.down / self.up, 1)))
+        taps_per_phase = self.taps_per_phase
+
+        # Prototype lowpass at the upsampled rate, with gain up to make up
+        # for the zeros inserted by the upsampling. It is centered on a
+        # whole sample, so that the delay can be compensated exactly
+        n_taps = self.up * taps_per_phase
+        self.delay = n_taps // 2
+        fc = 0.5 * cutoff / max(self.up, self.down)
+        t = np.arange(n_taps) - self.delay
+        h = self.up * 2 * fc * np.sinc(2 * fc * t) * \
+            np.kaiser(2 * self.delay + 1, beta)[:n_taps]
+
+        # Filter bank [phases x taps], with the taps reversed so that each
+        # phase multiplies a window of input samples in chronological order
+        self.bank = np.ascontiguousarray(
+            h.reshape(taps_per_phase, self.up).T[:, ::-1])
+
+    @property
+    def effective_rate(self):
+        """ Output rate given by the rational approximation. """
+        return self.source_rate * self.up / self.down
+
+    def get_positions(self, first_output, n_outputs):
+        """ Phase and last input sample of each output sample. """
+        u = (first_output + np.arange(n_outputs, dtype=np.int64)) * \
+            self.down + self.delay
+        return u % self.up, u // self.up
+
+    def get_input_span(self, first_output, n_outputs):
+        """ Input samples needed to compute n_outputs samples from
+        first_output.
+
+        Returns
+        ------------
+        tuple
+            (first input sample, end input sample), the end excluded.
+        """
+        u_first = first_output * self.down + self.delay
+        u_last = (first_output + n_outputs - 1) * self.down + self.delay
+        return (u_first // self.up - self.taps_per_phase + 1,
+                u_last // self.up + 1)
+
+    def process(self, x, first_input, first_output, out):
+        """ Computes the output samples [first_output, first_output +
+        len(out)) into out.
+
+        Parameters
+        ------------
+        x : ndarray [samples x channels]
+            Input samples from first_input, which must cover the span of
+            get_input_span.
+        first_input : int
+            Index of the first sample of x.
+        first_output : int
+            Index of the first output sample.
+        out : ndarray [samples x channels]
+            Caller-owned array.
+        """
+        phases, last = self.get_positions(first_output, out.shape[0])
+        windows = sliding_window_view(x, self.taps_per_phase, axis=0)
+        np.einsum('nck,nk->nc',
+                  windows[last - first_input - self.taps_per_phase + 1],
+                  self.bank[phases], out=out)
+
+
+class ResampledGenerator(BaseGenerator):
+    """ Generator that resamples the output of another generator, which
+    runs at its own rate (e.g., a preset designed for 256 Hz emulating a
+    device at 250 Hz), see PolyphaseResampler. The input samples are
+    generated on demand and the last taps_per_phase are carried between
+    chunks. Closed-loop state switches are forwarded to the source, and
+    take effect after the input samples that are already generated, i.e.,
+    with a latency of up to taps_per_phase / 2 input samples.
+
+    Parameters
+    ------------
+    source : BaseGenerator
+        Generator of the input.
+    fs : float
+        Sampling rate of the output.
+    taps_per_phase, beta, cutoff, max_phases :
+        See PolyphaseResampler.
+    """
+
+    def __init__(self, source, fs, taps_per_phase=16, beta=8.0, cutoff=0.9,
+                 max_phases=1024):
+        super().__init__(fs, source.n_cha, source.seed)
+        self.source = source
+        self.streaming_only = source.streaming_only
+        self.resampler = PolyphaseResampler(
+            source.fs, fs, taps_per_phase, beta, cutoff, max_phases)
+
+        # Input samples [history_start, history_start + history_len)
+        self.history = np.empty((0, self.n_cha))
+        self.history_start = 0
+        self.history_len = 0
+        self.next_output = None
+
+    def get_periodic_freqs(self):
+        return self.source.get_periodic_freqs()
+
+    def switch_state(self, state, start_sample):
+        return self.source.switch_state(state, math.ceil(
+            start_sample * self.resampler.down / self.resampler.up))
+
+    def get_state(self):
+        state = super().get_state()
+        state.update({
+            'source': self.source.get_state(),
+            'history': self.history[:self.history_len].copy(),
+            'history_start': self.history_start,
+            'next_output': self.next_output
+        })
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.source.set_state(state['source'])
+        history = np.asarray(state['history'])
+        self.history = np.array(history, dtype=float).reshape(-1, self.n_cha)
+        self.history_start = state['history_start']
+        self.history_len = history.shape[0]
+        self.next_output = state['next_output']
+
+    def _fill(self, out, start_sample):
+        first, end = self.resampler.get_input_span(start_sample,
+                                                   out.shape[0])
+        if start_sample != self.next_output or first < self.history_start:
+            # Not a continuation (e.g., samples were skipped): the input is
+            # generated again from the first sample needed
+            self.history_start = first
+            self.history_len = 0
+        else:
+            # Keep only the samples that are still needed
+            n_drop = min(first - self.history_start, self.history_len)
+            if n_drop > 0:
+                self.history_len -= n_drop
+                self.history[:self.history_len] = \
+                    self.history[n_drop:n_drop + self.history_len]
+                self.history_start += n_drop
+
+        # Generate the missing input samples
+        n_input = end - self.history_start
+        if self.history.shape[0] < n_input:
+            history = np.empty((2 * n_input, self.n_cha))
+            history[:self.history_len] = self.history[:self.history_len]
+            self.history = history
+        if n_input > self.history_len:
+            self.source.fill(self.history[self.history_len:n_input],
+                             self.history_start + self.history_len)
+            self.history_len = n_input
+
+        self.resampler.process(self.history[:n_input], self.history_start,
+                               start_sample, out)
+        self.next_output = start_sample + out.shape[0]
+
+    def get_loop(self, n_samples, crossfade_samples):
+        """ Resamples a loop of the source, circularly, if n_samples covers
+        a whole number of input samples. Otherwise, the first n_samples are
+        rendered (see BaseGenerator.get_loop). """
+        up, down = self.resampler.up, self.resampler.down
+        if (n_samples * down) % up != 0:
+            return super().get_loop(n_samples, crossfade_samples)
+        n_input = n_samples * down // up
+        loop = self.source.get_loop(
+            n_input, math.ceil(crossfade_samples * down / up))
+        first, end = self.resampler.get_input_span(0, n_samples)
+        out = np.empty((n_samples, self.n_cha))
+        self.resampler.process(loop[np.arange(first, end) % n_input], first,
+                               0, out)
+        return out
@@ -0,0 +1,237 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Runs a load scenario described by a JSON timeline against SignalGenerator
+instances, recording the throughput and timing quality of each stream. Usage:
+
+    python scenario_runner.py timeline.json --report report.json
+
+Example of timeline:
+
+    {
+        "duration": 120,
+        "sample_interval": 1.0,
+        "seed": 0,
+        "defaults": {"gen_settings": {"gen_type": "Uniform"}},
+        "events": [
+            {"t": 0, "action": "add", "count": 2, "group": "base"},
+            {"t": 30, "action": "add", "count": 10, "group": "burst",
+             "config": {"n_cha": 64, "sample_rate": 1000}},
+            {"t": 60, "action": "scale_rate", "factor": 2},
+            {"t": 90, "action": "remove", "fraction": 0.5, "group": "burst"},
+            {"t": 100, "action": "set", "group": "base",
+             "config": {"chunk_size": 4}}
+        ]
+    }
+
+Actions: "add" creates count streams with the defaults updated with config;
+"remove" destroys count streams or a fraction of them; "scale_rate"
+multiplies their sample rate by factor; and "set" reconfigures them with
+config. Except for "add", actions apply to the streams of group, or to all
+streams if no group is given. Streams removed by "remove" are chosen
+randomly with the seed of the timeline, so scenarios are reproducible.
+Streams that cannot be reconfigured are kept with their previous
+configuration, and the errors are logged in the events of the report.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import random
+import time
+from signal_generator import SignalGenerator, merge_config, update_config
+
+SCENARIO_ACTIONS = ('add', 'remove', 'scale_rate', 'set')
+
+
+class ScenarioRunner:
+    """ Runs a timeline of load events against SignalGenerator instances.
+
+    Parameters
+    ------------
+    timeline : dict
+        Scenario description (see the module docstring).
+    """
+
+    def __init__(self, timeline):
+        self.duration = timeline['duration']
+        self.sample_interval = timeline.get('sample_interval', 1.0)
+        self.defaults = timeline.get('defaults', dict())
+        self.events = sorted(timeline.get('events', list()),
+                             key=lambda e: e['t'])
+        for event in self.events:
+            if event['action'] not in SCENARIO_ACTIONS:
+                raise ValueError('Unknown scenario action: %s' %
+                                 event['action'])
+        self.rng = random.Random(timeline.get('seed', 0))
+        self.streams = dict()   # name -> (group, SignalGenerator)
+        self.n_created = 0
+        self.samples = list()
+        self.event_log = list()
+
+    def run(self):
+        """ Runs the scenario and returns the report. """
+        t_start = time.monotonic()
+        next_sample = 0.0
+        pending = list(self.events)
+        try:
+            while True:
+                t = time.monotonic() - t_start
+                while pending and pending[0]['t'] <= t:
+                    self.apply(pending.pop(0), t)
+                if t >= next_sample:
+                    self.sample(t)
+                    next_sample += self.sample_interval
+                if t >= self.duration:
+                    break
+                next_t = min([next_sample, self.duration] +
+                             [e['t'] for e in pending[:1]])
+                time.sleep(max(next_t - (time.monotonic() - t_start), 0))
+        finally:
+            for name in list(self.streams):
+                self.destroy(name)
+        return self.get_report()
+
+    def apply(self, event, t):
+        """ Applies a timeline event. """
+        action = event['action']
+        group = event.get('group', None)
+        errors = list()
+        if action == 'add':
+            config = merge_config(self.defaults, event.get('config', dict()))
+            names = [self.create(config, group if group is not None
+                                 else 'default')
+                     for _ in range(event.get('count', 1))]
+        else:
+            names = self.select(group)
+            if action == 'remove':
+                if 'fraction' in event:
+                    count = int(round(event['fraction'] * len(names)))
+                else:
+                    count = min(event.get('count', len(names)), len(names))
+                names = self.rng.sample(names, count)
+                for name in names:
+                    self.destroy(name)
+            elif action == 'scale_rate':
+                for name in names:
+                    rate = self.streams[name][1].sample_rate
+                    errors += self.reconfigure(
+                        name, {'sample_rate': rate * event['factor']})
+            elif action == 'set':
+                for name in names:
+                    errors += self.reconfigure(name, event['config'])
+        self.event_log.append({'t': t, 'event': event, 'streams': names,
+                               'errors': errors})
+        print('[ScenarioRunner] > t=%.2f s: %s (%i streams, %i running)' %
+              (t, action, len(names), len(self.streams)))
+
+    def select(self, group):
+        return sorted(name for name, (g, _) in self.streams.items()
+                      if group is None or g == group)
+
+    def create(self, config, group, name=None):
+        if name is None:
+            name = '%s_%i' % (config.get('stream_name', 'Scenario'),
+                              self.n_created)
+            self.n_created += 1
+        config = merge_config(config, {'stream_name': name})
+        signal_generator = SignalGenerator.from_config(config)
+        signal_generator.init_send_lsl()
+        self.streams[name] = (group, signal_generator)
+        return name
+
+    def destroy(self, name):
+        _, signal_generator = self.streams.pop(name)
+        signal_generator.close()
+
+    def reconfigure(self, name, config):
+        """ Recreates the stream with the new configuration under the same
+        name, since the sample rate and buffers cannot change on the fly.
+        The new stream is created first, so the old one is kept running if
+        the config is invalid; if the new stream cannot be started, the
+        stream is removed. Errors do not stop the scenario: they are
+        returned to be logged in the report.
+
+        Returns
+        ------------
+        list
+            Errors, as dicts with keys "stream" and "error".
+        """
+        group, signal_generator = self.streams[name]
+        try:
+            config = update_config(signal_generator.get_config(), config)
+            new_generator = SignalGenerator.from_config(config)
+        except Exception as e:
+            print('[ScenarioRunner] > Cannot reconfigure %s, keeping its '
+                  'previous configuration: %s' % (name, e))
+            return [{'stream': name, 'error': repr(e)}]
+        signal_generator.close()
+        try:
+            new_generator.init_send_lsl()
+        except Exception as e:
+            print('[ScenarioRunner] > Cannot restart %s, removing it: %s' %
+                  (name, e))
+            del self.streams[name]
+            new_generator.close()
+            return [{'stream': name, 'error': repr(e)}]
+        self.streams[name] = (group, new_generator)
+        return list()
+
+    def sample(self, t):
+        """ Records the statistics of every running stream. """
+        for name, (group, signal_generator) in self.streams.items():
+            stats = signal_generator.get_stats()
+            self.samples.append({
+                't': round(t, 3),
+                'stream': name,
+                'group': group,
+                'nominal_rate': stats['nominal_rate'],
+                'effective_rate': stats['effective_rate'],
+                'samples_sent': stats['samples_sent'],
+                'chunks_sent': stats['chunks_sent'],
+                'queue_depth': stats['queue_depth'],
+                'jitter_p50_ms': stats['jitter_ms'][0.5],
+                'jitter_p99_ms': stats['jitter_ms'][0.99],
+                'generation_p99_ms': stats['generation_ms'][0.99],
+                'push_p99_ms': stats['push_ms'][0.99],
+                'io_cpu_time': stats['io_cpu_time'],
+                'timer_cpu_time': stats['timer_cpu_time'],
+                'io_mode': stats['realtime_mode']['io'],
+                'timer_mode': stats['realtime_mode']['timer'],
+            })
+
+    def get_report(self):
+        return {'duration': self.duration,
+                'events': self.event_log,
+                'samples': self.samples}
+
+
+def write_report(report, path):
+    """ Writes the report as JSON, or the samples as CSV if the extension of
+    the path is .csv. """
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            if report['samples']:
+                writer = csv.DictWriter(f, fieldnames=list(
+                    report['samples'][0].keys()))
+                writer.writeheader()
+                writer.writerows(report['samples'])
+    else:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description='Runs a load scenario.')
+    parser.add_argument('timeline', help='JSON file with the timeline.')
+    parser.add_argument('--report', default='scenario_report.json',
+                        help='Output report (.json or .csv).')
+    args = parser.parse_args()
+    with open(args.timeline) as f:
+        runner = ScenarioRunner(json.load(f))
+    write_report(runner.run(), args.report)
+    print('[ScenarioRunner] > Report saved to %s' % args.report)
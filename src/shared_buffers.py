@@ -0,0 +1,196 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Read-only signal buffers shared between streams with identical generator
+settings, enabled with gen_settings["shared_buffer"] = True. Each buffer
+lives in a named shared memory block, so it is shared by the streams of the
+same process and of other processes. The first stream that requests a
+buffer renders it; the rest attach to it and wait until it is ready. The
+block header counts the streams that have attached to it, so that each one
+can read at its own offset.
+
+The block is unlinked when the process that rendered it releases its last
+reference. Streams of other processes that are attached at that moment keep
+a valid mapping, but streams created afterwards render a new buffer.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+# Header of each block: state (0: rendering, 1: ready), samples, channels,
+# number of streams that have attached to it
+HEADER_BYTES = 64
+STATE_READY = 1
+HEADER_ATTACHED = 3
+
+# Buffers attached by this process: name -> [shm, array, refs, owner, ready,
+# error]. The entry is published before the buffer is ready, so that the
+# lock is not held while it is rendered; ready is set once it is ready or
+# failed (error)
+_BUFFERS = dict()
+_LOCK = threading.Lock()
+
+
+def get_buffer_key(*args):
+    """ Returns the name of the shared buffer that corresponds to the given
+    rendering parameters, which must be JSON serializable or numpy arrays.
+    """
+    def default(obj):
+        if isinstance(obj, np.ndarray):
+            return hashlib.sha1(np.ascontiguousarray(obj)).hexdigest()
+        return repr(obj)
+    text = json.dumps(args, sort_keys=True, default=default)
+    return 'lslgen_%s' % hashlib.sha1(text.encode()).hexdigest()[:24]
+
+
+def acquire_shared_buffer(key, shape, render, timeout=60.0):
+    """ Returns a read-only view of the shared buffer key, rendering it if it
+    does not exist yet. Each call that returns a buffer must be paired with
+    release_shared_buffer. The buffer is rendered (or awaited) without
+    holding the lock of the module, so buffers with other keys can be
+    acquired meanwhile.
+
+    Parameters
+    ------------
+    key : str
+        Name of the buffer (see get_buffer_key).
+    shape : tuple
+        Shape [samples x channels] of the buffer (float64).
+    render : callable
+        Function that writes the buffer into the array it receives. Only
+        called if the buffer is created by this call.
+    timeout : float
+        Maximum time (s) to wait until a buffer rendered by other thread or
+        process is ready.
+
+    Returns
+    ------------
+    ndarray: [samples x channels]
+        Read-only buffer, or None if shared memory is not available, in
+        which case the caller must render its own buffer.
+    int
+        Number of streams that had attached to the buffer before this one,
+        counted across processes, which can be used to give each stream its
+        own read offset.
+    """
+    if shared_memory is None:
+        return None, 0
+    with _LOCK:
+        entry = _BUFFERS.get(key, None)
+        if entry is not None:
+            entry[2] += 1
+            prepare = False
+        else:
+            n_bytes = HEADER_BYTES + int(np.prod(shape)) * 8
+            try:
+                shm = shared_memory.SharedMemory(name=key, create=True,
+                                                 size=n_bytes)
+                owner = True
+            except FileExistsError:
+                shm = shared_memory.SharedMemory(name=key)
+                owner = False
+                # Only the process that creates the block must unlink it
+                try:
+                    resource_tracker.unregister(shm._name, 'shared_memory')
+                except Exception:
+                    pass
+            except OSError as e:
+                print('[SharedBuffers] > Shared memory not available (%s), '
+                      'the buffer is rendered privately.' % e)
+                return None, 0
+            array = np.ndarray(shape, dtype=np.float64, buffer=shm.buf,
+                               offset=HEADER_BYTES)
+            entry = [shm, array, 1, owner, threading.Event(), None]
+            _BUFFERS[key] = entry
+            prepare = True
+        header = np.ndarray((HEADER_BYTES // 8, ), dtype=np.int64,
+                            buffer=entry[0].buf)
+        index = int(header[HEADER_ATTACHED])
+        header[HEADER_ATTACHED] += 1
+        del header
+
+    if not prepare:
+        # Rendered or awaited by other thread of this process
+        if not entry[4].wait(timeout):
+            _release(key, entry)
+            raise TimeoutError('The shared buffer %s is not ready' % key)
+        if entry[5] is not None:
+            raise entry[5]
+        return entry[1], index
+
+    shm, array, _, owner, ready, _ = entry
+    header = np.ndarray((HEADER_BYTES // 8, ), dtype=np.int64,
+                        buffer=shm.buf)
+    try:
+        if owner:
+            header[1:3] = shape
+            render(array)
+            header[0] = STATE_READY
+        else:
+            deadline = time.monotonic() + timeout
+            while header[0] != STATE_READY:
+                if time.monotonic() > deadline:
+                    raise TimeoutError('The shared buffer %s is not ready' %
+                                       key)
+                time.sleep(0.01)
+            if tuple(header[1:3]) != tuple(shape):
+                raise ValueError('The shared buffer %s has a different '
+                                 'shape' % key)
+    except Exception as e:
+        # The threads waiting for the buffer raise the same error, and the
+        # next calls start over
+        with _LOCK:
+            _BUFFERS.pop(key)
+            entry[1] = None
+            entry[5] = e
+        ready.set()
+        del header, array
+        shm.close()
+        if owner:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        raise
+    del header
+    array.flags.writeable = False
+    ready.set()
+    return array, index
+
+
+def release_shared_buffer(key):
+    """ Releases a reference to the shared buffer key. The block is closed
+    when the process has no references left, and unlinked if this process
+    rendered it. """
+    with _LOCK:
+        entry = _BUFFERS.get(key, None)
+    if entry is not None:
+        _release(key, entry)
+
+
+def _release(key, entry):
+    with _LOCK:
+        if _BUFFERS.get(key, None) is not entry:
+            return
+        entry[2] -= 1
+        if entry[2] > 0:
+            return
+        _BUFFERS.pop(key)
+        shm, owner = entry[0], entry[3]
+        entry[1] = None
+        shm.close()
+        if owner:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
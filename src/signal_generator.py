@@ -4,18 +4,61 @@ Date:     02 June 2023
 Version:  2.2
 """
 
-from pylsl import StreamInfo, StreamOutlet, local_clock
+from pylsl import StreamInfo, local_clock
+import copy
+import fractions
+import socket
 import time
+import math
+import queue
 import threading
+import zlib
 import numpy as np
-import pandas as pd
 import multiprocessing
+from constants import DEFAULT_STREAM_CONFIG, EEG_10_20, EEG_10_10, EEG_10_05
+from artifacts import ArtifactInjector
+from stream_stats import StreamStats
+from preview_buffer import PreviewBuffer
+from generators import create_generator, read_circular, UniformGenerator, \
+    EEGGenerator
+from shared_buffers import get_buffer_key, acquire_shared_buffer, \
+    release_shared_buffer
+from recording_tee import RecordingTee
+from sinks import create_sink, LSLSink
+from derived_streams import create_derived_stream
+from delivery_model import DeliveryModel
+from clock_model import ClockModel
+from checkpoint import save_checkpoint, load_checkpoint
+from realtime import apply_realtime, get_realtime_mode
+from trigger_listener import TriggerListener
+from resampler import ResampledGenerator
+from profiler import StageProfiler, STAGE_QUEUE, STAGE_GENERATE, \
+    STAGE_ARTIFACTS, STAGE_CONVERT, STAGE_PUSH, STAGE_RECORD
+from loopback_verifier import LoopbackVerifier, SEQ_MODULUS, \
+    CHECKSUM_FORMATS, get_checksum
+
+# LSL channel formats that can be pushed straight from a numpy buffer
+LSL_NUMPY_FORMATS = {
+    'float32': np.float32,
+    'double64': np.float64,
+    'int32': np.int32,
+    'int16': np.int16,
+    'int8': np.int8,
+    'int64': np.int64
+}
 
 
 class SignalGenerator:
 
     def __init__(self, stream_name, stream_type, chunk_size, format, n_cha,
-                 l_cha, units, sample_rate, gen_settings, hostname):
+                 l_cha, units, sample_rate, gen_settings, hostname,
+                 adaptive_settings=None, artifact_settings=None,
+                 preview_secs=None, loopback_settings=None,
+                 realtime_settings=None, recording_settings=None,
+                 delivery_settings=None, profile_settings=None,
+                 trigger_settings=None, sink_settings=None,
+                 resample_settings=None, derived_settings=None,
+                 clock_settings=None, checkpoint=None):
 
         # Error check
         if len(l_cha) != n_cha:
@@ -33,53 +76,279 @@ class SignalGenerator:
         self.sample_rate = sample_rate
         self.gen_settings = gen_settings
         self.hostname = hostname
+        self.adaptive_settings = adaptive_settings
+        self.artifact_settings = artifact_settings
+        self.preview_secs = preview_secs
+        self.realtime_settings = realtime_settings
+        self.recording_settings = recording_settings
+        self.delivery_settings = delivery_settings
+        self.profile_settings = profile_settings
+        self.trigger_settings = trigger_settings
+        self.sink_settings = sink_settings
+        self.resample_settings = resample_settings
+        self.derived_settings = derived_settings
+        self.clock_settings = clock_settings
+
+        # State to resume from (see save_checkpoint)
+        self.checkpoint_state = None
+        if checkpoint is not None:
+            self.checkpoint_state = load_checkpoint(checkpoint)
 
-        # Initialize the generator
-        if self.gen_settings["gen_type"] == "EEG (closed eyes)":
-            tones = list()
-            tones.append((10, 11))
-            tones.append((20, 7))
-            if self.gen_settings["eeg_ac"]:
-                tones.append((50, 12))
-                tones.append((100, 7))
-            self.generator = EEGGenerator(
-                fs=self.sample_rate, n_cha=self.n_cha, tones=tones,
-                pink_method=self.gen_settings["eeg_pink"])
-        elif self.gen_settings["gen_type"] == "EEG (open eyes)":
-            tones = list()
-            if self.gen_settings["eeg_ac"]:
-                tones.append((50, 12))
-                tones.append((100, 7))
-            self.generator = EEGGenerator(
-                fs=self.sample_rate, n_cha=self.n_cha, tones=tones,
-                pink_method=self.gen_settings["eeg_pink"])
-        elif self.gen_settings["gen_type"] == "Uniform":
-            self.generator = UniformGenerator(
-                n_cha=self.n_cha, mean=gen_settings["uniform_mean"],
-                std=gen_settings["uniform_std"])
+        # Initialize the generator (see generators.GENERATORS)
+        #   With resample_settings, the generator runs at the source_rate and
+        #   its output is resampled on the fly to the sample_rate (see
+        #   ResampledGenerator), e.g. to emulate a 250 Hz device with a
+        #   preset designed for 256 Hz
+        if resample_settings is not None:
+            resample_settings = dict(resample_settings)
+            source = create_generator(self.gen_settings,
+                                      resample_settings.pop('source_rate'),
+                                      self.n_cha, self.l_cha)
+            self.generator = ResampledGenerator(source, self.sample_rate,
+                                                **resample_settings)
+            resampler = self.generator.resampler
+            print('[SignalGenerator] > Resampling from %g Hz to %g Hz '
+                  '(%i/%i, %i taps per phase).' %
+                  (source.fs, resampler.effective_rate, resampler.up,
+                   resampler.down, resampler.taps_per_phase))
         else:
-            raise ValueError("Unknown generator value: %s!" % self.generator)
+            self.generator = create_generator(self.gen_settings,
+                                              self.sample_rate, self.n_cha,
+                                              self.l_cha)
+
+        # Chunk sizing
+        #   In adaptive mode the number of samples per push is chosen (and
+        #   adjusted at runtime) by the controller according to the target
+        #   latency and CPU budget. Otherwise, it is fixed to chunk_size
+        self.adaptive_controller = None
+        self.samples_per_push = self.chunk_size
+        self.max_push = self.chunk_size
+        if adaptive_settings is not None:
+            self.adaptive_controller = AdaptiveChunkController(
+                sample_rate=self.sample_rate, **adaptive_settings)
+            self.samples_per_push = self.adaptive_controller.chunk_size
+            self.max_push = self.adaptive_controller.max_chunk
+            self.adaptive_controller.log()
+
+        # Delivery model
+        #   Simulates the irregular chunks, delays, bursts and losses of
+        #   wireless amplifiers. The packets are planned by the model and the
+        #   timer ticks every millisecond to release them on time
+        self.delivery_model = None
+        if delivery_settings is not None:
+            if adaptive_settings is not None:
+                raise ValueError('The delivery model is not compatible with '
+                                 'the adaptive chunk size')
+            delivery_settings = dict(delivery_settings)
+            delivery_settings.setdefault('chunk_size', self.chunk_size)
+            delivery_settings.setdefault('max_chunk', 4 * self.chunk_size)
+            self.delivery_model = DeliveryModel(fs=self.sample_rate,
+                                                **delivery_settings)
+            self.max_push = max(self.max_push, self.delivery_model.max_chunk)
+
+        # Clock model
+        #   Simulates the skew, drift and jitter of the clock of the
+        #   amplifier, which sets both the rate at which samples are
+        #   produced and their timestamps
+        self.clock_model = None
+        if clock_settings is not None:
+            self.clock_model = ClockModel(**clock_settings)
 
         # Offline generation of data
         #   This allows us to avoid delays regarding real-time EEG
         #   generation. Instead, we generate N chunks of data beforehand and
-        #   loop over them circularly
+        #   loop over them circularly. The buffer is stored sample-wise
+        #   [samples x channels] so that it can be read with any push size.
+        #   In loop mode, the buffer is the shortest one over which all the
+        #   tones complete whole cycles, with the noise crossfaded at the
+        #   seam, so the loop has no discontinuities. In streaming mode,
+        #   chunks are generated on the fly instead, which produces unbounded
+        #   output without loops
         OFFLINE_N_CHUNKS = 1000
-        self.eeg_buffer = self.generator.get_chunks(
-            OFFLINE_N_CHUNKS, self.chunk_size
-        )
+        self.render_mode = self.gen_settings.get("render_mode", "prerendered")
+        if self.render_mode not in ("prerendered", "loop", "streaming"):
+            raise ValueError("Unknown render mode: %s!" % self.render_mode)
+        if self.generator.streaming_only and self.render_mode != "streaming":
+            print('[SignalGenerator] > %s only supports the streaming render '
+                  'mode.' % self.gen_settings['gen_type'])
+            self.render_mode = "streaming"
+        self.eeg_buffer = None
+        self.buffer_key = None
+        self.buffer_length = OFFLINE_N_CHUNKS * self.chunk_size
+        self.buffer_crossfade = 0
+        if self.render_mode == "loop":
+            min_samples = max(int(self.gen_settings.get(
+                "loop_min_secs", 10) * self.sample_rate), self.max_push)
+            max_samples = max(OFFLINE_N_CHUNKS * self.chunk_size, min_samples)
+            loop_length = get_loop_length(
+                self.sample_rate, self.generator.get_periodic_freqs(),
+                min_samples, max_samples)
+            if loop_length is None:
+                print('[SignalGenerator] > The tones do not have a common '
+                      'period shorter than %i samples, the default buffer is '
+                      'used instead.' % max_samples)
+                self.render_mode = "prerendered"
+            else:
+                crossfade = int(self.gen_settings.get(
+                    "loop_crossfade_secs", 0.5) * self.sample_rate)
+                self.buffer_length = loop_length
+                self.buffer_crossfade = min(crossfade, loop_length)
+                print('[SignalGenerator] > Phase-coherent loop of %i samples '
+                      '(%.2f s).' % (loop_length,
+                                     loop_length / self.sample_rate))
+        #   With gen_settings["shared_buffer"], streams with identical
+        #   settings share a single read-only buffer, rendered by the first
+        #   one. Each stream starts reading at its own offset, derived from
+        #   its name and the number of streams that attached to the buffer
+        #   before it, so that their outputs are decorrelated even if their
+        #   names are equal
+        buffer_index = 0
+        if self.checkpoint_state is not None and \
+                'buffer' in self.checkpoint_state:
+            # Memory-mapped buffer of the checkpoint, no need to render it
+            self.eeg_buffer = self.checkpoint_state['buffer']
+        elif self.render_mode != "streaming":
+            shape = (self.buffer_length, self.n_cha)
+            if self.gen_settings.get("shared_buffer", False):
+                key = get_buffer_key(self.gen_settings, self.sample_rate,
+                                     self.n_cha, self.chunk_size,
+                                     self.render_mode, self.buffer_length,
+                                     self.buffer_crossfade,
+                                     self.resample_settings)
+                try:
+                    self.eeg_buffer, buffer_index = acquire_shared_buffer(
+                        key, shape, self.render_buffer)
+                except (TimeoutError, ValueError) as e:
+                    print('[SignalGenerator] > %s, the buffer is rendered '
+                          'privately.' % e)
+                if self.eeg_buffer is not None:
+                    self.buffer_key = key
+            if self.eeg_buffer is None:
+                self.eeg_buffer = np.empty(shape)
+                self.render_buffer(self.eeg_buffer)
+        self.buffer_idx = 0
+        if self.buffer_key is not None:
+            self.buffer_idx = zlib.crc32(('%s_%i' % (
+                self.stream_name, buffer_index)).encode()) % self.buffer_length
         self.n_chunks_sent = 0
-        self.buffer_sent_times = list()
+        self.n_samples_sent = 0
+        self.stats = StreamStats(self.sample_rate)
+
+        # Artifacts
+        #   Sparse events added on top of the outgoing chunks
+        self.artifact_injector = None
+        if artifact_settings is not None:
+            self.artifact_injector = ArtifactInjector(
+                fs=self.sample_rate, n_cha=self.n_cha, l_cha=self.l_cha,
+                **artifact_settings)
+
+        # Snapshot of the last pushed samples for live previews
+        self.preview_buffer = None
+        if preview_secs is not None:
+            self.preview_buffer = PreviewBuffer(
+                self.n_cha, int(preview_secs * self.sample_rate))
+
+        # Loopback verification
+        #   Adds a sequence-counter channel (and optionally a checksum
+        #   channel) to the outlet, which are checked by a local inlet
+        self.loopback_settings = loopback_settings
+        self.loopback_verifier = None
+        self.n_extra_cha = 0
+        if self.loopback_settings is not None:
+            if self.format not in SEQ_MODULUS:
+                raise ValueError('The loopback verifier does not support the '
+                                 '%s format' % self.format)
+            checksum = self.loopback_settings.get('checksum', True)
+            if checksum and self.format not in CHECKSUM_FORMATS:
+                raise ValueError('The checksum channel requires a float '
+                                 'format')
+            self.n_extra_cha = 2 if checksum else 1
 
-        # LSL
+        # Scratch buffer for outgoing chunks
+        #   If the LSL format has a numpy counterpart, chunks are pushed
+        #   directly from this buffer, avoiding the list conversion. The
+        #   verification channels are placed after the data channels
+        self.lsl_dtype = LSL_NUMPY_FORMATS.get(self.format, None)
+        self.out_buffer = np.empty(
+            (self.max_push, self.n_cha + self.n_extra_cha),
+            dtype=self.lsl_dtype if self.lsl_dtype is not None else np.float64
+        )
+
+        # Also part of the description saved with the recordings
+        self.source_id = '_'.join([self.stream_name, self.stream_type,
+                                   str(self.n_cha), str(self.sample_rate),
+                                   self.format, self.hostname])
+
+        # Recording of the pushed chunks
+        #   Ground-truth copy of every chunk (including the verification
+        #   channels) and its timestamp, written to disk by another thread.
+        #   When resuming from a checkpoint, the recording is continued
+        self.recording_tee = None
+        if recording_settings is not None:
+            recording_settings = dict(recording_settings)
+            self.recording_tee = RecordingTee(
+                path=recording_settings.pop('path'),
+                n_cha=self.n_cha + self.n_extra_cha,
+                dtype=self.out_buffer.dtype, max_chunk=self.max_push,
+                info=self.get_info(),
+                append=self.checkpoint_state is not None,
+                **recording_settings)
+
+        # Profiling of the hot path
+        #   Duration of each stage for every chunk (see StageProfiler). When
+        #   disabled, the only cost is a check per stage
+        self.profiler = None
+        if profile_settings is not None:
+            self.profiler = StageProfiler(**profile_settings)
+
+        # Closed-loop commands
+        #   Markers received from an LSL inlet change the signal from the
+        #   first sample due after them (see TriggerListener)
+        self.trigger_listener = None
+        if trigger_settings is not None:
+            self.trigger_listener = TriggerListener(
+                fs=self.sample_rate, n_cha=self.n_cha, l_cha=self.l_cha,
+                state_handler=self.generator.switch_state,
+                **trigger_settings)
+            self.trigger_listener.start()
+
+        # Resume from the checkpoint
+        #   The sample numbering and timestamp origin are kept, so that the
+        #   consumers see a continuous stream (with a gap for the samples
+        #   that should have been sent while the stream was down)
+        self.resume_timestamp = None
+        self.io_requests = queue.Queue()
+        if self.checkpoint_state is not None:
+            self.set_state(self.checkpoint_state)
+            print('[SignalGenerator] > Resumed from sample %i.' %
+                  self.n_samples_sent)
+
+        # Output transports (see sinks.py). The LSL outlet, if any, is also
+        # available as lsl_outlet
+        if self.sink_settings is None:
+            self.sink_settings = [{'type': 'lsl'}]
+        if self.loopback_settings is not None and not any(
+                s.get('type', 'lsl') == 'lsl' for s in self.sink_settings):
+            raise ValueError('The loopback verifier requires the LSL sink')
         self.update_queue = multiprocessing.Queue(maxsize=0)
+        self.sinks = list()
         self.lsl_outlet = None
 
+        # Derived streams
+        #   Companion outlets (e.g., band power or a decimated signal)
+        #   computed incrementally from each pushed chunk (see
+        #   derived_streams.py). They are open while the stream transmits
+        self.derived_streams = [
+            create_derived_stream(settings, self)
+            for settings in (derived_settings or list())]
+
         # Run IO function in other thread
         #   This thread sends data whenever it is required
         self.io_run = threading.Event()
         self.io_run.set()   # Event to control the thread
         self.io_init_timestamp = None
+        self.io_cpu_time = 0.0
+        self.io_realtime = None
         self.io_thread = threading.Thread(
             name='SignalGenerator_IO_Thread',
             target=self.send_data,
@@ -92,17 +361,213 @@ class SignalGenerator:
         #   send a chunk of data to guarantee the sample_rate. This timer is
         #   run in other process to guarantee independent computation of the
         #   ms delay (if it is run in a thread a latency error will be
-        #   expected so the sample_rate will not be reached exactly)
-        chunk_ms = 1000 * self.chunk_size / self.sample_rate
+        #   expected so the sample_rate will not be reached exactly). The
+        #   period is shared so that the adaptive mode can modify it
+        tick_ms = 1000 * self.samples_per_push / self.sample_rate
+        if self.delivery_model is not None:
+            tick_ms = min(tick_ms, 1.0)
+        self.tick_ms = multiprocessing.Value('d', tick_ms)
         self.stop_process = multiprocessing.Value('i', 0)
+        self.timer_cpu_time = multiprocessing.Value('d', 0.0)
+        self.timer_realtime = None
+        self.realtime_queue = multiprocessing.Queue()
         self.timer_process = multiprocessing.Process(
             name='SignalGenerator_Timer_Process',
             target=self.timer,
-            args=(self.stop_process, chunk_ms, self.update_queue)
+            args=(self.stop_process, self.tick_ms, self.update_queue,
+                  self.timer_cpu_time, self.get_realtime_args('timer'),
+                  self.realtime_queue)
         )
         self.timer_process.start()
 
+    @classmethod
+    def from_config(cls, config):
+        """ Creates a signal generator from a configuration dict, which is
+        useful for headless use. Missing parameters take the values of
+        DEFAULT_STREAM_CONFIG, the channel labels can be 'auto' and the
+        hostname defaults to the current one.
+
+        Parameters
+        ------------
+        config : dict
+            Arguments of the constructor.
+
+        Returns
+        ------------
+        SignalGenerator
+            New signal generator.
+        """
+        config = merge_config(DEFAULT_STREAM_CONFIG, config)
+        if config['l_cha'] == 'auto':
+            config['l_cha'] = get_default_channel_labels(config['n_cha'])
+        if config['hostname'] is None:
+            config['hostname'] = socket.gethostname()
+        return cls(**config)
+
+    def get_config(self):
+        """ Returns the configuration of the generator, so that
+        SignalGenerator.from_config(gen.get_config()) creates an equivalent
+        generator. """
+        config = {
+            'stream_name': self.stream_name,
+            'stream_type': self.stream_type,
+            'chunk_size': self.chunk_size,
+            'format': self.format,
+            'n_cha': self.n_cha,
+            'l_cha': list(self.l_cha),
+            'units': self.units,
+            'sample_rate': self.sample_rate,
+            'gen_settings': self.gen_settings,
+            'hostname': self.hostname,
+            'adaptive_settings': self.adaptive_settings,
+            'artifact_settings': self.artifact_settings,
+            'preview_secs': self.preview_secs,
+            'loopback_settings': self.loopback_settings,
+            'realtime_settings': self.realtime_settings,
+            'recording_settings': self.recording_settings,
+            'delivery_settings': self.delivery_settings,
+            'profile_settings': self.profile_settings,
+            'trigger_settings': self.trigger_settings,
+            'sink_settings': self.sink_settings,
+            'resample_settings': self.resample_settings,
+            'derived_settings': self.derived_settings,
+            'clock_settings': self.clock_settings
+        }
+        return copy.deepcopy(config)
+
+    @classmethod
+    def from_checkpoint(cls, path):
+        """ Creates a signal generator that resumes the stream saved in a
+        checkpoint (see save_checkpoint). The prerendered buffer is
+        memory-mapped from the checkpoint instead of rendered, and the
+        stream is started if it was transmitting.
+
+        Parameters
+        ------------
+        path : str
+            Folder of the checkpoint.
+
+        Returns
+        ------------
+        SignalGenerator
+            Resumed signal generator.
+        """
+        config = load_checkpoint(path)['config']
+        signal_generator = cls(checkpoint=path, **config)
+        if signal_generator.checkpoint_state['transmitting']:
+            signal_generator.init_send_lsl()
+        return signal_generator
+
+    def save_checkpoint(self, path, timeout=1.0):
+        """ Saves a snapshot of the state of the stream into the folder
+        path, from which it can be resumed with from_checkpoint. The
+        snapshot is taken by the IO thread between pushes, so it is
+        consistent, and written to disk by the calling thread. The buffer of
+        the prerendered and loop modes is only written the first time.
+
+        Parameters
+        ------------
+        path : str
+            Folder of the checkpoint.
+        timeout : float
+            Maximum time (s) to wait for the snapshot.
+        """
+        save_checkpoint(self.get_state(timeout), path, reuse=('buffer', ))
+
+    def get_state(self, timeout=1.0):
+        """ Returns a snapshot of the state of the stream: configuration,
+        sample index, timestamp origin and state of the generator, the
+        artifact injector and the delivery model. """
+        return self.run_in_io_thread(self._get_state, timeout)
+
+    def run_in_io_thread(self, function, timeout=1.0):
+        """ Calls function from the IO thread between two pushes and
+        returns its result. If the IO thread is not running, the function is
+        called directly. Exceptions raised by the function are raised in
+        the calling thread. """
+        if not self.io_thread.is_alive():
+            return function()
+        request = [threading.Event(), None, function, None]
+        self.io_requests.put(request)
+        if not request[0].wait(timeout):
+            raise TimeoutError('The IO thread did not respond')
+        if request[3] is not None:
+            raise request[3]
+        return request[1]
+
+    @property
+    def transmitting(self):
+        return len(self.sinks) > 0
+
+    def _get_state(self):
+        state = {
+            'config': self.get_config(),
+            'source_id': self.source_id,
+            'n_samples_sent': self.n_samples_sent,
+            'n_chunks_sent': self.n_chunks_sent,
+            'buffer_idx': self.buffer_idx,
+            'io_init_timestamp': self.io_init_timestamp,
+            'transmitting': self.transmitting,
+            'generator': self.generator.get_state()
+        }
+        if self.eeg_buffer is not None:
+            state['buffer'] = self.eeg_buffer
+        if self.artifact_injector is not None:
+            state['artifacts'] = self.artifact_injector.get_state()
+        if self.delivery_model is not None:
+            state['delivery'] = self.delivery_model.get_state()
+        if self.clock_model is not None:
+            state['clock'] = self.clock_model.get_state()
+        return state
+
+    def set_state(self, state):
+        self.source_id = state['source_id']
+        self.n_samples_sent = state['n_samples_sent']
+        self.n_chunks_sent = state['n_chunks_sent']
+        self.buffer_idx = state['buffer_idx']
+        self.resume_timestamp = state['io_init_timestamp']
+        self.generator.set_state(state['generator'])
+        if self.artifact_injector is not None and 'artifacts' in state:
+            self.artifact_injector.set_state(state['artifacts'])
+        if self.delivery_model is not None and 'delivery' in state:
+            self.delivery_model.set_state(state['delivery'])
+        if self.clock_model is not None and 'clock' in state:
+            self.clock_model.set_state(state['clock'])
+
+    def get_realtime_args(self, worker):
+        """ Arguments of realtime.apply_realtime for the "io" or "timer"
+        worker, or None if the default scheduling is used.
+
+        The realtime_settings may contain the CPUs of each worker
+        ("io_cpus" and "timer_cpus"), the scheduling "policy" ("fifo" or
+        "rr") and "priority", and "lock_memory".
+        """
+        if self.realtime_settings is None:
+            return None
+        return {
+            'name': 'IO thread' if worker == 'io' else 'Timer process',
+            'cpus': self.realtime_settings.get('%s_cpus' % worker, None),
+            'policy': self.realtime_settings.get('policy', None),
+            'priority': self.realtime_settings.get('priority', 10),
+            'lock_memory': self.realtime_settings.get('lock_memory', False)
+        }
+
+    def render_buffer(self, out):
+        """ Renders the signal buffer of the prerendered and loop modes into
+        out [samples x channels]. """
+        if self.render_mode == "loop":
+            out[:] = self.generator.get_loop(out.shape[0],
+                                             self.buffer_crossfade)
+        else:
+            out[:] = self.generator.get_chunks(
+                out.shape[0] // self.chunk_size, self.chunk_size
+            ).reshape(-1, self.n_cha)
+
     def close(self):
+        # Close the stream
+        if self.transmitting:
+            self.close_lsl()
+
         # Stop events
         self.io_run.clear()
         self.stop_process.value = 1
@@ -111,17 +576,48 @@ class SignalGenerator:
         self.io_thread.join()
         self.timer_process.join()
 
-    def init_send_lsl(self):
-        # Create the steam outlet
-        source_id = '_'.join([self.stream_name, self.stream_type,
-                              str(self.n_cha), str(self.sample_rate),
-                              self.format, self.hostname])
+        # Write the pending chunks of the recording
+        if self.recording_tee is not None:
+            self.recording_tee.close()
+
+        if self.profiler is not None:
+            self.profiler.close()
+        if self.clock_model is not None:
+            self.clock_model.close()
+        if self.trigger_listener is not None:
+            self.trigger_listener.close()
+
+        # Release the shared buffer
+        if self.buffer_key is not None:
+            self.eeg_buffer = None
+            release_shared_buffer(self.buffer_key)
+            self.buffer_key = None
+
+    def get_info(self):
+        """ Description of the stream, saved along with recordings and
+        available to the readers of the sinks. """
+        return {
+            'stream_name': self.stream_name,
+            'stream_type': self.stream_type,
+            'source_id': self.source_id,
+            'format': self.format,
+            'units': self.units,
+            'sample_rate': self.sample_rate,
+            'n_cha': self.n_cha,
+            'l_cha': list(self.l_cha),
+            'n_extra_cha': self.n_extra_cha,
+            'gen_settings': self.gen_settings,
+            'resample_settings': self.resample_settings
+        }
+
+    def get_lsl_info(self):
+        """ StreamInfo of the LSL outlet. """
         lsl_info = StreamInfo(name=self.stream_name,
                               type=self.stream_type,
-                              channel_count=self.n_cha,
+                              channel_count=self.n_cha + self.n_extra_cha,
                               nominal_srate=self.sample_rate,
                               channel_format=self.format,
-                              source_id=source_id)
+                              source_id=self.source_id)
         # lsl_info.desc().append_child_value("manufacturer", "")
         channels = lsl_info.desc().append_child("channels")
         for l in self.l_cha:
@@ -129,293 +625,561 @@ class SignalGenerator:
                 .append_child_value("label", l) \
                 .append_child_value("units", self.units) \
                 .append_child_value("type", self.stream_type)
+        for l in ['SEQ', 'CHK'][:self.n_extra_cha]:
+            channels.append_child("channel") \
+                .append_child_value("label", l) \
+                .append_child_value("type", "MISC")
+        return lsl_info
+
+    def init_send_lsl(self):
+        """ Opens the sinks of the stream (see sink_settings), which
+        starts the transmission. """
+        sinks = list()
+        try:
+            for settings in self.sink_settings:
+                sinks.append(create_sink(settings, self))
+        except Exception:
+            for sink in sinks:
+                sink.close()
+            raise
+        for sink in sinks:
+            if isinstance(sink, LSLSink):
+                self.lsl_outlet = sink.outlet
+        for derived_stream in self.derived_streams:
+            derived_stream.open()
+        self.sinks = sinks
 
-        self.lsl_outlet = StreamOutlet(info=lsl_info,
-                                       chunk_size=self.chunk_size,
-                                       max_buffered=360)
-        print('[SignalGenerator] > LSL stream created.')
+        # Start the loopback verifier
+        if self.loopback_settings is not None:
+            self.loopback_verifier = LoopbackVerifier(
+                source_id=self.source_id, n_cha=self.n_cha,
+                format=self.format,
+                **self.loopback_settings)
+            self.loopback_verifier.start()
 
     def close_lsl(self):
+        """ Stops the transmission and closes the sinks. """
+        sinks, self.sinks = self.sinks, list()
         self.lsl_outlet = None
+        # Wait until the IO thread is between pushes, so that no sink is
+        # closed while it is in use
+        self.run_in_io_thread(lambda: None, timeout=5.0)
+        for sink in sinks:
+            sink.close()
+        for derived_stream in self.derived_streams:
+            derived_stream.close()
+        if self.loopback_verifier is not None:
+            self.loopback_verifier.close()
+            self.loopback_verifier = None
         print('[SignalGenerator] > LSL stream closed.')
 
+    def get_stats(self):
+        """ Returns the current statistics of the stream. It is safe to call
+        this function from any thread, since the statistics are computed from
+        copies of the ring buffers filled by the IO thread.
+
+        Returns
+        ------------
+        dict
+            Stream description, counters, timing statistics, depth of the
+            update queue, CPU time (s) of the IO thread and timer process,
+            their scheduling mode (see realtime.apply_realtime) and, if
+            enabled, the status of the loopback verifier and recording,
+            the counters of the delivery model, the state of the clock
+            model (see ClockModel.get_report), the closed-loop commands
+            (see TriggerListener.get_report), the duration of each
+            stage of the hot path (see StageProfiler.get_summary) and the
+            samples pushed by the derived streams.
+        """
+        stats = self.stats.snapshot()
+        stats['stream_name'] = self.stream_name
+        stats['stream_type'] = self.stream_type
+        stats['n_cha'] = self.n_cha
+        stats['nominal_rate'] = self.sample_rate
+        stats['samples_per_push'] = self.samples_per_push
+        stats['transmitting'] = self.transmitting
+        stats['sinks'] = [sink.get_status() for sink in self.sinks]
+        try:
+            stats['queue_depth'] = self.update_queue.qsize()
+        except NotImplementedError:
+            # Not available on macOS
+            stats['queue_depth'] = -1
+        stats['io_cpu_time'] = self.io_cpu_time
+        stats['timer_cpu_time'] = self.timer_cpu_time.value
+        try:
+            self.timer_realtime = self.realtime_queue.get_nowait()
+        except queue.Empty:
+            pass
+        stats['realtime'] = {'io': self.io_realtime,
+                             'timer': self.timer_realtime}
+        stats['realtime_mode'] = {
+            'io': get_realtime_mode(self.io_realtime),
+            'timer': get_realtime_mode(self.timer_realtime)
+        }
+        if self.loopback_verifier is not None:
+            stats['loopback'] = self.loopback_verifier.get_report()
+        if self.recording_tee is not None:
+            stats['recording'] = self.recording_tee.get_status()
+        if self.delivery_model is not None:
+            stats['delivery'] = self.delivery_model.get_counters()
+        if self.clock_model is not None:
+            # Read once: the IO thread resets the anchor when the stream
+            # is paused
+            io_init_timestamp = self.io_init_timestamp
+            stats['clock'] = self.clock_model.get_report(
+                local_clock() - io_init_timestamp
+                if io_init_timestamp is not None else None)
+        if self.trigger_listener is not None:
+            stats['trigger'] = self.trigger_listener.get_report()
+        if self.profiler is not None:
+            stats['profile'] = self.profiler.get_summary()
+        if self.derived_streams:
+            stats['derived'] = [d.get_status() for d in self.derived_streams]
+        return stats
+
+    def save_profile(self, path):
+        """ Saves the events recorded by the profiler as a Chrome trace JSON
+        file, which can be opened in chrome://tracing or Perfetto (see
+        StageProfiler). """
+        if self.profiler is None:
+            raise ValueError('Profiling is not enabled (see profile_settings)')
+        self.profiler.save_trace(path, self.stream_name)
+
     # Running in SignalGenerator_IO_Thread
     def send_data(self, running_event):
-        c_idx = -1       # Chunk index
+        # Samples are scheduled according to a virtual sample clock: sample k
+        # is due at io_init_timestamp + k / sample_rate (of the simulated
+        # device clock if there is a clock model). Each tick of the
+        # timer pushes every complete chunk that is due, so the push size can
+        # change without affecting the effective sample rate or timestamps
+        realtime_args = self.get_realtime_args('io')
+        if realtime_args is not None:
+            self.io_realtime = apply_realtime(**realtime_args)
+        cpu_time = time.thread_time()
         while running_event.is_set():
-            # Assert that the parse to float is correct
+            # Requests of other threads (e.g., snapshots of the state) are
+            # served here, between pushes
+            while not self.io_requests.empty():
+                request = self.io_requests.get()
+                try:
+                    request[1] = request[2]()
+                except Exception as e:
+                    # Raised in the calling thread, not in the IO thread
+                    request[3] = e
+                request[0].set()
+            try:
+                timestamp = self.update_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self.profiler is not None:
+                # Time from the tick of the timer until its reception
+                received = time.perf_counter()
+                self.profiler.record(
+                    STAGE_QUEUE, received - (local_clock() - timestamp),
+                    received, self.n_chunks_sent)
             try:
-                if self.lsl_outlet is not None and \
-                        not self.update_queue.empty():
-                    timestamp = self.update_queue.get_nowait()
-                    if timestamp:
-                        # Update chunk index if necessary
-                        c_idx += 1
-                        if c_idx >= self.eeg_buffer.shape[0]:
-                            c_idx = 0
-
-                        # Send through LSL
-                        self.lsl_outlet.push_chunk(
-                            np.squeeze(self.eeg_buffer[c_idx, :, :]).tolist(),
-                            timestamp
-                        )
-                        self.n_chunks_sent += 1
-                        self.buffer_sent_times.append(timestamp)
-                        self.buffer_sent_times = self.buffer_sent_times[-100:]
+                now_cpu = time.thread_time()
+                self.io_cpu_time = now_cpu
+                if not self.sinks:
+                    # Re-anchor the sample clock once the stream is resumed
+                    self.io_init_timestamp = None
+                    cpu_time = now_cpu
+                    continue
+                if self.io_init_timestamp is None and \
+                        self.resume_timestamp is not None:
+                    # Resumed from a checkpoint: keep the timestamp origin
+                    # and skip the samples of the outage
+                    self.io_init_timestamp = self.resume_timestamp
+                    self.resume_timestamp = None
+                    if self.clock_model is not None and \
+                            self.clock_model.origin is None:
+                        self.clock_model.anchor(
+                            self.io_init_timestamp,
+                            timestamp - self.io_init_timestamp)
+                    n_gap = math.floor(self.get_sample_time(timestamp) *
+                                       self.sample_rate) - self.n_samples_sent
+                    if n_gap > 0:
+                        self.skip_samples(n_gap)
+                elif self.io_init_timestamp is None:
+                    # Anchored half a sample ahead to be robust to tick jitter
+                    self.io_init_timestamp = timestamp + \
+                        (0.5 - self.n_samples_sent) / self.sample_rate
+                    if self.clock_model is not None:
+                        self.clock_model.anchor(
+                            self.io_init_timestamp,
+                            timestamp - self.io_init_timestamp)
+                t = self.get_sample_time(timestamp)
+                n_tick = self.n_samples_sent
+                if self.delivery_model is not None:
+                    # Release the packets planned by the delivery model
+                    while True:
+                        n, release, lost = self.delivery_model.get_next(
+                            self.n_samples_sent)
+                        if t < release:
+                            break
+                        self.delivery_model.pop(t)
+                        self.push_samples(n, lost)
+                    self.record_tick(n_tick)
+                    cpu_time = now_cpu
+                    continue
+                n_due = math.floor(t * self.sample_rate) + 1 - \
+                    self.n_samples_sent
+                while n_due >= self.samples_per_push:
+                    self.push_samples(self.samples_per_push)
+                    n_due -= self.samples_per_push
+                self.record_tick(n_tick)
+
+                # Adapt the push size to the measured CPU usage
+                if self.adaptive_controller is not None:
+                    self.adaptive_controller.add_cpu_time(now_cpu - cpu_time)
+                    cpu_time = now_cpu
+                    if self.adaptive_controller.update(timestamp):
+                        self.samples_per_push = \
+                            self.adaptive_controller.chunk_size
+                        self.tick_ms.value = 1000 * self.samples_per_push / \
+                            self.sample_rate
             except Exception as e:
                 raise e
         print('[SignalGenerator] > IO thread done.')
 
+    def record_tick(self, n_samples_before):
+        """ Records the samples pushed by the current tick in the stats. """
+        if self.n_samples_sent > n_samples_before:
+            self.stats.record_tick(local_clock(), self.n_samples_sent -
+                                   n_samples_before)
+
+    def get_sample_time(self, timestamp):
+        """ Time of the sample clock (s since its anchor) at the LSL
+        timestamp, which is the time of the simulated device clock if there
+        is a clock model. """
+        elapsed = timestamp - self.io_init_timestamp
+        if self.clock_model is not None:
+            return self.clock_model.device_time(elapsed)
+        return elapsed
+
+    def get_host_timestamp(self, sample):
+        """ LSL timestamp (host clock) at which the sample is due, the
+        inverse of get_sample_time. """
+        t = sample / self.sample_rate
+        if self.clock_model is not None:
+            t = self.clock_model.host_time(t)
+        return self.io_init_timestamp + t
+
+    def skip_samples(self, n_samples):
+        """ Advances the stream n_samples without generating or pushing
+        them. """
+        if self.eeg_buffer is not None:
+            self.buffer_idx = (self.buffer_idx + n_samples) % \
+                self.eeg_buffer.shape[0]
+        self.n_samples_sent += n_samples
+        if self.artifact_injector is not None:
+            self.artifact_injector.advance(self.n_samples_sent)
+
+    def push_samples(self, n_samples, lost=False):
+        """ Reads the next n_samples from the circular buffer and pushes them
+        to the sinks, timestamped with the time of the last sample.
+
+        Parameters
+        ------------
+        n_samples : int
+            Number of samples to push.
+        lost : bool
+            If True, the samples are generated but not pushed, simulating a
+            lost packet (see DeliveryModel).
+        """
+        # Schedule the closed-loop commands due in the chunk, so that the
+        # state switches are generated from their first sample
+        gen_start = time.perf_counter()
+        if self.trigger_listener is not None:
+            self.trigger_listener.schedule(
+                self.n_samples_sent, n_samples,
+                self.get_host_timestamp(self.n_samples_sent))
+
+        # Read from the circular buffer or generate the chunk
+        frame = self.out_buffer[:n_samples]
+        chunk = frame[:, :self.n_cha]
+        if self.eeg_buffer is None:
+            self.generator.fill(chunk, self.n_samples_sent)
+        else:
+            self.buffer_idx = read_circular(self.eeg_buffer, self.buffer_idx,
+                                            chunk)
+
+        # Add the effects of the closed-loop commands
+        if self.trigger_listener is not None:
+            self.trigger_listener.apply(chunk, self.n_samples_sent)
+
+        profiler = self.profiler
+        if profiler is not None:
+            t = time.perf_counter()
+            profiler.record(STAGE_GENERATE, gen_start, t, self.n_chunks_sent,
+                            n_samples)
+
+        # Add the artifacts
+        if self.artifact_injector is not None:
+            self.artifact_injector.add(chunk, self.n_samples_sent)
+            if profiler is not None:
+                t_prev, t = t, time.perf_counter()
+                profiler.record(STAGE_ARTIFACTS, t_prev, t,
+                                self.n_chunks_sent, n_samples)
+
+        # Verification channels
+        if self.n_extra_cha > 0:
+            frame[:, self.n_cha] = \
+                (self.n_samples_sent + np.arange(n_samples)) % \
+                SEQ_MODULUS[self.format]
+            if self.n_extra_cha > 1:
+                frame[:, self.n_cha + 1] = get_checksum(chunk, frame.dtype)
+        if lost:
+            # The commands applied to the lost samples are logged now
+            self.n_samples_sent += n_samples
+            if self.trigger_listener is not None:
+                self.trigger_listener.pushed(local_clock())
+            return
+
+        # Send through the sinks
+        timestamp = self.io_init_timestamp + \
+            (self.n_samples_sent + n_samples - 1) / self.sample_rate
+        if self.clock_model is not None:
+            timestamp += self.clock_model.get_jitter()
+        push_start = time.perf_counter()
+        if profiler is not None:
+            profiler.record(STAGE_CONVERT, t, push_start, self.n_chunks_sent,
+                            n_samples)
+        for sink in self.sinks:
+            sink.push(frame, self.n_samples_sent, timestamp)
+        push_end = time.perf_counter()
+        if self.recording_tee is not None:
+            self.recording_tee.put(frame, self.n_samples_sent, timestamp)
+        self.n_chunks_sent += 1
+        self.n_samples_sent += n_samples
+        push_time = local_clock()
+        self.stats.record(push_time, n_samples, push_start - gen_start,
+                          push_end - push_start)
+        if self.trigger_listener is not None:
+            self.trigger_listener.pushed(push_time)
+        if self.preview_buffer is not None:
+            self.preview_buffer.write(chunk)
+        for derived_stream in self.derived_streams:
+            derived_stream.process(chunk, self.n_samples_sent - n_samples,
+                                   timestamp - (n_samples - 1) /
+                                   self.sample_rate)
+        if profiler is not None:
+            profiler.record(STAGE_PUSH, push_start, push_end,
+                            self.n_chunks_sent - 1, n_samples)
+            profiler.record(STAGE_RECORD, push_end, time.perf_counter(),
+                            self.n_chunks_sent - 1, n_samples)
+
     # Runnning in SignalGenerator_Timer_Process
     @staticmethod
-    def timer(stop_event, update_ms, queue_update):
-        def accurate_delay(delay_ms):
-            _ = time.perf_counter() + delay_ms / 1000
-            while time.perf_counter() < _:
+    def timer(stop_event, update_ms, queue_update, cpu_time, realtime_args,
+              realtime_queue):
+        # Pinning and real-time priority reduce the preemptions of the
+        # busy-wait, which are the main source of tick jitter. With a
+        # real-time policy, the wake-up latency of sleep is low enough to
+        # sleep until shortly before the deadline, so the busy-wait does not
+        # starve the other threads of the CPU
+        spin_margin = None
+        if realtime_args is not None:
+            report = apply_realtime(**realtime_args)
+            realtime_queue.put(report)
+            if report['policy'] != 'SCHED_OTHER':
+                spin_margin = 0.0005
+
+        def accurate_delay(deadline):
+            if spin_margin is not None:
+                remaining = deadline - time.perf_counter() - spin_margin
+                if remaining > 0:
+                    time.sleep(remaining)
+            while time.perf_counter() < deadline:
                 pass
 
-        # Push an item into the update queue each update_ms
+        # Push an item into the update queue each update_ms. Deadlines are
+        # absolute so that delays do not accumulate
+        deadline = time.perf_counter()
         while not stop_event.value:
             try:
-                accurate_delay(update_ms)
+                deadline += update_ms.value / 1000
+                if time.perf_counter() - deadline > 1:
+                    # The process was stalled, skip the missed ticks
+                    deadline = time.perf_counter()
+                accurate_delay(deadline)
                 queue_update.put(local_clock())
+                cpu_time.value = time.process_time()
             except Exception as e:
                 print(e)
                 raise e
         print('[SignalGenerator] > Timer process done.')
 
 
-class UniformGenerator:
-    """ Uniform signal generator.
-
-    Parameters
-    ------------
-    n_cha:  int
-        Number of channels.
-    mean: float
-        Mean of the output signal.
-    std: float
-        Standard deviation of the output signal.
+def get_default_channel_labels(n_cha):
+    """ Returns the labels of the smallest standard EEG montage (10-20,
+    10-10 or 10-05) with at least n_cha channels, or the channel indexes if
+    there are more channels than in the 10-05 montage.
     """
+    if n_cha <= len(EEG_10_20):
+        return EEG_10_20[:n_cha]
+    elif n_cha <= len(EEG_10_10):
+        return EEG_10_10[:n_cha]
+    elif n_cha <= len(EEG_10_05):
+        return EEG_10_05[:n_cha]
+    else:
+        return [str(i) for i in range(n_cha)]
 
-    def __init__(self, n_cha, mean=0.0, std=1.0):
-        self.n_cha = n_cha
-        self.mean = mean
-        self.std = std
 
-    def get_chunk(self, chunk_size):
-        """ Function to get a new chunk.
+def get_loop_length(fs, freqs, min_samples=1, max_samples=None):
+    """ Returns the shortest loop length (in samples) over which all the
+    given frequencies complete a whole number of cycles, extended to the
+    smallest multiple that is at least min_samples long. Frequencies and
+    sample rate are approximated by fractions with denominators up to 1000.
 
-        Parameters
-        ------------
-        chunk_size : int
-            Chunk size in samples.
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    freqs : list
+        Frequencies of the tones in Hz.
+    min_samples : int
+        Minimum length of the loop.
+    max_samples : int or None
+        Maximum length of the loop.
 
-        Returns
-        ------------
-        ndarray: [samples x channels]
-            Generated chunk.
-        """
-        return self.std * np.random.randn(chunk_size, self.n_cha) + self.mean
+    Returns
+    ------------
+    int or None
+        Length of the loop, or None if it is longer than max_samples.
+    """
+    fs = fractions.Fraction(fs).limit_denominator(1000)
+    length = 1
+    for f in freqs:
+        # f * L / fs must be an integer
+        period = (fractions.Fraction(f).limit_denominator(1000) /
+                  fs).denominator
+        length = length * period // math.gcd(length, period)
+    length *= max(math.ceil(min_samples / length), 1)
+    if max_samples is not None and length > max_samples:
+        return None
+    return length
 
-    def get_chunks(self, n_chunks, chunk_size):
-        """ Function to generate several chunks at once.
 
-        Parameters
-        ------------
-        n_chunks : int
-            Number of chunks to generate
-        chunk_size : int
-            Chunk size in samples.
+def merge_config(base, update):
+    """ Returns a deep copy of base updated recursively with update. """
+    merged = copy.deepcopy(base)
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
 
-        Returns
-        ------------
-        ndarray: [n_chunks x samples x channels]
-            Generated chunks.
-        """
-        data = np.empty((n_chunks, chunk_size, self.n_cha))
-        for i in range(n_chunks):
-            data[i, :, :] = self.get_chunk(chunk_size)
-        return data
 
+def update_config(config, update):
+    """ Returns the configuration of a stream (see
+    SignalGenerator.get_config) updated with update. If the number of
+    channels changes and the update does not give the labels, they are
+    reset to 'auto'. """
+    merged = merge_config(config, update)
+    if 'l_cha' not in update and merged['n_cha'] != config.get('n_cha'):
+        merged['l_cha'] = 'auto'
+    return merged
 
-class EEGGenerator:
-    """ Synthetic EEG generator.
+
+class AdaptiveChunkController:
+    """ Chooses the number of samples per push according to a target latency
+    and a CPU budget. The latency bounds the chunk size from above (a chunk
+    cannot be pushed before its last sample is due), whereas the CPU budget
+    bounds it from below, since every push has a fixed overhead. Starting
+    from the smallest chunk, the size is adjusted periodically using the CPU
+    time measured in the IO thread.
 
     Parameters
-    --------------
-    fs : float
-        Sampling rate.
-    n_cha: float
-        Number of channels.
-    tones : list()
-        List of the tones to include in the signal, each one represented by a
-        tuple containing (target frequency in Hz, amplitude).
-    pink_method: basestring
-        If "real-time", the pink noise is online generated using the
-        Voss-McCartney algorithm. If "offline", the pink noise is generated
-        using the inverse FFT, stored offline and then played each time a
-        chunk is requested.
+    ------------
+    sample_rate : float
+        Sample rate of the stream.
+    target_latency_ms : float
+        Maximum time between the acquisition of a sample and its push.
+    cpu_budget : float
+        Maximum fraction of a CPU core that the IO thread should use.
+    min_chunk : int
+        Minimum number of samples per push.
+    adjust_interval : float
+        Seconds between consecutive adjustments.
     """
 
-    def __init__(self, fs, n_cha, tones=None, pink_method="real-time"):
-        self.fs = fs
-        self.n_cha = n_cha
-        self.tones = tones
-        self.pink_method = pink_method
-        if tones is None:
-            self.tones = list()
-            self.tones.append((10, 11))
-            self.tones.append((20, 7))
-            self.tones.append((50, 12))
-            self.tones.append((100, 7))
-        if self.pink_method != "offline":
-            self.pink_method = "real-time"
-
-        # If method is offline, then generate a big stream of pink noise
-        self.pink_noise = None
-        self.pink_noise_sample = 0
-        if self.pink_method == "offline":
-            NO_SECS = 20
-            noise_ = self.generate_offline_pink(NO_SECS * self.fs * self.n_cha)
-            self.pink_noise = noise_.reshape(int(NO_SECS * self.fs),
-                                             int(self.n_cha))
-
-        # Generated
-        self.current_time = 0
-
-    def get_chunk(self, chunk_size):
-        """ Function to get a new chunk. The method adds pink noise and
-        overlayed tones.
-
-        Parameters
-        ------------
-        chunk_size : int
-            Chunk size in samples.
-
-        Returns
-        ------------
-        ndarray: [samples x channels]
-            Generated chunk.
-        """
-        # Get the time series
-        times = [self.current_time + i * (1 / self.fs) for i in
-                 range(chunk_size)]
-        times = np.array(times)
-        self.current_time = self.current_time + chunk_size / self.fs
-
-        # Get the pink noise (1/f)
-        if self.pink_method == "offline":
-            if chunk_size > self.pink_noise.shape[0]:
-                raise ValueError("The chunk size (%i) is greater than the "
-                                 "offline generated pink noise length (%i)! "
-                                 "Increment manually the NO_SECS variable" %
-                                 (chunk_size, self.pink_noise.shape[0]))
-            if self.pink_noise_sample + chunk_size > self.pink_noise.shape[0]:
-                self.pink_noise_sample = 0
-            chunk = self.pink_noise[self.pink_noise_sample:
-                                    self.pink_noise_sample + chunk_size, :]
-            self.pink_noise_sample += chunk_size
-        else:
-            # Real-time generation using Voss-McCartney algorithm
-            noise = self.generate_online_pink(int(chunk_size * self.n_cha))
-            chunk = noise.reshape(chunk_size, self.n_cha)
+    def __init__(self, sample_rate, target_latency_ms=20.0, cpu_budget=0.05,
+                 min_chunk=1, adjust_interval=1.0):
+        if target_latency_ms <= 0 or cpu_budget <= 0:
+            raise ValueError('The target latency and the CPU budget must be '
+                             'positive')
+        self.sample_rate = sample_rate
+        self.target_latency_ms = target_latency_ms
+        self.cpu_budget = cpu_budget
+        self.adjust_interval = adjust_interval
+        self.max_chunk = max(int(target_latency_ms * sample_rate / 1000), 1)
+        self.min_chunk = min(max(int(min_chunk), 1), self.max_chunk)
 
-        # Add each tone
-        for tone in self.tones:
-            eeg_tone = tone[1] * np.sin(2 * np.pi * times * tone[0])
-            chunk += np.tile(eeg_tone.reshape(chunk_size, 1), self.n_cha)
+        # Start with at most 1000 pushes per second
+        self.chunk_size = min(
+            max(math.ceil(sample_rate / 1000), self.min_chunk), self.max_chunk)
+        self.cpu_usage = 0.0
+        self.over_budget = False
+        self._cpu_time = 0.0
+        self._last_update = None
 
-        return chunk
+    def add_cpu_time(self, cpu_time):
+        """ Accumulates the CPU time spent by the IO thread. """
+        self._cpu_time += cpu_time
 
-    def get_chunks(self, n_chunks, chunk_size):
-        """ Function to generate several chunks at once.
+    def update(self, timestamp):
+        """ Recomputes the chunk size if the adjust interval has elapsed.
 
         Parameters
         ------------
-        n_chunks : int
-            Number of chunks to generate
-        chunk_size : int
-            Chunk size in samples.
+        timestamp : float
+            Current LSL time.
 
         Returns
         ------------
-        ndarray: [n_chunks x samples x channels]
-            Generated chunks.
-        """
-        data = np.empty((n_chunks, chunk_size, self.n_cha))
-        for i in range(n_chunks):
-            data[i, :, :] = self.get_chunk(chunk_size)
-        return data
-
-    @staticmethod
-    def generate_offline_pink(no_samples, exponent=0.51, amplitude=30):
-        """ Function to generate an offline stream of pink noise. Based on
-        the EEG simulator of https://github.com/pennmem/eegsim. It generates
-        a desired shape in the frequency domain and performs a IFFT to get
-        the temporal counterpart. Not suitable for a small number of samples.
-
-        Parameters
-        -------------
-        no_samples : int
-            Number of samples to generate
-        exponent : float
-            Exponent to normalize the scales.
-        amplitude : int
-            Amplitude to normalize the pink noise.
-
-        Returns
-        ----------
-        ndarray: (samples, )
-            Generated pink noise signal.
+        bool
+            True if the chunk size has changed.
         """
-        out_n = int(no_samples)
-        n = int(no_samples) + 1 if int(no_samples) & 1 == 1 else int(no_samples)
-        scales = np.linspace(0, 0.5, n // 2 + 1)[1:]
-        scales = scales ** (-exponent / 2)
-        pink_freq = np.random.normal(scale=scales) * \
-                    np.exp(2j * np.pi * np.random.random(n // 2))
-        fdata = np.concatenate([[0], pink_freq])
-        sigma = np.sqrt(2 * np.sum(scales ** 2)) / n
-        data = amplitude * np.real(np.fft.irfft(fdata)) / sigma
-        return data[:out_n]
+        if self._last_update is None:
+            self._last_update = timestamp
+            self._cpu_time = 0.0
+            return False
+        elapsed = timestamp - self._last_update
+        if elapsed < self.adjust_interval:
+            return False
+        self.cpu_usage = self._cpu_time / elapsed
+        self._cpu_time = 0.0
+        self._last_update = timestamp
 
-    @staticmethod
-    def generate_online_pink(nrows, ncols=16, amp=18):
-        """ Generates pink noise using the Voss-McCartney algorithm.
-        Extracted from https://www.dsprelated.com/showarticle/908.php. This
-        method computes the pink noise directly on the temporal domain,
-        so it is suitable for a real-time generation of a small number of
-        samples.
+        # The per-push overhead dominates, so the CPU usage is approximately
+        # inversely proportional to the chunk size. Shrink the chunk only if
+        # it is well below budget to avoid oscillations
+        chunk_size = self.chunk_size
+        if self.cpu_usage > self.cpu_budget:
+            chunk_size = math.ceil(
+                chunk_size * self.cpu_usage / self.cpu_budget)
+        elif self.cpu_usage < 0.5 * self.cpu_budget:
+            chunk_size = math.floor(
+                chunk_size * max(self.cpu_usage / self.cpu_budget, 0.5))
+        chunk_size = min(max(chunk_size, self.min_chunk), self.max_chunk)
 
-        Parameters
-        -----------
-        nrows: int
-            Number of samples
-        ncols: int
-            Number of random sources to add
-        amp: int
-            Amplitude to normalize the pink noise.
+        # The latency bound prevails over the CPU budget
+        over_budget = chunk_size == self.max_chunk and \
+            self.cpu_usage > self.cpu_budget
+        changed = chunk_size != self.chunk_size
+        self.chunk_size = chunk_size
+        if changed or over_budget != self.over_budget:
+            self.over_budget = over_budget
+            self.log()
+        return changed
 
-        Returns
-        -------------
-        ndarray: (samples, )
-            Generated pink noise signal.
-        """
-        array = np.empty((nrows, ncols))
-        array.fill(np.nan)
-        array[0, :] = np.random.random(ncols)
-        array[:, 0] = np.random.random(nrows)
-
-        # the total number of changes is nrows
-        n = nrows
-        cols = np.random.geometric(0.5, n)
-        cols[cols >= ncols] = 0
-        rows = np.random.randint(nrows, size=n)
-        array[rows, cols] = np.random.random(n)
-
-        df = pd.DataFrame(array)
-        df.fillna(method='ffill', axis=0, inplace=True)
-        total = df.sum(axis=1)
-
-        return amp * total.values
+    def log(self):
+        print('[SignalGenerator] > Adaptive chunk size: %i samples '
+              '(%.2f ms, max %i samples for a target latency of %.2f ms); '
+              'IO CPU usage %.1f%% of %.1f%%%s' %
+              (self.chunk_size, 1000 * self.chunk_size / self.sample_rate,
+               self.max_chunk, self.target_latency_ms, 100 * self.cpu_usage,
+               100 * self.cpu_budget,
+               ' (over budget)' if self.over_budget else ''))
@@ -0,0 +1,513 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Output transports of SignalGenerator. Each pushed chunk (including the
+verification channels) is handed to every sink of the stream without
+intermediate copies:
+    - "lsl": LSL outlet (default).
+    - "shm": ring buffer in a named shared memory block, read by local
+      consumers with SharedMemoryReader.
+    - "udp": raw UDP datagrams (see UDPSink for the format).
+    - "file": recording to .npy files (see RecordingTee).
+    - "null": discards the chunks, for benchmarking.
+Sinks are selected with the sink_settings of SignalGenerator, a list of
+dicts with key "type" and the parameters of the sink, e.g.:
+
+    [{"type": "lsl"}, {"type": "shm", "capacity_secs": 30},
+     {"type": "udp", "host": "127.0.0.1", "port": 9300}]
+"""
+
+from pylsl import StreamOutlet
+import json
+import os
+import re
+import socket
+import struct
+import numpy as np
+from recording_tee import RecordingTee, get_free_path
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+# Registry of sinks: type -> factory(stream, settings), where stream is the
+# SignalGenerator that owns the sink
+SINKS = dict()
+
+
+def register_sink(name):
+    """ Decorator that registers a sink class under name. The class must
+    implement from_settings(stream, settings). """
+    def decorator(cls):
+        SINKS[name] = cls.from_settings
+        return cls
+    return decorator
+
+
+def create_sink(settings, stream):
+    """ Creates a sink.
+
+    Parameters
+    ------------
+    settings : dict
+        Key "type" selects the sink, and the rest are its parameters.
+    stream : SignalGenerator
+        Stream that owns the sink.
+
+    Returns
+    ------------
+    BaseSink
+        Opened sink.
+    """
+    settings = dict(settings)
+    sink_type = settings.pop('type', 'lsl')
+    if sink_type not in SINKS:
+        raise ValueError('Unknown sink: %s' % sink_type)
+    return SINKS[sink_type](stream, settings)
+
+
+class BaseSink:
+    """ Output transport of a stream. push is called by the IO thread with
+    each chunk, which is only valid during the call. """
+
+    sink_type = None
+
+    def push(self, frame, first_sample, timestamp):
+        """ Sends a chunk.
+
+        Parameters
+        ------------
+        frame : ndarray [samples x channels]
+            Chunk, including the verification channels.
+        first_sample : int
+            Index of its first sample.
+        timestamp : float
+            LSL timestamp of its last sample.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def get_status(self):
+        return {'type': self.sink_type}
+
+
+@register_sink('lsl')
+class LSLSink(BaseSink):
+    """ Pushes the chunks through an LSL outlet. Formats without numpy
+    support in pylsl are converted to lists. """
+
+    sink_type = 'lsl'
+
+    def __init__(self, info, chunk_size, use_numpy=True, max_buffered=360):
+        self.outlet = StreamOutlet(info=info, chunk_size=chunk_size,
+                                   max_buffered=max_buffered)
+        self.use_numpy = use_numpy
+        print('[SignalGenerator] > LSL stream created.')
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        # In adaptive mode each push is transmitted as a chunk, so the
+        # declared chunk size is left unspecified (0)
+        chunk_size = stream.chunk_size if stream.adaptive_controller is None \
+            else 0
+        return cls(info=stream.get_lsl_info(), chunk_size=chunk_size,
+                   use_numpy=stream.lsl_dtype is not None, **settings)
+
+    def push(self, frame, first_sample, timestamp):
+        self.outlet.push_chunk(frame if self.use_numpy else frame.tolist(),
+                               timestamp)
+
+
+@register_sink('null')
+class NullSink(BaseSink):
+    """ Discards the chunks. Useful to measure the cost of generation
+    without any transport. """
+
+    sink_type = 'null'
+
+    def __init__(self):
+        self.n_samples = 0
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        return cls(**settings)
+
+    def push(self, frame, first_sample, timestamp):
+        self.n_samples += frame.shape[0]
+
+    def get_status(self):
+        return {'type': self.sink_type, 'samples': self.n_samples}
+
+
+@register_sink('file')
+class FileSink(BaseSink):
+    """ Records the chunks to disk from another thread (see RecordingTee,
+    whose parameters are accepted). A new recording is created each time
+    the stream is started, at the first free path of path, path_1, path_2,
+    ... (see get_free_path), so the previous ones are kept. """
+
+    sink_type = 'file'
+
+    def __init__(self, path, n_cols, dtype, max_chunk, info=None, **kwargs):
+        self.recording_tee = RecordingTee(path=get_free_path(path),
+                                          n_cha=n_cols,
+                                          dtype=dtype, max_chunk=max_chunk,
+                                          info=info, **kwargs)
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        return cls(n_cols=stream.out_buffer.shape[1],
+                   dtype=stream.out_buffer.dtype, max_chunk=stream.max_push,
+                   info=stream.get_info(), **settings)
+
+    def push(self, frame, first_sample, timestamp):
+        self.recording_tee.put(frame, first_sample, timestamp)
+
+    def close(self):
+        self.recording_tee.close()
+
+    def get_status(self):
+        status = self.recording_tee.get_status()
+        status['type'] = self.sink_type
+        return status
+
+
+@register_sink('udp')
+class UDPSink(BaseSink):
+    """ Sends the chunks as raw UDP datagrams. Each chunk is split into
+    datagrams of at most max_datagram bytes, each one with a header
+    (little-endian struct "<4sIqIHHd": magic b"LSGU", datagram counter,
+    index of the first sample, number of samples, number of channels, bytes
+    per value, LSL timestamp of the last sample) followed by the samples
+    [samples x channels] in the type of the stream. The header and the
+    samples are sent with scatter-gather I/O (sendmsg), so the samples are
+    not copied. Datagrams that cannot be sent without blocking are dropped
+    and counted.
+
+    Parameters
+    ------------
+    host : str
+        Destination address.
+    port : int
+        Destination port.
+    n_cols : int
+        Number of columns of the chunks.
+    dtype : numpy.dtype
+        Type of the chunks.
+    fs : float
+        Sampling rate, used to timestamp the datagrams.
+    max_datagram : int
+        Maximum size of each datagram. The default avoids IP fragmentation
+        on Ethernet.
+    """
+
+    sink_type = 'udp'
+    HEADER = struct.Struct('<4sIqIHHd')
+    MAGIC = b'LSGU'
+
+    def __init__(self, host, port, n_cols, dtype, fs, max_datagram=1472):
+        self.address = (host, port)
+        self.n_cols = n_cols
+        self.dtype = np.dtype(dtype)
+        self.fs = fs
+        row_bytes = n_cols * self.dtype.itemsize
+        self.rows_per_datagram = (max_datagram - self.HEADER.size) // \
+            row_bytes
+        if self.rows_per_datagram < 1:
+            raise ValueError('A sample (%i bytes) does not fit in a datagram '
+                             'of %i bytes' % (row_bytes, max_datagram))
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.scatter_gather = hasattr(self.sock, 'sendmsg')
+        self.n_datagrams = 0
+        self.n_dropped = 0
+        print('[SignalGenerator] > UDP sink sending to %s:%i.' % self.address)
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        settings = dict(settings)
+        return cls(host=settings.pop('host', '127.0.0.1'),
+                   port=settings.pop('port', 9300),
+                   n_cols=stream.out_buffer.shape[1],
+                   dtype=stream.out_buffer.dtype, fs=stream.sample_rate,
+                   **settings)
+
+    def push(self, frame, first_sample, timestamp):
+        n = frame.shape[0]
+        for first in range(0, n, self.rows_per_datagram):
+            last = min(first + self.rows_per_datagram, n)
+            header = self.HEADER.pack(
+                self.MAGIC, self.n_datagrams & 0xFFFFFFFF,
+                first_sample + first, last - first, self.n_cols,
+                self.dtype.itemsize, timestamp - (n - last) / self.fs)
+            data = memoryview(frame[first:last]).cast('B')
+            self.n_datagrams += 1
+            try:
+                if self.scatter_gather:
+                    self.sock.sendmsg([header, data], (), 0, self.address)
+                else:
+                    self.sock.sendto(header + data.tobytes(), self.address)
+            except (BlockingIOError, InterruptedError):
+                self.n_dropped += 1
+
+    def close(self):
+        self.sock.close()
+
+    def get_status(self):
+        return {'type': self.sink_type, 'address': '%s:%i' % self.address,
+                'datagrams': self.n_datagrams, 'dropped': self.n_dropped}
+
+
+# Layout of the shared memory ring: header (int64 values), metadata (JSON)
+# and the rings of samples and timestamps
+SHM_HEADER_BYTES = 64
+SHM_META_BYTES = 4096
+SHM_MAGIC = 0x4C534752494E4701
+SHM_WRITE_COUNT = 4
+SHM_WRITE_TARGET = 6
+SHM_WRITER_PID = 7
+
+
+def get_shm_name(stream_name):
+    """ Default name of the shared memory ring of a stream. """
+    return 'lslgen_ring_%s' % re.sub(r'[^A-Za-z0-9_]', '_', stream_name)
+
+
+def is_stale_ring(name):
+    """ Whether the shared memory block name is a ring whose writer process
+    is no longer running (or this one), so it can be unlinked. Blocks of
+    other kinds, and those whose writer cannot be checked, are not
+    stale. """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        header = np.ndarray((SHM_HEADER_BYTES // 8, ), dtype=np.int64,
+                            buffer=block.buf)
+        pid = int(header[SHM_WRITER_PID]) \
+            if header[0] == SHM_MAGIC else 0
+        del header
+    finally:
+        block.close()
+    if pid <= 0 or os.name != 'posix':
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def map_ring(buf):
+    """ Maps the header, metadata and rings of a shared memory block.
+
+    Returns
+    ------------
+    tuple
+        (header, meta, data, timestamps)
+    """
+    header = np.ndarray((SHM_HEADER_BYTES // 8, ), dtype=np.int64,
+                        buffer=buf)
+    meta = json.loads(bytes(buf[SHM_HEADER_BYTES:SHM_HEADER_BYTES +
+                                int(header[5])]).decode('utf-8'))
+    capacity, n_cols = int(header[2]), int(header[3])
+    offset = SHM_HEADER_BYTES + SHM_META_BYTES
+    data = np.ndarray((capacity, n_cols), dtype=np.dtype(meta['dtype']),
+                      buffer=buf, offset=offset)
+    offset += data.nbytes + (-data.nbytes) % 8
+    timestamps = np.ndarray((capacity, ), dtype=np.float64, buffer=buf,
+                            offset=offset)
+    return header, meta, data, timestamps
+
+
+@register_sink('shm')
+class SharedMemorySink(BaseSink):
+    """ Writes the samples into a ring buffer in a named shared memory
+    block, from which consumers of the same host read them without any
+    transport (see SharedMemoryReader). The block holds the samples, the
+    LSL timestamp of each sample and two counters: the total number of
+    samples written, which is updated after each chunk is complete, and the
+    total once the chunk being written is complete, which is updated before
+    writing it. The readers compare them to discard the samples that may
+    have been overwritten while they were copied. The block is unlinked
+    when the sink is closed. A block with the same name is only replaced if
+    its writer is no longer running (see is_stale_ring).
+
+    Parameters
+    ------------
+    name : str
+        Name of the shared memory block.
+    n_cols : int
+        Number of columns of the chunks.
+    dtype : numpy.dtype
+        Type of the chunks.
+    fs : float
+        Sampling rate.
+    capacity : int
+        Samples kept in the ring.
+    meta : dict or None
+        Description of the stream, available to the readers.
+    """
+
+    sink_type = 'shm'
+
+    def __init__(self, name, n_cols, dtype, fs, capacity, meta=None):
+        if shared_memory is None:
+            raise ValueError('Shared memory is not available')
+        self.name = name
+        self.fs = fs
+        self.capacity = capacity
+        meta = dict(meta if meta is not None else dict())
+        meta.update({'dtype': np.dtype(dtype).str, 'sample_rate': fs})
+        meta_bytes = json.dumps(meta, default=str).encode('utf-8')
+        if len(meta_bytes) > SHM_META_BYTES:
+            raise ValueError('The description of the stream is too long')
+        data_bytes = capacity * n_cols * np.dtype(dtype).itemsize
+        size = SHM_HEADER_BYTES + SHM_META_BYTES + data_bytes + \
+            (-data_bytes) % 8 + capacity * 8
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                                  size=size)
+        except FileExistsError:
+            # Only replaced if left behind by a process that did not close
+            # its sink
+            if not is_stale_ring(name):
+                raise ValueError('Shared memory block %s is in use' % name)
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                                  size=size)
+        self.shm.buf[SHM_HEADER_BYTES:SHM_HEADER_BYTES + len(meta_bytes)] = \
+            meta_bytes
+        header = np.ndarray((SHM_HEADER_BYTES // 8, ), dtype=np.int64,
+                            buffer=self.shm.buf)
+        header[:] = 0
+        header[1:4] = (1, capacity, n_cols)
+        header[5] = len(meta_bytes)
+        header[SHM_WRITER_PID] = os.getpid()
+        header[0] = SHM_MAGIC
+        self.header, _, self.data, self.timestamps = map_ring(self.shm.buf)
+        self.offsets = np.arange(capacity, dtype=float) / fs
+        print('[SignalGenerator] > Shared memory ring %s created.' % name)
+
+    @classmethod
+    def from_settings(cls, stream, settings):
+        settings = dict(settings)
+        capacity = int(settings.pop('capacity_secs', 10) * stream.sample_rate)
+        return cls(name=settings.pop('name', get_shm_name(stream.stream_name)),
+                   n_cols=stream.out_buffer.shape[1],
+                   dtype=stream.out_buffer.dtype, fs=stream.sample_rate,
+                   capacity=max(capacity, 4 * stream.max_push),
+                   meta=stream.get_info(), **settings)
+
+    def push(self, frame, first_sample, timestamp):
+        n = frame.shape[0]
+        count = int(self.header[SHM_WRITE_COUNT])
+        # Announced before the slots of the chunk are overwritten
+        self.header[SHM_WRITE_TARGET] = count + n
+        i = count % self.capacity
+        n_first = min(n, self.capacity - i)
+        self.data[i:i + n_first] = frame[:n_first]
+        self.data[:n - n_first] = frame[n_first:]
+        # Timestamp of each sample, from the one of the last sample
+        np.subtract(timestamp, self.offsets[n - n_first:n][::-1],
+                    out=self.timestamps[i:i + n_first])
+        np.subtract(timestamp, self.offsets[:n - n_first][::-1],
+                    out=self.timestamps[:n - n_first])
+        # Published once the samples are written
+        self.header[SHM_WRITE_COUNT] = count + n
+
+    def close(self):
+        del self.header, self.data, self.timestamps
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def get_status(self):
+        return {'type': self.sink_type, 'name': self.name,
+                'capacity': self.capacity,
+                'written': int(self.header[SHM_WRITE_COUNT])}
+
+
+class SharedMemoryReader:
+    """ Reads the samples of a SharedMemorySink from another process.
+
+    Parameters
+    ------------
+    name : str
+        Name of the shared memory block (see get_shm_name).
+    from_start : bool
+        If True, the samples still in the ring are read first. Otherwise,
+        only the samples written after attaching are read.
+    """
+
+    def __init__(self, name, from_start=False):
+        if shared_memory is None:
+            raise ValueError('Shared memory is not available')
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Only the sink must unlink the block
+        try:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
+        self.header, self.meta, self.data, self.timestamps = map_ring(
+            self.shm.buf)
+        if self.header[0] != SHM_MAGIC:
+            raise ValueError('%s is not a signal generator ring' % name)
+        self.capacity = self.data.shape[0]
+        count = int(self.header[SHM_WRITE_COUNT])
+        self.read_count = max(count - self.capacity, 0) if from_start \
+            else count
+        self.n_lost = 0
+
+    def read(self, max_samples=None):
+        """ Returns the samples written since the last read. If the reader
+        fell behind more than the capacity of the ring, the overwritten
+        samples are skipped and counted in n_lost.
+
+        Parameters
+        ------------
+        max_samples : int or None
+            Maximum number of samples to read.
+
+        Returns
+        ------------
+        tuple
+            (samples [samples x channels], timestamps, index of the first
+            sample)
+        """
+        end = int(self.header[SHM_WRITE_COUNT])
+        start = self.read_count
+        if end - start > self.capacity:
+            self.n_lost += end - self.capacity - start
+            start = end - self.capacity
+        if max_samples is not None:
+            end = min(end, start + max_samples)
+        idx = np.arange(start, end) % self.capacity
+        data = self.data[idx]
+        timestamps = self.timestamps[idx]
+        # Discard the samples whose slots were (or are being) overwritten
+        # while copying: the writer announces each chunk before writing it
+        overwritten = min(int(self.header[SHM_WRITE_TARGET]) -
+                          self.capacity - start, data.shape[0])
+        if overwritten > 0:
+            data, timestamps = data[overwritten:], timestamps[overwritten:]
+            self.n_lost += overwritten
+            start += overwritten
+        self.read_count = end
+        return data, timestamps, start
+
+    def close(self):
+        del self.header, self.data, self.timestamps
+        self.shm.close()
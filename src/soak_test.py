@@ -0,0 +1,252 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Long-duration soak test. Runs a set of SignalGenerator streams for hours and
+samples the resources of the process (RSS, open file descriptors, threads
+and CPU usage) and the timing drift of each stream at regular intervals. The
+test fails if any of them trends upward, which reveals slow leaks and
+precision decay that do not show up in short runs. Usage:
+
+    python soak_test.py soak.json --report soak_report.json
+
+Example of configuration:
+
+    {
+        "duration_hours": 48,
+        "sample_interval": 60,
+        "accelerate": 1,
+        "warmup": 0.1,
+        "streams": [
+            {"count": 4, "config": {"n_cha": 32, "sample_rate": 500}},
+            {"count": 1, "config": {"gen_settings": {"gen_type": "ECG"}}}
+        ],
+        "tolerances": {"rss_mb": 20, "open_fds": 0.5}
+    }
+
+With "accelerate": k, the sample rates are multiplied by k and the duration
+divided by k, so that the same number of samples and pushes is produced in
+less time. The trend of each metric is the slope of a least-squares fit
+over the samples after the warm-up fraction, and the test fails if the
+increase it projects over the run exceeds the tolerance of the metric. The
+exit code is 1 if the test fails.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import numpy as np
+from pylsl import local_clock
+from constants import DEFAULT_STREAM_CONFIG
+from signal_generator import SignalGenerator, merge_config
+from scenario_runner import write_report
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Maximum increase of each metric over the run
+DEFAULT_TOLERANCES = {
+    'rss_mb': 20.0,
+    'children_rss_mb': 20.0,
+    'open_fds': 0.5,
+    'threads': 0.5,
+    'cpu_percent': 5.0,
+    'drift_ms': 5.0
+}
+
+
+def get_rss_mb(pid='self'):
+    """ Resident set size (MB) of a process, or None if not available. On
+    platforms without /proc, the peak RSS of the current process is
+    returned instead. """
+    try:
+        with open('/proc/%s/statm' % pid) as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / \
+                2 ** 20
+    except (OSError, ValueError, AttributeError):
+        if pid != 'self' or resource is None:
+            return None
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+def get_open_fds():
+    """ Number of open file descriptors, or None if not available. """
+    for folder in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(folder))
+        except OSError:
+            continue
+    return None
+
+
+class SoakTest:
+    """ Runs a soak test.
+
+    Parameters
+    ------------
+    config : dict
+        Test description (see the module docstring).
+    """
+
+    def __init__(self, config):
+        self.accelerate = config.get('accelerate', 1)
+        self.duration = 3600 * config['duration_hours'] / self.accelerate
+        self.sample_interval = config.get('sample_interval', 60) / \
+            self.accelerate
+        self.warmup = config.get('warmup', 0.1)
+        self.stream_configs = config['streams']
+        self.tolerances = dict(DEFAULT_TOLERANCES)
+        self.tolerances.update(config.get('tolerances', dict()))
+        self.streams = dict()   # name -> SignalGenerator
+        self.samples = list()
+        self.last_cpu = None
+
+    def run(self):
+        """ Runs the test and returns the report. """
+        try:
+            self.start_streams()
+            t_start = time.monotonic()
+            next_sample = 0.0
+            while True:
+                t = time.monotonic() - t_start
+                if t >= next_sample:
+                    self.sample(t)
+                    next_sample += self.sample_interval
+                if t >= self.duration:
+                    break
+                time.sleep(max(min(next_sample, self.duration) -
+                               (time.monotonic() - t_start), 0))
+        finally:
+            for name in list(self.streams):
+                self.streams.pop(name).close()
+        return self.get_report()
+
+    def start_streams(self):
+        n_created = 0
+        for stream in self.stream_configs:
+            for _ in range(stream.get('count', 1)):
+                config = merge_config(stream.get('config', dict()), {
+                    'stream_name': '%s_%i' % (stream.get('config', dict()).get(
+                        'stream_name', 'Soak'), n_created)})
+                if self.accelerate != 1:
+                    rate = config.get('sample_rate',
+                                      DEFAULT_STREAM_CONFIG['sample_rate'])
+                    config = merge_config(config, {
+                        'sample_rate': self.accelerate * rate})
+                signal_generator = SignalGenerator.from_config(config)
+                signal_generator.init_send_lsl()
+                self.streams[config['stream_name']] = signal_generator
+                n_created += 1
+        print('[SoakTest] > %i streams running for %.2f h (x%g).' %
+              (n_created, self.duration / 3600, self.accelerate))
+
+    def sample(self, t):
+        """ Records the resources of the process and the drift of the
+        streams. """
+        now_cpu = (time.process_time(), time.monotonic())
+        cpu_percent = None
+        if self.last_cpu is not None:
+            cpu_percent = 100 * (now_cpu[0] - self.last_cpu[0]) / \
+                max(now_cpu[1] - self.last_cpu[1], 1e-9)
+        self.last_cpu = now_cpu
+        children_rss = [get_rss_mb(p.pid) for p in
+                        multiprocessing.active_children()]
+
+        # Drift of each stream: difference between the host time at which
+        # the next sample is due and the current time. It is bounded by the
+        # push size unless the stream falls behind or its clock loses
+        # precision. With a clock model, the samples follow the simulated
+        # device clock, so they are mapped to host time through the model
+        # (host_time does not advance the model, unlike device_time, so it
+        # can be called from this thread)
+        drift = dict()
+        now = local_clock()
+        for name, signal_generator in self.streams.items():
+            t0 = signal_generator.io_init_timestamp
+            if t0 is None:
+                continue
+            # Position of the sample clock, which also counts the samples
+            # that were skipped or dropped instead of sent
+            t = signal_generator.n_samples_sent / signal_generator.sample_rate
+            if signal_generator.clock_model is not None:
+                t = signal_generator.clock_model.host_time(t)
+            drift[name] = 1000 * (t0 + t - now)
+        row = {
+            't': round(t, 3),
+            'rss_mb': get_rss_mb(),
+            'children_rss_mb': sum(r for r in children_rss if r is not None)
+            if children_rss else None,
+            'open_fds': get_open_fds(),
+            'threads': threading.active_count(),
+            'cpu_percent': cpu_percent,
+            'drift_ms': max(drift.values(), key=abs) if drift else None
+        }
+        self.samples.append(row)
+        print('[SoakTest] > t=%.0f s: RSS %.1f MB, %s fds, %i threads, '
+              'drift %.2f ms' % (t, row['rss_mb'] or 0, row['open_fds'],
+                                 row['threads'], row['drift_ms'] or 0))
+
+    def get_trends(self):
+        """ Projected increase of each metric over the run and whether it
+        exceeds its tolerance.
+
+        Returns
+        ------------
+        dict
+            For each metric, "increase" and "failed".
+        """
+        trends = dict()
+        for metric, tolerance in self.tolerances.items():
+            rows = [r for r in self.samples
+                    if r['t'] >= self.warmup * self.duration and
+                    r.get(metric) is not None]
+            if len(rows) < 3:
+                trends[metric] = {'increase': None, 'failed': False}
+                continue
+            t = np.array([r['t'] for r in rows])
+            values = np.array([r[metric] for r in rows], dtype=float)
+            if metric == 'drift_ms':
+                values = np.abs(values)
+            slope = np.polyfit(t, values, 1)[0]
+            increase = float(slope * (t[-1] - t[0]))
+            trends[metric] = {'increase': increase,
+                              'failed': increase > tolerance}
+        return trends
+
+    def get_report(self):
+        trends = self.get_trends()
+        failed = [m for m, trend in trends.items() if trend['failed']]
+        return {'duration': self.duration,
+                'accelerate': self.accelerate,
+                'tolerances': self.tolerances,
+                'trends': trends,
+                'passed': not failed,
+                'failed_metrics': failed,
+                'samples': self.samples}
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description='Runs a soak test.')
+    parser.add_argument('config', help='JSON file with the configuration.')
+    parser.add_argument('--report', default='soak_report.json',
+                        help='Output report (.json or .csv).')
+    args = parser.parse_args()
+    with open(args.config) as f:
+        soak_test = SoakTest(json.load(f))
+    report = soak_test.run()
+    write_report(report, args.report)
+    if report['passed']:
+        print('[SoakTest] > PASSED. Report saved to %s' % args.report)
+    else:
+        print('[SoakTest] > FAILED (%s). Report saved to %s' %
+              (', '.join(report['failed_metrics']), args.report))
+    sys.exit(0 if report['passed'] else 1)
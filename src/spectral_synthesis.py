@@ -0,0 +1,183 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import numpy as np
+
+
+class SpectralSynthesizer:
+    """ Streaming synthesizer of Gaussian noise with an arbitrary power
+    spectral density (PSD). Each block of n_fft samples is synthesized in the
+    frequency domain (random phases and amplitudes following the target
+    PSD), transformed with an inverse FFT and weighted by a sine window. The
+    blocks are overlap-added with a hop of n_fft / 2 samples: since the
+    squared windows add up to one, the output is stationary and has no
+    seams. The memory is constant and the cost per sample is O(log n_fft).
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    psd : callable, tuple or None
+        Target one-sided PSD in units^2/Hz. It can be a function that
+        returns the PSD for an array of frequencies, with shape (freqs, ) or
+        (freqs, n_cha); or a tuple (freqs, psd), e.g., the output of
+        estimate_psd, which is interpolated in the log-log domain. If None,
+        pink noise (1/f^exponent) with a standard deviation of amplitude is
+        generated.
+    n_fft : int
+        Block length. It determines the frequency resolution (fs / n_fft).
+    exponent : float
+        Exponent of the default pink noise.
+    amplitude : float
+        Standard deviation of the default pink noise.
+    rng : numpy.random.Generator or None
+        Random number generator.
+    """
+
+    def __init__(self, fs, n_cha, psd=None, n_fft=1024, exponent=0.51,
+                 amplitude=30, rng=None):
+        if n_fft % 2 != 0:
+            raise ValueError('The block length must be even')
+        self.fs = fs
+        self.n_cha = n_cha
+        self.n_fft = n_fft
+        self.hop = n_fft // 2
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.freqs = np.fft.rfftfreq(n_fft, 1 / fs)
+        self.window = np.sin(np.pi * np.arange(n_fft) / n_fft)[:, None]
+        self.set_psd(psd, exponent, amplitude)
+
+        # Overlap-add state: the second half of the last block and the
+        # samples of the current hop that have not been read yet
+        self.tail = np.zeros((self.hop, n_cha))
+        self.hop_buffer = np.zeros((self.hop, n_cha))
+        self.hop_idx = self.hop
+        self._next_block()
+
+    def set_psd(self, psd=None, exponent=0.51, amplitude=30):
+        """ Sets the target PSD (see the class parameters). The change is
+        effective from the next block, and the transition is smoothed by the
+        overlap-add. """
+        freqs = self.freqs[1:]
+        if psd is None:
+            values = freqs ** -exponent
+            values *= amplitude ** 2 / (np.sum(values) * self.fs / self.n_fft)
+        elif callable(psd):
+            values = np.asarray(psd(freqs), dtype=float)
+        else:
+            values = self.interpolate_psd(psd[0], psd[1], freqs)
+        values = np.broadcast_to(
+            values.reshape(freqs.shape[0], -1), (freqs.shape[0], self.n_cha))
+
+        # Spectral scale so that the variance of each block equals the
+        # integral of the PSD. The DC component is removed
+        df = self.fs / self.n_fft
+        scale = np.zeros((self.freqs.shape[0], self.n_cha))
+        scale[1:] = np.sqrt(values * df / 4) * self.n_fft
+        scale[-1] *= 2
+        self.scale = scale
+
+    def get(self, n_samples, out=None):
+        """ Returns the next n_samples of the stream.
+
+        Parameters
+        ------------
+        n_samples : int
+            Number of samples.
+        out : ndarray or None
+            Array [samples x channels] to write the samples into.
+
+        Returns
+        ------------
+        ndarray: [samples x channels]
+            Synthesized samples.
+        """
+        if out is None:
+            out = np.empty((n_samples, self.n_cha))
+        i = 0
+        while i < n_samples:
+            if self.hop_idx == self.hop:
+                self._next_block()
+            n = min(n_samples - i, self.hop - self.hop_idx)
+            out[i:i + n] = self.hop_buffer[self.hop_idx:self.hop_idx + n]
+            self.hop_idx += n
+            i += n
+        return out
+
+    def get_state(self):
+        """ Returns a snapshot of the state of the synthesizer. """
+        return {'rng': self.rng.bit_generator.state,
+                'tail': self.tail.copy(),
+                'hop_buffer': self.hop_buffer.copy(),
+                'hop_idx': self.hop_idx}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['rng']
+        self.tail[:] = state['tail']
+        self.hop_buffer[:] = state['hop_buffer']
+        self.hop_idx = state['hop_idx']
+
+    def _next_block(self):
+        n_freqs = self.freqs.shape[0]
+        spectrum = self.scale * (
+            self.rng.standard_normal((n_freqs, self.n_cha)) +
+            1j * self.rng.standard_normal((n_freqs, self.n_cha)))
+        block = np.fft.irfft(spectrum, n=self.n_fft, axis=0) * self.window
+        np.add(self.tail, block[:self.hop], out=self.hop_buffer)
+        self.tail[:] = block[self.hop:]
+        self.hop_idx = 0
+
+    @staticmethod
+    def interpolate_psd(freqs, psd, target_freqs):
+        """ Interpolates a PSD in the log-log domain. """
+        freqs = np.asarray(freqs, dtype=float)
+        psd = np.asarray(psd, dtype=float).reshape(freqs.shape[0], -1)
+        valid = freqs > 0
+        log_f = np.log(freqs[valid])
+        log_target = np.log(target_freqs)
+        log_psd = np.log(np.maximum(psd[valid], np.finfo(float).tiny))
+        return np.exp(np.stack(
+            [np.interp(log_target, log_f, log_psd[:, c])
+             for c in range(psd.shape[1])], axis=1))
+
+
+def estimate_psd(signal, fs, n_fft=1024):
+    """ Estimates the one-sided PSD of each channel of a recording using
+    Welch's method (Hann window, 50 % overlap). The output can be used as the
+    target PSD of a SpectralSynthesizer.
+
+    Parameters
+    ------------
+    signal : ndarray [samples x channels]
+        Recording.
+    fs : float
+        Sampling rate of the recording.
+    n_fft : int
+        Segment length.
+
+    Returns
+    ------------
+    tuple
+        (freqs, psd), with shapes (freqs, ) and (freqs x channels). The PSD
+        is given in units^2/Hz.
+    """
+    signal = np.asarray(signal, dtype=float)
+    if signal.ndim == 1:
+        signal = signal[:, None]
+    if signal.shape[0] < n_fft:
+        raise ValueError('The recording is shorter than the segment length')
+    window = np.hanning(n_fft)[:, None]
+    starts = range(0, signal.shape[0] - n_fft + 1, n_fft // 2)
+    psd = np.zeros((n_fft // 2 + 1, signal.shape[1]))
+    for s in starts:
+        segment = signal[s:s + n_fft]
+        segment = (segment - np.mean(segment, axis=0)) * window
+        psd += np.abs(np.fft.rfft(segment, axis=0)) ** 2
+    psd /= len(starts) * fs * np.sum(window ** 2)
+    psd[1:-1] *= 2
+    return np.fft.rfftfreq(n_fft, 1 / fs), psd
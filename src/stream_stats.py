@@ -0,0 +1,149 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+import numpy as np
+
+
+class StreamStats:
+    """ Timing statistics of a stream. Each push, and each tick of the timer
+    that pushed samples, is recorded into preallocated ring buffers, so
+    recording has a constant cost and does not allocate memory. Percentiles
+    and rates are only computed when a snapshot is requested, which happens
+    outside the IO thread.
+
+    Parameters
+    ------------
+    sample_rate : float
+        Nominal sample rate of the stream.
+    size : int
+        Number of pushes (and ticks) kept in the ring buffers.
+    """
+
+    def __init__(self, sample_rate, size=1024):
+        self.sample_rate = sample_rate
+        self.size = size
+        self.push_times = np.zeros(size)
+        self.push_samples = np.zeros(size, dtype=np.int64)
+        self.gen_times = np.zeros(size)
+        self.send_times = np.zeros(size)
+        self.tick_times = np.zeros(size)
+        self.tick_samples = np.zeros(size, dtype=np.int64)
+        self.n_records = 0
+        self.n_ticks = 0
+        self.n_samples = 0
+        self.n_chunks = 0
+
+    def record(self, push_time, n_samples, gen_time, send_time):
+        """ Records a push.
+
+        Parameters
+        ------------
+        push_time : float
+            LSL time at which the chunk was pushed.
+        n_samples : int
+            Number of samples of the chunk.
+        gen_time : float
+            Seconds spent generating the chunk.
+        send_time : float
+            Seconds spent pushing the chunk.
+        """
+        i = self.n_records % self.size
+        self.push_times[i] = push_time
+        self.push_samples[i] = n_samples
+        self.gen_times[i] = gen_time
+        self.send_times[i] = send_time
+        self.n_records += 1
+        self.n_samples += n_samples
+        self.n_chunks += 1
+
+    def record_tick(self, tick_time, n_samples):
+        """ Records a tick of the timer, which may push several chunks.
+
+        Parameters
+        ------------
+        tick_time : float
+            LSL time at which the last chunk of the tick was pushed.
+        n_samples : int
+            Number of samples pushed in the tick.
+        """
+        i = self.n_ticks % self.size
+        self.tick_times[i] = tick_time
+        self.tick_samples[i] = n_samples
+        self.n_ticks += 1
+
+    def get_tick_window(self):
+        """ Returns a chronological copy of the ticks in the ring buffers.
+
+        Returns
+        ------------
+        tuple
+            (tick_times, tick_samples)
+        """
+        n_ticks = self.n_ticks
+        n = min(n_ticks, self.size)
+        order = np.arange(n_ticks - n, n_ticks) % self.size
+        return self.tick_times[order], self.tick_samples[order]
+
+    def get_window(self):
+        """ Returns a chronological copy of the records in the ring buffers.
+
+        Returns
+        ------------
+        tuple
+            (push_times, push_samples, gen_times, send_times)
+        """
+        n_records = self.n_records
+        n = min(n_records, self.size)
+        order = np.arange(n_records - n, n_records) % self.size
+        return (self.push_times[order], self.push_samples[order],
+                self.gen_times[order], self.send_times[order])
+
+    def snapshot(self, quantiles=(0.5, 0.95, 0.99)):
+        """ Computes the current statistics.
+
+        Parameters
+        ------------
+        quantiles : tuple
+            Quantiles of the jitter and timing distributions.
+
+        Returns
+        ------------
+        dict
+            Counters, effective rate (Hz), absolute jitter of the intervals
+            between ticks with respect to the nominal ones (ms), generation
+            and push time per chunk (ms). The jitter is measured per tick
+            because the chunks of a tick are pushed back to back.
+        """
+        n_samples, n_chunks = self.n_samples, self.n_chunks
+        push_times, push_samples, gen_times, send_times = self.get_window()
+        tick_times, tick_samples = self.get_tick_window()
+        stats = {
+            'samples_sent': n_samples,
+            'chunks_sent': n_chunks,
+            'effective_rate': 0.0,
+            'jitter_ms': {q: 0.0 for q in quantiles},
+            'generation_ms': {q: 0.0 for q in quantiles},
+            'push_ms': {q: 0.0 for q in quantiles},
+        }
+        if push_times.shape[0] >= 2:
+            elapsed = push_times[-1] - push_times[0]
+            if elapsed > 0:
+                stats['effective_rate'] = \
+                    float(np.sum(push_samples[1:]) / elapsed)
+        if tick_times.shape[0] >= 2:
+            jitter = np.abs(np.diff(tick_times) -
+                            tick_samples[1:] / self.sample_rate)
+            stats['jitter_ms'] = self._quantiles(1000 * jitter, quantiles)
+        if push_times.shape[0] >= 1:
+            stats['generation_ms'] = self._quantiles(1000 * gen_times,
+                                                     quantiles)
+            stats['push_ms'] = self._quantiles(1000 * send_times, quantiles)
+        return stats
+
+    @staticmethod
+    def _quantiles(values, quantiles):
+        return dict(zip(quantiles,
+                        np.quantile(values, quantiles).tolist()))
@@ -0,0 +1,446 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+
+Runs SignalGenerator streams in worker processes, so that their IO threads
+do not compete for the GIL of a single interpreter and the aggregate
+throughput scales with the number of cores. Each worker runs one stream or
+a group of streams, can be pinned to its own CPUs and sends a heartbeat with
+the statistics of its streams at regular intervals. The supervisor restarts the
+workers that exit or stop sending heartbeats; if a checkpoint folder is
+given, the streams are checkpointed periodically and the restarted workers
+resume them (see SignalGenerator.from_checkpoint). Usage:
+
+    python supervisor.py streams.json [--metrics-port 9100]
+
+Example of configuration:
+
+    {
+        "streams_per_worker": 2,
+        "heartbeat_interval": 1.0,
+        "heartbeat_timeout": 5.0,
+        "checkpoint_dir": "/tmp/lslgen_checkpoints",
+        "checkpoint_interval": 10.0,
+        "streams": [
+            {"count": 8, "config": {"n_cha": 64, "sample_rate": 1000}},
+            {"count": 2, "config": {"gen_settings": {"gen_type": "ECG"}}}
+        ]
+    }
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+from signal_generator import SignalGenerator, merge_config
+from checkpoint import STATE_FILE
+from realtime import apply_realtime
+from metrics_server import MetricsServer
+
+
+def get_available_cpus():
+    """ CPUs the process can run on. """
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def assign_cpus(configs, cpus):
+    """ Pins the IO threads of the streams of a worker to its first CPU
+    and their timer processes, which busy-wait until each deadline, to the
+    other ones, unless their realtime_settings already set them. With a
+    single CPU, the threads and processes are only pinned as a whole.
+
+    Returns
+    ------------
+    list
+        Configurations of the streams.
+    """
+    if len(cpus) < 2:
+        return configs
+    assigned = list()
+    for i, config in enumerate(configs):
+        realtime_settings = dict(config.get('realtime_settings', None) or
+                                 dict())
+        realtime_settings.setdefault('io_cpus', cpus[:1])
+        realtime_settings.setdefault(
+            'timer_cpus', [cpus[1 + i % (len(cpus) - 1)]])
+        assigned.append(merge_config(
+            config, {'realtime_settings': realtime_settings}))
+    return assigned
+
+
+def run_worker(worker_id, configs, cpus, heartbeat_interval, checkpoint_dir,
+               checkpoint_interval, stop_flag, heartbeat_queue):
+    """ Main function of a worker process. Creates (or resumes) its streams,
+    sends a heartbeat with their statistics every heartbeat_interval and
+    checkpoints them every checkpoint_interval until stop_flag is set.
+
+    Parameters
+    ------------
+    worker_id : int
+        Index of the worker.
+    configs : list
+        Configurations of the streams (see SignalGenerator.from_config).
+    cpus : list or None
+        CPUs the worker is pinned to. The threads and processes of the
+        streams inherit the affinity.
+    heartbeat_interval : float
+        Time (s) between heartbeats.
+    checkpoint_dir : str or None
+        Folder of the checkpoints, one subfolder per stream.
+    checkpoint_interval : float
+        Time (s) between checkpoints.
+    stop_flag : multiprocessing.RawValue
+        Set to 1 by the supervisor to stop the worker.
+    heartbeat_queue : multiprocessing.Queue
+        Queue of the heartbeats.
+    """
+    # The supervisor terminates the worker with SIGTERM; close the streams
+    # so that their timer processes are stopped too
+    def on_sigterm(signum, frame):
+        stop_flag.value = 1
+    signal.signal(signal.SIGTERM, on_sigterm)
+    name = 'Worker_%i' % worker_id
+    realtime = apply_realtime(name, cpus=cpus) if cpus is not None else None
+    streams = dict()
+    try:
+        for config in configs:
+            path = None
+            if checkpoint_dir is not None:
+                path = os.path.join(checkpoint_dir, config['stream_name'])
+            if path is not None and os.path.exists(
+                    os.path.join(path, STATE_FILE)):
+                signal_generator = SignalGenerator.from_checkpoint(path)
+            else:
+                signal_generator = SignalGenerator.from_config(config)
+                signal_generator.init_send_lsl()
+            streams[config['stream_name']] = signal_generator
+        next_checkpoint = time.monotonic() + checkpoint_interval
+        while True:
+            heartbeat_queue.put(('heartbeat', worker_id, {
+                'pid': os.getpid(),
+                'children': [p.pid for p in
+                             multiprocessing.active_children()],
+                'realtime': realtime,
+                'streams': {n: s.get_stats() for n, s in streams.items()}
+            }))
+            time.sleep(heartbeat_interval)
+            if stop_flag.value:
+                break
+            if checkpoint_dir is not None and \
+                    time.monotonic() >= next_checkpoint:
+                for stream_name, signal_generator in streams.items():
+                    signal_generator.save_checkpoint(
+                        os.path.join(checkpoint_dir, stream_name))
+                next_checkpoint += checkpoint_interval
+    except Exception:
+        heartbeat_queue.put(('error', worker_id, traceback.format_exc()))
+        raise
+    finally:
+        for signal_generator in streams.values():
+            signal_generator.close()
+
+
+class StreamProxy:
+    """ Exposes the statistics of a stream that runs in a worker, as
+    received in its last heartbeat, with the interface used by
+    MetricsServer. """
+
+    def __init__(self, supervisor, name):
+        self.supervisor = supervisor
+        self.name = name
+
+    def get_stats(self):
+        return self.supervisor.get_stream_stats(self.name)
+
+
+class StreamSupervisor:
+    """ Runs and monitors the worker processes (see the module docstring).
+
+    Parameters
+    ------------
+    config : dict
+        Description of the streams and options (see the module docstring):
+        "streams", "streams_per_worker" (default 1), "cpus" (list of CPUs
+        assigned to the workers in turn, or "all" for the available ones;
+        default null, no pinning), "cpus_per_worker" (default 2, see
+        assign_cpus), "heartbeat_interval" (s, default 1),
+        "heartbeat_timeout" (s, default 5), "startup_timeout" (s, default
+        30), "checkpoint_dir" (default null), "checkpoint_interval" (s,
+        default 10), "restart_delay" (s, default 1) and "max_restarts" per
+        worker (default null, unlimited).
+    metrics_server : MetricsServer or None
+        If given, the streams are registered in it.
+    """
+
+    def __init__(self, config, metrics_server=None):
+        self.streams_per_worker = max(config.get('streams_per_worker', 1), 1)
+        self.cpus = config.get('cpus', None)
+        if self.cpus == 'all':
+            self.cpus = get_available_cpus()
+        self.cpus_per_worker = max(config.get('cpus_per_worker', 2), 1)
+        self.heartbeat_interval = config.get('heartbeat_interval', 1.0)
+        self.heartbeat_timeout = config.get('heartbeat_timeout', 5.0)
+        self.startup_timeout = config.get('startup_timeout', 30.0)
+        self.checkpoint_dir = config.get('checkpoint_dir', None)
+        self.checkpoint_interval = config.get('checkpoint_interval', 10.0)
+        self.restart_delay = config.get('restart_delay', 1.0)
+        self.max_restarts = config.get('max_restarts', None)
+        self.metrics_server = metrics_server
+
+        # Stream configurations, with unique names
+        configs = list()
+        for stream in config['streams']:
+            for _ in range(stream.get('count', 1)):
+                stream_config = stream.get('config', dict())
+                configs.append(merge_config(stream_config, {
+                    'stream_name': '%s_%i' % (stream_config.get(
+                        'stream_name', 'Stream'), len(configs))}))
+
+        # Workers are spawned rather than forked, so that they do not
+        # inherit the threads and locks of the supervisor
+        self.context = multiprocessing.get_context('spawn')
+        self.heartbeat_queue = self.context.Queue()
+        self.workers = list()
+        for i in range(0, len(configs), self.streams_per_worker):
+            worker_id = len(self.workers)
+            worker_configs = configs[i:i + self.streams_per_worker]
+            worker_cpus = None
+            if self.cpus:
+                first = worker_id * self.cpus_per_worker
+                worker_cpus = list(dict.fromkeys(
+                    self.cpus[(first + j) % len(self.cpus)]
+                    for j in range(self.cpus_per_worker)))
+                worker_configs = assign_cpus(worker_configs, worker_cpus)
+            self.workers.append({
+                'id': worker_id,
+                'configs': worker_configs,
+                'cpus': worker_cpus,
+                'process': None,
+                'stop_flag': None,
+                'pid': None,
+                'children': list(),
+                'started': None,
+                'last_heartbeat': None,
+                'restarts': 0,
+                'failed': False,
+                'last_error': None,
+                'realtime': None,
+                'streams': dict()
+            })
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+        self.monitor_thread = None
+
+    def start(self):
+        """ Starts the workers and the monitor thread. """
+        for worker in self.workers:
+            self.start_worker(worker)
+        self.running.set()
+        self.monitor_thread = threading.Thread(
+            name='SignalGenerator_Supervisor_Thread', target=self.monitor)
+        self.monitor_thread.start()
+        print('[StreamSupervisor] > %i streams in %i workers.' %
+              (sum(len(w['configs']) for w in self.workers),
+               len(self.workers)))
+
+    def close(self):
+        """ Stops the monitor thread and the workers. """
+        self.running.clear()
+        if self.monitor_thread is not None:
+            self.monitor_thread.join()
+        for worker in self.workers:
+            self.stop_worker(worker)
+        print('[StreamSupervisor] > Supervisor closed.')
+
+    def start_worker(self, worker):
+        # A flag without locks, since a worker can be killed at any point
+        # and a multiprocessing.Event would deadlock the supervisor if its
+        # waiter died
+        worker['stop_flag'] = self.context.RawValue('i', 0)
+        worker['process'] = self.context.Process(
+            name='SignalGenerator_Worker_%i' % worker['id'],
+            target=run_worker,
+            args=(worker['id'], worker['configs'], worker['cpus'],
+                  self.heartbeat_interval, self.checkpoint_dir,
+                  self.checkpoint_interval, worker['stop_flag'],
+                  self.heartbeat_queue))
+        worker['process'].start()
+        worker['pid'] = worker['process'].pid
+        worker['started'] = time.monotonic()
+        worker['last_heartbeat'] = None
+
+    def stop_worker(self, worker, timeout=5.0):
+        """ Stops a worker, gracefully if it responds, and makes sure that
+        the timer processes of its streams do not outlive it. """
+        process = worker['process']
+        if process is None:
+            return
+        worker['stop_flag'].value = 1
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        for pid in worker['children']:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        worker['children'] = list()
+        worker['process'] = None
+
+    # Running in SignalGenerator_Supervisor_Thread
+    def monitor(self):
+        next_check = time.monotonic()
+        while self.running.is_set():
+            try:
+                kind, worker_id, content = self.heartbeat_queue.get(
+                    timeout=self.heartbeat_interval / 4)
+                self.on_message(kind, self.workers[worker_id], content)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_check:
+                for worker in self.workers:
+                    self.check_worker(worker)
+                next_check = time.monotonic() + self.heartbeat_interval / 2
+
+    def on_message(self, kind, worker, content):
+        if kind == 'error':
+            worker['last_error'] = content
+            print('[StreamSupervisor] > Worker %i failed:\n%s' %
+                  (worker['id'], content))
+            return
+        if worker['process'] is None or content['pid'] != worker['pid']:
+            # Late heartbeat of a worker that was restarted
+            return
+        with self.lock:
+            worker['last_heartbeat'] = time.monotonic()
+            worker['children'] = content['children']
+            worker['realtime'] = content['realtime']
+            worker['streams'] = content['streams']
+        if self.metrics_server is not None:
+            for name in content['streams']:
+                self.metrics_server.register(name, StreamProxy(self, name))
+
+    def check_worker(self, worker):
+        """ Restarts the worker if it exited or its heartbeats stopped. """
+        if worker['failed'] or worker['process'] is None:
+            return
+        now = time.monotonic()
+        if not worker['process'].is_alive():
+            reason = 'exited with code %s' % worker['process'].exitcode
+        elif worker['last_heartbeat'] is None:
+            if now - worker['started'] <= self.startup_timeout:
+                return
+            reason = 'did not start in %g s' % self.startup_timeout
+        elif now - worker['last_heartbeat'] > self.heartbeat_timeout:
+            reason = 'missed its heartbeats for %.1f s' % \
+                (now - worker['last_heartbeat'])
+        else:
+            return
+        self.stop_worker(worker, timeout=0.5)
+        if self.max_restarts is not None and \
+                worker['restarts'] >= self.max_restarts:
+            worker['failed'] = True
+            print('[StreamSupervisor] > Worker %i %s, giving up after %i '
+                  'restarts.' % (worker['id'], reason, worker['restarts']))
+            return
+        print('[StreamSupervisor] > Worker %i %s, restarting.' %
+              (worker['id'], reason))
+        time.sleep(self.restart_delay)
+        worker['restarts'] += 1
+        self.start_worker(worker)
+
+    def get_stream_stats(self, name):
+        """ Statistics of a stream in the last heartbeat of its worker. """
+        with self.lock:
+            for worker in self.workers:
+                if name in worker['streams']:
+                    return worker['streams'][name]
+        raise KeyError('Unknown stream %s' % name)
+
+    def get_stats(self):
+        """ Returns the state of the workers, the statistics of each stream
+        as received in the last heartbeat and their totals.
+
+        Returns
+        ------------
+        dict
+            "workers" (pid, CPUs, alive, age of the last heartbeat,
+            restarts and streams of each worker), "streams" (statistics of
+            each stream, see SignalGenerator.get_stats) and "total" (number
+            of streams, nominal and effective rates, samples and chunks
+            sent).
+        """
+        now = time.monotonic()
+        workers = list()
+        streams = dict()
+        with self.lock:
+            for worker in self.workers:
+                process = worker['process']
+                workers.append({
+                    'id': worker['id'],
+                    'pid': worker['pid'],
+                    'cpus': worker['cpus'],
+                    'alive': process is not None and process.is_alive(),
+                    'failed': worker['failed'],
+                    'heartbeat_age': now - worker['last_heartbeat']
+                    if worker['last_heartbeat'] is not None else None,
+                    'restarts': worker['restarts'],
+                    'last_error': worker['last_error'],
+                    'realtime': worker['realtime'],
+                    'streams': [c['stream_name'] for c in worker['configs']]
+                })
+                streams.update(worker['streams'])
+        total = {'n_streams': len(streams)}
+        for key in ('nominal_rate', 'effective_rate', 'samples_sent',
+                    'chunks_sent'):
+            total[key] = sum(s[key] for s in streams.values())
+        return {'workers': workers, 'streams': streams, 'total': total}
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(
+        description='Runs signal generator streams in worker processes.')
+    parser.add_argument('config', help='JSON file with the configuration.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Also serve the metrics of the streams.')
+    parser.add_argument('--log-interval', type=float, default=10.0,
+                        help='Time (s) between logs of the totals.')
+    args = parser.parse_args()
+    with open(args.config) as f:
+        supervisor_config = json.load(f)
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(args.host, args.metrics_port)
+        metrics_server.start()
+    supervisor = StreamSupervisor(supervisor_config, metrics_server)
+    supervisor.start()
+    try:
+        while True:
+            time.sleep(args.log_interval)
+            stats = supervisor.get_stats()
+            print('[StreamSupervisor] > %i streams, %.0f/%.0f Hz, %i '
+                  'restarts' % (stats['total']['n_streams'],
+                                stats['total']['effective_rate'],
+                                stats['total']['nominal_rate'],
+                                sum(w['restarts'] for w in stats['workers'])))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.close()
+        if metrics_server is not None:
+            metrics_server.close()
@@ -0,0 +1,354 @@
+"""
+Author:   Víctor Martínez-Cagigal & Eduardo Santamaría-Vázquez
+Date:     19 October 2026
+Version:  2.3
+"""
+
+from pylsl import StreamInlet, resolve_byprop, local_clock
+import math
+import queue
+import threading
+import numpy as np
+
+# Commands accepted by the listener
+TRIGGER_COMMANDS = ('evoked', 'ssvep', 'state')
+
+# Channel weights of each effect, by label prefix (see get_topography)
+EVOKED_TOPOGRAPHY = (('P', 1.0), ('CP', 0.8), ('PO', 0.8), ('C', 0.6),
+                     ('O', 0.5), ('FC', 0.3), ('F', 0.2))
+SSVEP_TOPOGRAPHY = (('O', 1.0), ('PO', 0.8), ('I', 0.8), ('P', 0.4))
+
+
+def get_topography(l_cha, prefixes):
+    """ Channel weights given by the longest matching label prefix. If no
+    label matches (e.g., non-standard labels), all the channels have weight
+    1.
+
+    Parameters
+    ------------
+    l_cha : list
+        Channel labels.
+    prefixes : tuple
+        Pairs (prefix, weight).
+
+    Returns
+    ------------
+    tuple
+        (channel indexes, weights)
+    """
+    weights = np.zeros(len(l_cha))
+    for i, label in enumerate(l_cha):
+        label = str(label).upper()
+        match = [(len(p), w) for p, w in prefixes if label.startswith(p)]
+        if match:
+            weights[i] = max(match)[1]
+    if not np.any(weights):
+        weights[:] = 1.0
+    chans = np.flatnonzero(weights)
+    return chans, weights[chans]
+
+
+class TriggerListener:
+    """ Closed-loop input of a stream. A thread listens to an LSL marker
+    stream and queues the received commands, which the IO thread applies
+    from the first sample due at or after the timestamp of the marker (or
+    from the first sample of the next chunk, if the marker arrives late).
+    Markers are
+    strings "<command>[:<argument>]":
+        - "evoked[:<gain>]": adds an evoked response (N1-P3 complex) with a
+          centro-parietal topography.
+        - "ssvep:<freq>" or "ssvep:off": switches the frequency (Hz) of an
+          occipital steady-state response.
+        - "state:<name>": calls state_handler(name, start_sample), e.g. to
+          switch the brain state of the generator (see
+          BaseGenerator.switch_state).
+    Numeric markers can be mapped to commands with the commands dict.
+
+    For every command, the latency between the marker timestamp (in the
+    local clock) and the push of the chunk with the first affected sample is
+    measured, as well as the offset between the marker and the time at which
+    that sample is due, in the local clock. Both are reported as percentiles, so the round trip of a
+    closed-loop system can be benchmarked.
+
+    Parameters
+    ------------
+    fs : float
+        Sampling rate.
+    n_cha : int
+        Number of channels.
+    l_cha : list
+        Channel labels, used for the topographies.
+    stream_name : str
+        Name of the marker stream.
+    source_id : str or None
+        Source id of the marker stream. If given, it is used instead of the
+        name to resolve the stream.
+    commands : dict or None
+        Map of markers to commands (e.g., {"1": "evoked", "2": "ssvep:12"}).
+    evoked_amplitude : float
+        Amplitude of the P3 peak of the evoked responses.
+    ssvep_amplitude : float
+        Amplitude of the SSVEP.
+    state_handler : callable or None
+        Function called with the name of the state and the first sample in
+        it, which returns False if the state does not exist.
+    """
+
+    def __init__(self, fs, n_cha, l_cha, stream_name='BCI_Commands',
+                 source_id=None, commands=None, evoked_amplitude=10.0,
+                 ssvep_amplitude=5.0, state_handler=None):
+        self.fs = fs
+        self.n_cha = n_cha
+        self.stream_name = stream_name
+        self.source_id = source_id
+        self.commands = {str(k): v for k, v in commands.items()} \
+            if commands is not None else dict()
+        self.ssvep_amplitude = ssvep_amplitude
+        self.state_handler = state_handler
+
+        # Effects
+        self.evoked_template = self.get_evoked_template(fs, evoked_amplitude)
+        self.evoked_chans, self.evoked_weights = get_topography(
+            l_cha, EVOKED_TOPOGRAPHY)
+        self.ssvep_chans, self.ssvep_weights = get_topography(
+            l_cha, SSVEP_TOPOGRAPHY)
+        self.evoked_events = list()     # [onset, gain]
+        self.ssvep_switches = list()    # [onset, freq]
+        self.ssvep_freq = None
+        self.state = None
+
+        # Commands waiting for the IO thread, commands whose first sample
+        # has not been generated yet, and applied commands waiting for the
+        # push of their first affected sample
+        self.pending = queue.Queue()
+        self.deferred = list()
+        self.applied = list()
+
+        # Counters and latency rings (s)
+        self.n_received = 0
+        self.n_applied = 0
+        self.n_invalid = 0
+        self.last_command = None
+        self.latencies = np.zeros(1024)
+        self.offsets = np.zeros(1024)
+        self.n_latencies = 0
+
+        self.run = threading.Event()
+        self.thread = threading.Thread(
+            name='SignalGenerator_Trigger_Thread', target=self.listen)
+
+    def start(self):
+        self.run.set()
+        self.thread.start()
+
+    def close(self):
+        self.run.clear()
+        self.thread.join()
+
+    def parse(self, marker):
+        """ Parses a marker into (command, argument), or raises ValueError
+        if it is not a valid command. """
+        marker = str(marker).strip()
+        marker = self.commands.get(marker, marker)
+        command, _, argument = marker.partition(':')
+        command = command.strip().lower()
+        if command not in TRIGGER_COMMANDS:
+            raise ValueError('Unknown command: %s' % marker)
+        argument = argument.strip()
+        if command == 'evoked':
+            argument = float(argument) if argument else 1.0
+        elif command == 'ssvep':
+            argument = None if argument.lower() in ('', 'off') \
+                else float(argument)
+        elif not argument:
+            raise ValueError('Missing state: %s' % marker)
+        return command, argument
+
+    # Running in SignalGenerator_IO_Thread
+    def schedule(self, start_sample, n_samples, start_timestamp):
+        """ Schedules the received commands whose first sample is in the next
+        chunk, i.e., the first sample due at or after the marker. Commands
+        whose marker is after the chunk wait for the following ones. It is
+        called before the chunk is generated, so that the state switches
+        take effect from that sample.
+
+        Parameters
+        ------------
+        start_sample : int
+            Index of the first sample of the chunk.
+        n_samples : int
+            Number of samples of the chunk.
+        start_timestamp : float
+            LSL timestamp (local clock) at which the first sample of the
+            chunk is due.
+        """
+        while True:
+            try:
+                self.deferred.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        end_sample = start_sample + n_samples
+        deferred = list()
+        for command, argument, marker_time in self.deferred:
+            # The tolerance absorbs the rounding of the timestamps
+            onset = start_sample + max(math.ceil(
+                (marker_time - start_timestamp) * self.fs - 1e-6), 0)
+            if onset >= end_sample:
+                deferred.append((command, argument, marker_time))
+                continue
+            if command == 'evoked':
+                self.evoked_events.append([onset, argument])
+            elif command == 'ssvep':
+                self.ssvep_switches.append([onset, argument])
+                self.ssvep_switches.sort(key=lambda switch: switch[0])
+            elif self.state_handler is not None and \
+                    self.state_handler(argument, onset) is not False:
+                self.state = argument
+            else:
+                print('[TriggerListener] > Unknown state: %s' % argument)
+                self.n_invalid += 1
+                continue
+            self.applied.append((marker_time, start_timestamp +
+                                 (onset - start_sample) / self.fs))
+            self.n_applied += 1
+        self.deferred = deferred
+
+    # Running in SignalGenerator_IO_Thread
+    def apply(self, chunk, start_sample):
+        """ Adds the active effects to the chunk in-place (see schedule).
+
+        Parameters
+        ------------
+        chunk : ndarray [samples x channels]
+            Chunk to modify.
+        start_sample : int
+            Index of the first sample of the chunk.
+        """
+        # Evoked responses
+        n = chunk.shape[0]
+        end_sample = start_sample + n
+        if self.evoked_events:
+            template = self.evoked_template
+            for event in self.evoked_events:
+                onset, gain = event
+                first = max(onset, start_sample)
+                last = min(onset + template.shape[0], end_sample)
+                if last > first:
+                    rows = slice(first - start_sample, last - start_sample)
+                    chunk[rows, self.evoked_chans] = \
+                        chunk[rows, self.evoked_chans] + np.outer(
+                            gain * template[first - onset:last - onset],
+                            self.evoked_weights)
+            self.evoked_events = [e for e in self.evoked_events
+                                  if e[0] + template.shape[0] > end_sample]
+
+        # SSVEP, with the phase derived from the sample index, in segments
+        # between the frequency switches
+        first = start_sample
+        while first < end_sample:
+            if self.ssvep_switches and self.ssvep_switches[0][0] <= first:
+                self.ssvep_freq = self.ssvep_switches.pop(0)[1]
+                continue
+            last = min(self.ssvep_switches[0][0], end_sample) \
+                if self.ssvep_switches else end_sample
+            if self.ssvep_freq is not None:
+                rows = slice(first - start_sample, last - start_sample)
+                t = (first + np.arange(last - first)) / self.fs
+                sine = self.ssvep_amplitude * np.sin(
+                    2 * np.pi * ((self.ssvep_freq * t) % 1))
+                chunk[rows, self.ssvep_chans] = \
+                    chunk[rows, self.ssvep_chans] + \
+                    np.outer(sine, self.ssvep_weights)
+            first = last
+
+    # Running in SignalGenerator_IO_Thread
+    def pushed(self, push_time):
+        """ Records the latencies of the commands applied to the chunk that
+        has just been pushed (or lost, see DeliveryModel) at push_time (LSL
+        clock). """
+        for marker_time, sample_time in self.applied:
+            i = self.n_latencies % self.latencies.shape[0]
+            self.latencies[i] = push_time - marker_time
+            self.offsets[i] = sample_time - marker_time
+            self.n_latencies += 1
+        self.applied = list()
+
+    def get_report(self, quantiles=(0.5, 0.95, 0.99)):
+        """ Returns the counters, current effects and latency percentiles.
+
+        Returns
+        ------------
+        dict
+            Received, applied and invalid commands, last command, current
+            SSVEP frequency and state, and percentiles (ms) of the latency
+            from each marker to the push of its first affected sample
+            ("latency_ms") and to the time at which that sample is due
+            ("sample_offset_ms").
+        """
+        n = min(self.n_latencies, self.latencies.shape[0])
+        report = {
+            'received': self.n_received,
+            'applied': self.n_applied,
+            'invalid': self.n_invalid,
+            'last_command': self.last_command,
+            'ssvep_freq': self.ssvep_freq,
+            'state': self.state,
+            'latency_ms': dict.fromkeys(quantiles),
+            'sample_offset_ms': dict.fromkeys(quantiles)
+        }
+        if n > 0:
+            for key, values in (('latency_ms', self.latencies[:n]),
+                                ('sample_offset_ms', self.offsets[:n])):
+                report[key] = dict(zip(quantiles, (1000 * np.quantile(
+                    values, quantiles)).tolist()))
+        return report
+
+    # Running in SignalGenerator_Trigger_Thread
+    def listen(self):
+        inlet = None
+        time_correction = 0.0
+        next_correction = None
+        while self.run.is_set():
+            if inlet is None:
+                if self.source_id is not None:
+                    streams = resolve_byprop('source_id', self.source_id,
+                                             timeout=0.5)
+                else:
+                    streams = resolve_byprop('name', self.stream_name,
+                                             timeout=0.5)
+                if not streams:
+                    continue
+                inlet = StreamInlet(streams[0], max_buflen=1, recover=True)
+                time_correction = inlet.time_correction()
+                next_correction = local_clock() + 5
+                print('[TriggerListener] > Listening to %s.' %
+                      streams[0].name())
+
+            # Short timeout, so the thread reacts to close promptly; the
+            # call returns as soon as a marker arrives
+            sample, timestamp = inlet.pull_sample(timeout=0.05)
+            if local_clock() >= next_correction:
+                time_correction = inlet.time_correction()
+                next_correction = local_clock() + 5
+            if sample is None:
+                continue
+            self.n_received += 1
+            self.last_command = sample[0]
+            try:
+                command, argument = self.parse(sample[0])
+            except ValueError as e:
+                print('[TriggerListener] > %s' % e)
+                self.n_invalid += 1
+                continue
+            self.pending.put((command, argument,
+                              timestamp + time_correction))
+        if inlet is not None:
+            inlet.close_stream()
+
+    @staticmethod
+    def get_evoked_template(fs, amplitude=10.0, duration=0.8):
+        """ Evoked response: negative peak at 100 ms (N1) followed by a
+        positive peak at 300 ms (P3) of the given amplitude. """
+        t = np.arange(int(duration * fs)) / fs
+        return amplitude * (np.exp(-0.5 * ((t - 0.3) / 0.06) ** 2) -
+                            0.5 * np.exp(-0.5 * ((t - 0.1) / 0.025) ** 2))